@@ -37,7 +37,7 @@ version = 1.1.0
 
 # (list) Application requirements
 # comma separated e.g. requirements = sqlite3,kivy
-requirements = python3,kivy==2.1.0,kivymd==0.104.2,plyer==2.1.0,requests,pyjnius
+requirements = python3,kivy==2.1.0,kivymd==0.104.2,plyer==2.1.0,requests,msgpack,pyjnius
 
 # (str) Presplash of the application
 presplash.filename = %(source.dir)s/assets/presplash.png
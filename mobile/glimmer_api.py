@@ -1,19 +1,70 @@
 from __future__ import annotations
 
+import hashlib
 import json
-from typing import Any
+import os
+import time
+from typing import Any, Callable
 
 import requests
 
+# msgpack 为可选依赖：可用时优先请求 application/msgpack（体积更小、解析更快），否则使用 JSON
+try:
+    import msgpack
+except Exception:  # pragma: no cover
+    msgpack = None
+
 
 class GlimmerAPIError(Exception):
     pass
 
 
+# 服务端下发的轮询建议（/health 的 poll_interval / poll_backoff，以及 429/503 的 Retry-After）。
+# 进程级共享：客户端各处都会新建 GlimmerAPI 实例。
+_POLL_BASE_SECONDS = 10.0
+_poll_hint: dict[str, float] = {'interval': _POLL_BASE_SECONDS, 'backoff': 0.0, 'retry_until': 0.0}
+
+
+def poll_delay(base_seconds: float) -> float:
+    # 按服务端建议等比缩放本地轮询间隔：建议 60s 时，原 10s 的任务拉长到 60s，原 20s 的拉长到 120s
+    try:
+        scale = float(_poll_hint.get('interval') or _POLL_BASE_SECONDS) / _POLL_BASE_SECONDS
+    except Exception:
+        scale = 1.0
+    scale = min(max(scale, 0.5), 30.0)
+    delay = float(base_seconds) * scale
+
+    # 服务器繁忙（429/503 Retry-After）或建议退避时，至少等到指定时间之后
+    wait = float(_poll_hint.get('retry_until') or 0) - time.time()
+    if wait > delay:
+        delay = wait
+    return max(1.0, delay)
+
+
+def _note_retry_after(resp: requests.Response):
+    try:
+        raw = resp.headers.get('Retry-After')
+        seconds = float(raw) if raw else 0.0
+    except Exception:
+        seconds = 0.0
+    seconds = max(seconds, float(_poll_hint.get('backoff') or 0))
+    if seconds > 0:
+        _poll_hint['retry_until'] = max(float(_poll_hint.get('retry_until') or 0), time.time() + seconds)
+
+
+def _file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
 class GlimmerAPI:
-    def __init__(self, base_url: str, timeout: float = 6.0):
+    def __init__(self, base_url: str, timeout: float = 6.0, prefer_msgpack: bool = True):
         self.base_url = (base_url or '').strip().rstrip('/')
         self.timeout = float(timeout)
+        self.prefer_msgpack = bool(prefer_msgpack) and msgpack is not None
 
     def _url(self, path: str) -> str:
         path = (path or '').strip()
@@ -22,14 +73,27 @@ class GlimmerAPI:
         return f"{self.base_url}{path}"
 
     def _headers(self, token: str | None = None) -> dict[str, str]:
-        h: dict[str, str] = {'Accept': 'application/json'}
+        # requests 默认携带 Accept-Encoding: gzip，并会自动解压；服务端对较大的响应启用 gzip
+        if self.prefer_msgpack:
+            h: dict[str, str] = {'Accept': 'application/msgpack, application/json;q=0.9'}
+        else:
+            h = {'Accept': 'application/json'}
         if token:
             h['Authorization'] = f"Bearer {token}"
         return h
 
+    def _json(self, resp: requests.Response) -> Any:
+        # 服务端按 Accept 协商返回 msgpack 或 JSON；两者字段结构一致（时间均为 ISO 字符串）
+        ctype = str(resp.headers.get('Content-Type') or '')
+        if msgpack is not None and ctype.startswith('application/msgpack'):
+            return msgpack.unpackb(resp.content, raw=False)
+        return resp.json()
+
     def _raise(self, resp: requests.Response):
+        if resp.status_code in (429, 503):
+            _note_retry_after(resp)
         try:
-            data = resp.json()
+            data = self._json(resp)
             detail = data.get('detail') if isinstance(data, dict) else None
         except Exception:
             detail = None
@@ -40,10 +104,19 @@ class GlimmerAPI:
         if not self.base_url:
             return False
         try:
-            r = requests.get(self._url('/health'), timeout=self.timeout)
-            return r.status_code == 200
+            r = requests.get(self._url('/health'), timeout=self.timeout, headers=self._headers())
         except Exception:
             return False
+        if r.status_code != 200:
+            return False
+        try:
+            data = self._json(r) or {}
+            if 'poll_interval' in data:
+                _poll_hint['interval'] = float(data.get('poll_interval') or _POLL_BASE_SECONDS)
+                _poll_hint['backoff'] = float(data.get('poll_backoff') or 0)
+        except Exception:
+            pass
+        return True
 
     def register(
         self,
@@ -71,7 +144,7 @@ class GlimmerAPI:
         )
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or {}
+        return self._json(r) or {}
 
     def change_password(self, token: str, old_password: str, new_password: str) -> dict[str, Any]:
         r = requests.post(
@@ -82,7 +155,7 @@ class GlimmerAPI:
         )
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or {}
+        return self._json(r) or {}
 
     def security_question(self, username: str) -> dict[str, Any]:
         r = requests.get(
@@ -93,7 +166,7 @@ class GlimmerAPI:
         )
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or {}
+        return self._json(r) or {}
 
     def reset_password(self, username: str, security_answer: str, new_password: str) -> dict[str, Any]:
         r = requests.post(
@@ -108,7 +181,7 @@ class GlimmerAPI:
         )
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or {}
+        return self._json(r) or {}
 
     def login(self, username: str, password: str) -> str:
         r = requests.post(
@@ -119,7 +192,7 @@ class GlimmerAPI:
         )
         if r.status_code != 200:
             self._raise(r)
-        data = r.json() or {}
+        data = self._json(r) or {}
         token = data.get('access_token')
         if not token:
             raise GlimmerAPIError('missing token')
@@ -129,13 +202,13 @@ class GlimmerAPI:
         r = requests.get(self._url('/me'), timeout=self.timeout, headers=self._headers(token))
         if r.status_code != 200:
             self._raise(r)
-        return r.json()
+        return self._json(r)
 
     def my_groups(self, token: str) -> list[dict[str, Any]]:
         r = requests.get(self._url('/groups/my'), timeout=self.timeout, headers=self._headers(token))
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or []
+        return self._json(r) or []
 
     def apply_join(self, token: str, group_code: str) -> dict[str, Any]:
         r = requests.post(
@@ -146,25 +219,25 @@ class GlimmerAPI:
         )
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or {}
+        return self._json(r) or {}
 
     def my_join_requests(self, token: str) -> list[dict[str, Any]]:
         r = requests.get(self._url('/groups/requests/my'), timeout=self.timeout, headers=self._headers(token))
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or []
+        return self._json(r) or []
 
     def leave_group(self, token: str, group_id: int) -> dict[str, Any]:
         r = requests.post(self._url(f'/groups/{int(group_id)}/leave'), timeout=self.timeout, headers=self._headers(token))
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or {}
+        return self._json(r) or {}
 
     def public_latest_global_announcement(self) -> dict[str, Any] | None:
         r = requests.get(self._url('/public/announcements/global/latest'), timeout=self.timeout, headers=self._headers())
         if r.status_code != 200:
             self._raise(r)
-        data = r.json()
+        data = self._json(r)
         if data is None:
             return None
         return data
@@ -173,7 +246,7 @@ class GlimmerAPI:
         r = requests.get(self._url('/public/config/version'), timeout=self.timeout, headers=self._headers())
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or {}
+        return self._json(r) or {}
 
     def announcements_feed(self, token: str, since_iso: str | None = None) -> list[dict[str, Any]]:
         params = {}
@@ -182,44 +255,44 @@ class GlimmerAPI:
         r = requests.get(self._url('/announcements/feed'), params=params, timeout=self.timeout, headers=self._headers(token))
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or []
+        return self._json(r) or []
 
     # 管理端能力（群管理员/工程师）
     def pending_join_requests(self, token: str) -> list[dict[str, Any]]:
         r = requests.get(self._url('/groups/requests/pending'), timeout=self.timeout, headers=self._headers(token))
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or []
+        return self._json(r) or []
 
     def approve_join(self, token: str, request_id: int) -> dict[str, Any]:
         r = requests.post(self._url(f'/groups/requests/{int(request_id)}/approve'), timeout=self.timeout, headers=self._headers(token))
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or {}
+        return self._json(r) or {}
 
     def reject_join(self, token: str, request_id: int) -> dict[str, Any]:
         r = requests.post(self._url(f'/groups/requests/{int(request_id)}/reject'), timeout=self.timeout, headers=self._headers(token))
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or {}
+        return self._json(r) or {}
 
     def pending_corrections(self, token: str) -> list[dict[str, Any]]:
         r = requests.get(self._url('/corrections/pending'), timeout=self.timeout, headers=self._headers(token))
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or []
+        return self._json(r) or []
 
     def approve_correction(self, token: str, request_id: int) -> dict[str, Any]:
         r = requests.post(self._url(f'/corrections/{int(request_id)}/approve'), timeout=self.timeout, headers=self._headers(token))
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or {}
+        return self._json(r) or {}
 
     def reject_correction(self, token: str, request_id: int) -> dict[str, Any]:
         r = requests.post(self._url(f'/corrections/{int(request_id)}/reject'), timeout=self.timeout, headers=self._headers(token))
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or {}
+        return self._json(r) or {}
 
     def post_global_announcement(self, token: str, title: str, content: str) -> dict[str, Any]:
         r = requests.post(
@@ -230,7 +303,7 @@ class GlimmerAPI:
         )
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or {}
+        return self._json(r) or {}
 
     def post_group_announcement(self, token: str, group_id: int, title: str, content: str) -> dict[str, Any]:
         r = requests.post(
@@ -241,13 +314,13 @@ class GlimmerAPI:
         )
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or {}
+        return self._json(r) or {}
 
     def get_version(self) -> dict[str, Any]:
         r = requests.get(self._url('/config/version'), timeout=self.timeout, headers=self._headers())
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or {}
+        return self._json(r) or {}
 
     def set_version(self, token: str, latest_version: str, note: str) -> dict[str, Any]:
         r = requests.post(
@@ -258,13 +331,110 @@ class GlimmerAPI:
         )
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or {}
+        return self._json(r) or {}
+
+    def set_poll_hint(self, token: str, interval_seconds: float, backoff_seconds: float = 0) -> dict[str, Any]:
+        r = requests.post(
+            self._url('/config/poll'),
+            json={'interval_seconds': float(interval_seconds), 'backoff_seconds': float(backoff_seconds or 0)},
+            timeout=self.timeout,
+            headers=self._headers(token),
+        )
+        if r.status_code != 200:
+            self._raise(r)
+        return self._json(r) or {}
+
+    def apk_meta(self) -> dict[str, Any]:
+        r = requests.get(self._url('/download/apk/meta'), timeout=self.timeout, headers=self._headers())
+        if r.status_code != 200:
+            self._raise(r)
+        return self._json(r) or {}
+
+    def download_apk(
+        self,
+        dest_path: str,
+        meta: dict[str, Any] | None = None,
+        progress: Callable[[int, int], None] | None = None,
+        should_cancel: Callable[[], bool] | None = None,
+        retries: int = 3,
+    ) -> str | None:
+        # 断点续传下载安装包并按 SHA-256 校验，成功后原子替换 dest_path 并返回路径；取消返回 None。
+        # 未完成的部分保存在 dest_path + '.download'，下次调用从断点继续（If-Range 保证服务端文件未变）。
+        meta = meta or self.apk_meta()
+        if not meta.get('available'):
+            raise GlimmerAPIError('apk not available')
+        sha256 = str(meta.get('sha256') or '')
+        etag = str(meta.get('etag') or '')
+        total = int(meta.get('size') or 0)
+
+        # 已有同一版本的完整文件：无需下载
+        if sha256 and os.path.exists(dest_path) and _file_sha256(dest_path) == sha256:
+            return dest_path
+
+        tmp_path = dest_path + '.download'
+        attempt = 0
+        while True:
+            try:
+                done = self._download_part(tmp_path, etag, total, progress, should_cancel)
+                break
+            except (requests.RequestException, OSError):
+                attempt += 1
+                if attempt > retries:
+                    raise GlimmerAPIError('download interrupted')
+                time.sleep(min(10.0, 2.0 ** attempt))
+        if not done:
+            return None
+
+        if sha256 and _file_sha256(tmp_path) != sha256:
+            os.remove(tmp_path)
+            raise GlimmerAPIError('apk checksum mismatch')
+        os.replace(tmp_path, dest_path)
+        return dest_path
+
+    def _download_part(self, tmp_path, etag, total, progress, should_cancel) -> bool:
+        offset = os.path.getsize(tmp_path) if os.path.exists(tmp_path) else 0
+        if total and offset > total:
+            os.remove(tmp_path)
+            offset = 0
+        if total and offset == total:
+            return True
+
+        # 安装包是 zip，不要 gzip；续传时带 If-Range：文件已更换则服务端返回 200 全量
+        headers = {'Accept-Encoding': 'identity'}
+        if offset > 0:
+            headers['Range'] = f'bytes={offset}-'
+            if etag:
+                headers['If-Range'] = etag
+        r = requests.get(self._url('/download/apk'), headers=headers, stream=True, timeout=max(self.timeout, 12.0))
+        try:
+            if r.status_code == 416:
+                # 断点越界（文件变小/已更换）：丢弃重下
+                os.remove(tmp_path)
+                return self._download_part(tmp_path, etag, total, progress, should_cancel)
+            if r.status_code not in (200, 206):
+                self._raise(r)
+            if r.status_code == 200:
+                offset = 0
+            got = offset
+            with open(tmp_path, 'ab' if offset else 'wb') as f:
+                for chunk in r.iter_content(chunk_size=256 * 1024):
+                    if should_cancel is not None and should_cancel():
+                        return False
+                    if not chunk:
+                        continue
+                    f.write(chunk)
+                    got += len(chunk)
+                    if progress is not None:
+                        progress(got, total)
+            return True
+        finally:
+            r.close()
 
     def get_ads(self) -> dict[str, Any]:
         r = requests.get(self._url('/config/ads'), timeout=self.timeout, headers=self._headers())
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or {}
+        return self._json(r) or {}
 
     def set_ads(
         self,
@@ -289,7 +459,7 @@ class GlimmerAPI:
         )
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or {}
+        return self._json(r) or {}
 
     def create_group(self, token: str, name: str) -> dict[str, Any]:
         r = requests.post(
@@ -300,7 +470,7 @@ class GlimmerAPI:
         )
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or {}
+        return self._json(r) or {}
 
     def request_correction(self, token: str, group_id: int, date: str, reason: str = '') -> dict[str, Any]:
         r = requests.post(
@@ -311,7 +481,7 @@ class GlimmerAPI:
         )
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or {}
+        return self._json(r) or {}
 
     def punch_attendance(
         self,
@@ -341,7 +511,7 @@ class GlimmerAPI:
         )
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or {}
+        return self._json(r) or {}
 
     def attendance_month(self, token: str, month: str) -> list[dict[str, Any]]:
         r = requests.get(
@@ -352,25 +522,25 @@ class GlimmerAPI:
         )
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or []
+        return self._json(r) or []
 
     def managed_groups(self, token: str) -> list[dict[str, Any]]:
         r = requests.get(self._url('/admin/groups/managed'), timeout=self.timeout, headers=self._headers(token))
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or []
+        return self._json(r) or []
 
     def list_group_members(self, token: str, group_id: int) -> list[dict[str, Any]]:
         r = requests.get(self._url(f'/admin/groups/{int(group_id)}/members'), timeout=self.timeout, headers=self._headers(token))
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or []
+        return self._json(r) or []
 
     def group_members(self, token: str, group_id: int) -> list[dict[str, Any]]:
         r = requests.get(self._url(f'/groups/{int(group_id)}/members'), timeout=self.timeout, headers=self._headers(token))
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or []
+        return self._json(r) or []
 
     def admin_attendance_month(self, token: str, target_user_id: int, month: str) -> list[dict[str, Any]]:
         r = requests.get(
@@ -381,7 +551,7 @@ class GlimmerAPI:
         )
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or []
+        return self._json(r) or []
 
     # 团队成员离线聊天
     def chat_send(self, token: str, to_username: str, text: str) -> dict[str, Any]:
@@ -393,7 +563,7 @@ class GlimmerAPI:
         )
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or {}
+        return self._json(r) or {}
 
     def chat_history(self, token: str, peer_username: str, limit: int = 200) -> list[dict[str, Any]]:
         r = requests.get(
@@ -404,7 +574,7 @@ class GlimmerAPI:
         )
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or []
+        return self._json(r) or []
 
     def chat_unread_count(self, token: str) -> int:
         r = requests.get(
@@ -414,7 +584,7 @@ class GlimmerAPI:
         )
         if r.status_code != 200:
             self._raise(r)
-        data = r.json() or {}
+        data = self._json(r) or {}
         try:
             return int(data.get('count') or 0)
         except Exception:
@@ -429,7 +599,7 @@ class GlimmerAPI:
         )
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or {}
+        return self._json(r) or {}
 
     def chat_delete_message(self, token: str, message_id: int) -> dict[str, Any]:
         r = requests.delete(
@@ -439,7 +609,7 @@ class GlimmerAPI:
         )
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or {}
+        return self._json(r) or {}
 
     def admin_request_correction(self, token: str, user_id: int, group_id: int, date: str, reason: str = '') -> dict[str, Any]:
         r = requests.post(
@@ -450,23 +620,45 @@ class GlimmerAPI:
         )
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or {}
+        return self._json(r) or {}
 
     def admin_user_count(self, token: str) -> int:
         r = requests.get(self._url('/admin/stats/user_count'), timeout=self.timeout, headers=self._headers(token))
         if r.status_code != 200:
             self._raise(r)
-        data = r.json() or {}
+        data = self._json(r) or {}
         try:
             return int(data.get('count') or 0)
         except Exception:
             return 0
 
+    def changes(self, token: str, after: int | None = None, limit: int = 200) -> dict[str, Any]:
+        # 增量同步：返回 {events, next, more, reset}；reset 为真时需全量刷新本地缓存，再从 next 继续
+        params: dict[str, Any] = {'limit': int(limit)}
+        if after is not None:
+            params['after'] = int(after)
+        r = requests.get(self._url('/changes'), params=params, timeout=self.timeout, headers=self._headers(token))
+        if r.status_code != 200:
+            self._raise(r)
+        return self._json(r) or {}
+
+    def engineer_stats(self, token: str, refresh: bool = False) -> dict[str, Any]:
+        # 服务端按短 TTL 缓存，频繁刷新也不会重复统计
+        r = requests.get(
+            self._url('/engineer/stats'),
+            params=({'refresh': 'true'} if refresh else None),
+            timeout=self.timeout,
+            headers=self._headers(token),
+        )
+        if r.status_code != 200:
+            self._raise(r)
+        return self._json(r) or {}
+
     def engineer_user_detail(self, token: str, user_id: int) -> dict[str, Any]:
         r = requests.get(self._url(f'/engineer/users/{int(user_id)}/detail'), timeout=self.timeout, headers=self._headers(token))
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or {}
+        return self._json(r) or {}
 
     def remove_group_member(self, token: str, group_id: int, member_user_id: int) -> dict[str, Any]:
         r = requests.delete(
@@ -476,7 +668,7 @@ class GlimmerAPI:
         )
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or {}
+        return self._json(r) or {}
 
     # 工程师能力
     def engineer_create_admin(self, token: str, base_username: str = 'admin') -> dict[str, Any]:
@@ -488,7 +680,7 @@ class GlimmerAPI:
         )
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or {}
+        return self._json(r) or {}
 
     def engineer_wipe_all(self, token: str, password: str) -> dict[str, Any]:
         r = requests.post(
@@ -499,4 +691,11 @@ class GlimmerAPI:
         )
         if r.status_code != 200:
             self._raise(r)
-        return r.json() or {}
+        return self._json(r) or {}
+
+    def engineer_wipe_status(self, token: str) -> dict[str, Any]:
+        # 清理在服务端后台分批执行：{'running': bool, 'job': {'status', 'step', 'progress', 'tables', ...}}
+        r = requests.get(self._url('/engineer/wipe_all'), timeout=self.timeout, headers=self._headers(token))
+        if r.status_code != 200:
+            self._raise(r)
+        return self._json(r) or {}
@@ -171,7 +171,6 @@ import base64
 import uuid
 import math
 import webbrowser
-import requests
 
 
 
@@ -944,8 +943,6 @@ class LoginScreen(Screen):
                 base_dir = str(activity.getFilesDir().getAbsolutePath())
 
             apk_path = os.path.join(base_dir, 'glimmer_app.apk')
-            tmp_path = apk_path + '.download'
-
             cancel_flag = {'stop': False}
 
             content = BoxLayout(orientation='vertical', spacing=dp(10), padding=dp(18))
@@ -1013,50 +1010,22 @@ class LoginScreen(Screen):
 
             def work():
                 try:
-                    r = requests.get(download_url, stream=True, timeout=12)
-                    if getattr(r, 'status_code', 0) != 200:
-                        raise RuntimeError(f"下载失败（HTTP {getattr(r, 'status_code', 0)}）")
-
-                    total = 0
-                    try:
-                        total = int(r.headers.get('content-length') or 0)
-                    except Exception:
-                        total = 0
-
-                    got = 0
-                    with open(tmp_path, 'wb') as f:
-                        for chunk in r.iter_content(chunk_size=256 * 1024):
-                            if cancel_flag['stop']:
-                                try:
-                                    f.close()
-                                except Exception:
-                                    pass
-                                try:
-                                    if os.path.exists(tmp_path):
-                                        os.remove(tmp_path)
-                                except Exception:
-                                    pass
-                                return
-
-                            if not chunk:
-                                continue
-                            f.write(chunk)
-                            got += len(chunk)
-
-                            if total > 0:
-                                pct = int(got * 100 / total)
-                                Clock.schedule_once(lambda *_d, p=pct: setattr(progress, 'text', f"{p}%"), 0)
+                    # 断点续传 + SHA-256 校验：取消或断网时保留已下载部分，下次从断点继续；
+                    # 本地已是最新安装包（如更新检查时已预取）则直接分享
+                    from glimmer_api import GlimmerAPI
 
-                    try:
-                        if os.path.exists(apk_path):
-                            os.remove(apk_path)
-                    except Exception:
-                        pass
-                    try:
-                        os.replace(tmp_path, apk_path)
-                    except Exception:
-                        # fallback rename
-                        os.rename(tmp_path, apk_path)
+                    def on_progress(got, total):
+                        if total > 0:
+                            pct = int(got * 100 / total)
+                            Clock.schedule_once(lambda *_d, p=pct: setattr(progress, 'text', f"{p}%"), 0)
+
+                    path = GlimmerAPI(base_url).download_apk(
+                        apk_path,
+                        progress=on_progress,
+                        should_cancel=lambda: cancel_flag['stop'],
+                    )
+                    if not path:
+                        return
 
                     def ui_done(_dt):
                         try:
@@ -11,12 +11,13 @@
 import os
 import json
 import calendar
+import random
 import time
 
 from threading import Thread
 from datetime import datetime, time as dt_time, timedelta
 
-from glimmer_api import GlimmerAPI
+from glimmer_api import GlimmerAPI, poll_delay
 
 
 
@@ -72,6 +73,7 @@ class MainScreen(Screen):
         self.gps_enabled = False
         self.ad_marquee_jobs = {}
         self._update_prompt_version = None
+        self._apk_prefetch_version = None
         self._announcement_flash_event = None
         self._announcement_flash_on = False
         self._announcement_alert_token_system = ''
@@ -354,6 +356,25 @@ class MainScreen(Screen):
 
 
 
+    def _start_poller(self, attr: str, base_seconds: float, fn):
+        # 周期轮询：每次执行后按服务端建议（glimmer_api.poll_delay）重新计算下一次间隔。
+        # 当前待执行的事件保存在 self.<attr>，取消该事件即停止轮询（与原 schedule_interval 用法一致）。
+        holder = {}
+
+        def tick(_dt):
+            if getattr(self, attr, None) is not holder.get('ev'):
+                return
+            try:
+                fn()
+            except Exception:
+                pass
+            holder['ev'] = Clock.schedule_once(tick, poll_delay(base_seconds))
+            setattr(self, attr, holder['ev'])
+
+        holder['ev'] = Clock.schedule_once(tick, poll_delay(base_seconds))
+        setattr(self, attr, holder['ev'])
+
+
     def _start_public_config_polling(self):
         if getattr(self, '_public_cfg_ev', None):
             return
@@ -361,7 +382,7 @@ class MainScreen(Screen):
         # 进入主界面立即拉一次
         Clock.schedule_once(lambda *_: self.refresh_server_public_announcement(), 0.4)
         # 后续周期刷新（避免发布公告后客户端不更新）
-        self._public_cfg_ev = Clock.schedule_interval(lambda *_: self.refresh_server_public_announcement(), 10)
+        self._start_poller('_public_cfg_ev', 10, self.refresh_server_public_announcement)
 
 
 
@@ -437,7 +458,7 @@ class MainScreen(Screen):
         if not hasattr(self, '_feed_since_iso'):
             self._feed_since_iso = None
 
-        self._feed_poll_ev = Clock.schedule_interval(self._poll_server_feed, 8)
+        self._start_poller('_feed_poll_ev', 8, lambda: self._poll_server_feed(0))
         Clock.schedule_once(self._poll_server_feed, 0.8)
 
 
@@ -482,7 +503,7 @@ class MainScreen(Screen):
     def _start_attendance_sync_polling(self):
         if getattr(self, '_attendance_sync_ev', None):
             return
-        self._attendance_sync_ev = Clock.schedule_interval(lambda *_: self._trigger_attendance_sync(), 20)
+        self._start_poller('_attendance_sync_ev', 20, self._trigger_attendance_sync)
         Clock.schedule_once(lambda *_: self._trigger_attendance_sync(), 2)
 
 
@@ -492,7 +513,7 @@ class MainScreen(Screen):
             return
         self._net_online = None
         self._net_mon_inflight = False
-        self._net_mon_ev = Clock.schedule_interval(lambda *_: self._network_monitor_tick(), 12)
+        self._start_poller('_net_mon_ev', 12, self._network_monitor_tick)
         Clock.schedule_once(lambda *_: self._network_monitor_tick(), 1.2)
 
 
@@ -630,7 +651,7 @@ class MainScreen(Screen):
         if not self._is_admin_account():
             return
 
-        self._admin_notice_ev = Clock.schedule_interval(lambda *_: self._poll_admin_notices(), 12)
+        self._start_poller('_admin_notice_ev', 12, self._poll_admin_notices)
         Clock.schedule_once(lambda *_: self._poll_admin_notices(), 1.5)
 
 
@@ -724,7 +745,7 @@ class MainScreen(Screen):
         if not self.is_logged_in():
             return
 
-        self._chat_notice_ev = Clock.schedule_interval(lambda *_: self._poll_chat_notices(), 10)
+        self._start_poller('_chat_notice_ev', 10, self._poll_chat_notices)
         Clock.schedule_once(lambda *_: self._poll_chat_notices(), 1.2)
 
 
@@ -820,6 +841,8 @@ class MainScreen(Screen):
         if self.parse_version(latest_version) <= self.parse_version(installed_version):
             return
 
+        self.prefetch_apk(latest_version)
+
         if self._update_prompt_version == latest_version:
             return
 
@@ -835,6 +858,41 @@ class MainScreen(Screen):
         self._update_prompt_version = latest_version
         self.show_upgrade_prompt(latest_version, global_settings.get('latest_version_note', ''))
 
+    def prefetch_apk(self, latest_version):
+        # 安卓端后台预取新版安装包（断点续传 + SHA-256 校验），之后分享/安装无需等待。
+        # 开始时间在服务端给出的 stagger_seconds 内随机错开，避免发版后全体客户端同时下载。
+        if kivy_platform != 'android' or self._apk_prefetch_version == latest_version:
+            return
+        self._apk_prefetch_version = latest_version
+
+        app = App.get_running_app()
+        base_url = str(getattr(app, 'server_url', '') or get_server_url() or '').strip()
+        if not base_url:
+            return
+
+        def work():
+            try:
+                from jnius import autoclass
+
+                activity = autoclass('org.kivy.android.PythonActivity').mActivity
+                try:
+                    ext_dir = activity.getExternalFilesDir(None)
+                    base_dir = str(ext_dir.getAbsolutePath()) if ext_dir is not None else str(activity.getFilesDir().getAbsolutePath())
+                except Exception:
+                    base_dir = str(activity.getFilesDir().getAbsolutePath())
+
+                api = GlimmerAPI(base_url)
+                meta = api.apk_meta()
+                if not meta.get('available'):
+                    return
+                time.sleep(random.uniform(0, float(meta.get('stagger_seconds') or 0)))
+                api.download_apk(os.path.join(base_dir, 'glimmer_app.apk'), meta=meta)
+            except Exception:
+                # 预取失败不影响使用：用户分享时会从断点继续下载
+                return
+
+        Thread(target=work, daemon=True).start()
+
     def show_upgrade_prompt(self, latest_version, note_text):
         content = BoxLayout(orientation='vertical', spacing=dp(12), padding=dp(20))
         message = f"检测到新版本：{latest_version}\n{note_text or '建议尽快完成升级'}"
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import time
 from threading import Thread
 from datetime import datetime
 
@@ -1008,10 +1009,44 @@ class ServerAdminScreen(Screen):
         user_count_label.bind(size=lambda instance, value: setattr(instance, 'text_size', value))
         box.add_widget(user_count_label)
 
+        # 运营统计（/engineer/stats）：各角色人数、今日活跃/打卡、待审核、聊天量、数据库大小
+        stats_label = Label(text='', size_hint=(1, None), height=dp(66), color=(0.9, 0.95, 1, 1), font_size=dp(12), halign='left', valign='top')
+        stats_label.bind(size=lambda instance, value: setattr(instance, 'text_size', value))
+        box.add_widget(stats_label)
+
+        def _stats_text(data: dict) -> str:
+            roles = (data.get('users') or {}).get('by_role') or {}
+            today = data.get('today') or {}
+            pending = data.get('pending') or {}
+            chat = data.get('chat') or {}
+            db = data.get('db') or {}
+            by_hour = list(today.get('punches_by_hour') or [])
+            peak = max(range(len(by_hour)), key=lambda h: by_hour[h]) if any(by_hour) else None
+            size_mb = (int(db.get('db_bytes') or 0) + int(db.get('wal_bytes') or 0)) / 1024 / 1024
+            return '\n'.join([
+                f"工程师 {roles.get('engineer', 0)} / 管理员 {roles.get('admin', 0)} / 用户 {roles.get('user', 0)}，团队 {data.get('groups', 0)}",
+                f"今日活跃 {today.get('active_users', 0)}，打卡 {today.get('punches', 0)}"
+                + (f"（高峰 {peak:02d}时 {by_hour[peak]}）" if peak is not None else ''),
+                f"待审核：入群 {pending.get('join_requests', 0)} / 补签 {pending.get('corrections', 0)}；"
+                f"聊天 1小时 {chat.get('messages_1h', 0)} / 24小时 {chat.get('messages_24h', 0)}",
+                f"数据库 {size_mb:.1f} MB（{data.get('generated_at', '')}）",
+            ])
+
         def _load_user_count():
             def work():
+                api = self._api()
+                try:
+                    data = api.engineer_stats(self._token())
+                    cnt = int(((data.get('users') or {}).get('total')) or 0)
+                    text = _stats_text(data)
+                    Clock.schedule_once(lambda *_, c=cnt: setattr(user_count_label, 'text', f'服务器用户总人数：{c}'), 0)
+                    Clock.schedule_once(lambda *_, t=text: setattr(stats_label, 'text', t), 0)
+                    return
+                except Exception:
+                    # 旧版服务端没有 /engineer/stats：退回只显示总人数
+                    pass
                 try:
-                    cnt = int(self._api().admin_user_count(self._token()) or 0)
+                    cnt = int(api.admin_user_count(self._token()) or 0)
                     Clock.schedule_once(lambda *_, c=cnt: setattr(user_count_label, 'text', f'服务器用户总人数：{c}'), 0)
                 except Exception as e:
                     Clock.schedule_once(lambda *_, msg=str(e): setattr(user_count_label, 'text', f'服务器用户总人数：加载失败（{msg}）'), 0)
@@ -1083,9 +1118,19 @@ class ServerAdminScreen(Screen):
             def submit(pwd: str):
                 def work():
                     try:
-                        resp = self._api().engineer_wipe_all(self._token(), pwd)
+                        api = self._api()
+                        resp = api.engineer_wipe_all(self._token(), pwd)
                         ok = bool(resp.get('ok')) if isinstance(resp, dict) else True
-                        msg = '清理成功' if ok else '清理完成'
+                        # 服务端后台分批清理：轮询进度直到结束
+                        job = (resp.get('job') if isinstance(resp, dict) else None) or {}
+                        deadline = time.time() + 1800
+                        while ok and str(job.get('status') or '') == 'running' and time.time() < deadline:
+                            time.sleep(1.0)
+                            job = (api.engineer_wipe_status(self._token()) or {}).get('job') or {}
+                        status = str(job.get('status') or '')
+                        if status == 'error':
+                            raise RuntimeError(str(job.get('error') or '清理失败'))
+                        msg = '清理成功' if ok and status in ('', 'done') else '清理仍在后台进行，请稍后刷新'
                         Clock.schedule_once(lambda *_: self._popup('结果', msg), 0)
                         Clock.schedule_once(lambda *_: _load_user_count(), 0)
                     except Exception as e:
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import os
+from datetime import datetime
+
+from starlette.requests import Request
+
+from . import logsink, ratelimit, reqctx
+from .db import LOG_DIR
+
+
+# 结构化访问日志（JSONL，每个请求一行）：请求 ID、路由模板、状态码、耗时、用户 ID、SQL 条数/耗时、响应字节数、客户端 IP。
+# 请求结束时只把记录放进队列（logsink），由后台线程写盘与滚动，不给请求增加延迟；队列满时丢弃并计数。
+# 开启后 run_server.py 默认关闭 uvicorn 自带的同步访问日志（GLIMMER_UVICORN_ACCESS_LOG=1 可保留）。
+ENABLED = (os.environ.get('GLIMMER_ACCESS_LOG') or '1').strip().lower() in ('1', 'true', 'yes', 'y', 'on')
+
+ACCESS_LOG_PATH = os.environ.get('GLIMMER_ACCESS_LOG_FILE') or os.path.join(LOG_DIR, 'access.jsonl')
+
+# 不记录的路径（监控抓取等），逗号分隔
+_skip = os.environ.get('GLIMMER_ACCESS_LOG_SKIP')
+SKIP_PATHS = frozenset(p.strip() for p in ('/metrics' if _skip is None else _skip).split(',') if p.strip())
+
+_writer = logsink.writer(
+    'access',
+    ACCESS_LOG_PATH,
+    max_bytes=int(float(os.environ.get('GLIMMER_ACCESS_LOG_MAX_MB') or 50) * 1024 * 1024),
+    backups=int(os.environ.get('GLIMMER_ACCESS_LOG_BACKUPS') or 10),
+    queue_size=int(os.environ.get('GLIMMER_ACCESS_LOG_QUEUE') or 20000),
+)
+
+
+def _on_request_end(ctx: reqctx.RequestContext) -> None:
+    if not ENABLED or ctx.path in SKIP_PATHS:
+        return
+    try:
+        ip = ratelimit.client_ip(Request(ctx.scope))
+    except Exception:
+        ip = ''
+    _writer.write({
+        'ts': datetime.now().isoformat(timespec='milliseconds'),
+        'request_id': ctx.request_id,
+        'method': ctx.method,
+        'route': ctx.route,
+        'path': ctx.path,
+        'status': ctx.status or 500,
+        'ms': round(ctx.elapsed * 1000, 3),
+        'user_id': ctx.user_id,
+        'sql': ctx.sql_count,
+        'sql_ms': round(ctx.sql_time * 1000, 3),
+        'bytes': ctx.response_bytes,
+        'ip': ip,
+    })
+
+
+reqctx.add_end_hook(_on_request_end)
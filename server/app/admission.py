@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+from dataclasses import dataclass
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from . import metrics, tracing
+
+
+# 按优先级的准入控制与降载：
+#   critical（打卡/登录） > admin（管理操作） > chat（聊天） > poll（配置/公告等轮询）
+#   download（安装包下载）单独限流：发版后全员下载不会占满轮询名额，超限 503 由客户端稍后续传
+# 每类有独立的并发上限；此外全局在途请求数超过该类的 shed_at 比例时，低优先级请求直接 503 + Retry-After，
+# 让出线程池/数据库给高优先级请求。上班高峰时打卡永远优先。
+ENABLED = (os.environ.get('GLIMMER_ADMISSION') or '1').strip().lower() in ('1', 'true', 'yes', 'y', 'on')
+TOTAL_LIMIT = int(os.environ.get('GLIMMER_ADMIT_TOTAL') or 64)
+
+# 不参与准入控制（监控探针）
+_EXEMPT_PATHS = ('/health', '/metrics')
+
+
+@dataclass
+class _Class:
+    name: str
+    limit: int
+    shed_at: float
+    wait: float
+    retry_after: int
+    in_flight: int = 0
+    sem: asyncio.Semaphore | None = None
+
+
+def _env_num(name: str, default: float) -> float:
+    raw = os.environ.get(name)
+    try:
+        return float(raw) if raw not in (None, '') else float(default)
+    except Exception:
+        return float(default)
+
+
+def _make(name: str, limit: int, shed_at: float, wait: float, retry_after: int) -> _Class:
+    key = f'GLIMMER_ADMIT_{name.upper()}'
+    return _Class(
+        name=name,
+        limit=max(1, int(_env_num(f'{key}_LIMIT', limit))),
+        shed_at=_env_num(f'{key}_SHED_AT', shed_at),
+        wait=_env_num(f'{key}_WAIT', wait),
+        retry_after=max(1, int(_env_num(f'{key}_RETRY_AFTER', retry_after))),
+    )
+
+
+CLASSES: dict[str, _Class] = {
+    c.name: c
+    for c in (
+        _make('critical', TOTAL_LIMIT, 1.0, 10.0, 2),
+        _make('admin', 16, 0.9, 3.0, 5),
+        _make('chat', 16, 0.75, 1.0, 10),
+        _make('poll', 24, 0.5, 0.0, 30),
+        _make('download', 8, 0.75, 0.0, 60),
+    )
+}
+
+_total_in_flight = 0
+
+admission_in_flight = metrics.gauge('glimmer_admission_in_flight', 'Admitted requests in flight by priority class.', ('class',))
+admission_shed = metrics.counter('glimmer_admission_shed_total', 'Requests rejected with 503 by priority class.', ('class', 'reason'))
+admission_wait = metrics.histogram('glimmer_admission_wait_seconds', 'Time spent queued for admission.', ('class',))
+
+
+def classify(method: str, path: str) -> str:
+    if path == '/download/apk':
+        return 'download'
+    if path == '/attendance/punch' or path.startswith('/auth/'):
+        return 'critical'
+    if path.startswith('/chat/'):
+        return 'chat'
+    if path.startswith(('/admin/', '/engineer/', '/corrections/', '/groups/requests/')):
+        return 'admin'
+    if method != 'GET':
+        # 其余写操作（建群/发公告/改配置/入群申请等）
+        return 'admin'
+    return 'poll'
+
+
+def _shed_response(cls: _Class, reason: str):
+    admission_shed.inc(cls.name, reason)
+    body = json.dumps({'detail': 'server busy, retry later'}).encode('utf-8')
+    start = {
+        'type': 'http.response.start',
+        'status': 503,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            (b'retry-after', str(cls.retry_after).encode()),
+        ],
+    }
+    return start, {'type': 'http.response.body', 'body': body}
+
+
+def _release_if_acquired(sem: asyncio.Semaphore, task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is None:
+        sem.release()
+
+
+async def _acquire(sem: asyncio.Semaphore, timeout: float) -> bool:
+    # 不用 asyncio.wait_for(sem.acquire())：Python 3.10 上超时与 acquire 完成同时发生时，
+    # 已拿到的许可会丢失（bpo-42130），该优先级的容量永久减一。改为在独立任务里 acquire，
+    # 放弃等待（超时或请求被取消）时取消任务；任务若已拿到许可则在完成回调里归还
+    task = asyncio.ensure_future(sem.acquire())
+    try:
+        done, _ = await asyncio.wait((task,), timeout=timeout)
+    except BaseException:
+        task.cancel()
+        task.add_done_callback(lambda t: _release_if_acquired(sem, t))
+        raise
+    if done:
+        return True
+    task.cancel()
+    task.add_done_callback(lambda t: _release_if_acquired(sem, t))
+    return False
+
+
+class AdmissionMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        global _total_in_flight
+
+        path = str(scope.get('path') or '')
+        if scope['type'] != 'http' or path in _EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        cls = CLASSES[classify(str(scope.get('method') or 'GET'), path)]
+        if cls.sem is None:
+            cls.sem = asyncio.Semaphore(cls.limit)
+
+        # 全局压力：低优先级先让路
+        if cls.shed_at < 1.0 and _total_in_flight >= TOTAL_LIMIT * cls.shed_at:
+            for m in _shed_response(cls, 'pressure'):
+                await send(m)
+            return
+
+        t0 = time.perf_counter()
+        if cls.sem.locked():
+            if cls.wait <= 0:
+                for m in _shed_response(cls, 'limit'):
+                    await send(m)
+                return
+            if not await _acquire(cls.sem, cls.wait):
+                for m in _shed_response(cls, 'timeout'):
+                    await send(m)
+                return
+        else:
+            await cls.sem.acquire()
+        t1 = time.perf_counter()
+        admission_wait.observe(t1 - t0, cls.name)
+        tracing.add_span('admission', t0, t1, priority=cls.name)
+
+        cls.in_flight += 1
+        _total_in_flight += 1
+        admission_in_flight.set(cls.in_flight, cls.name)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            cls.in_flight -= 1
+            _total_in_flight -= 1
+            admission_in_flight.set(cls.in_flight, cls.name)
+            cls.sem.release()
+
+
+def install(app) -> None:
+    if ENABLED:
+        app.add_middleware(AdmissionMiddleware)
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import formatdate
+from pathlib import Path
+
+from starlette.responses import FileResponse
+
+
+# 安装包分发：
+# - 路径解析结果缓存 RECHECK 秒（原来每次下载都要遍历 public/ 目录）；每次请求只 stat 一次文件
+# - SHA-256 按 (路径, 大小, mtime) 计算一次并缓存，启动时后台预热；ETag 由 SHA-256 派生（强校验，多 worker 一致）
+# - /download/apk 支持 Range/If-Range 断点续传（Starlette FileResponse）与 If-None-Match 304
+# - /download/apk/meta 返回版本（VersionConfig）、大小、SHA-256、ETag，客户端据此校验与续传
+logger = logging.getLogger('glimmer.apk')
+
+_SERVER_DIR = Path(__file__).resolve().parents[1]  # .../server
+PUBLIC_DIR = _SERVER_DIR / 'public'
+DEFAULT_NAMES = (
+    'app.apk',
+    'latest.apk',
+    '晨曦智能打卡.apk',
+)
+MEDIA_TYPE = 'application/vnd.android.package-archive'
+
+RECHECK = float(os.environ.get('GLIMMER_APK_RECHECK') or 30)
+# 新版本发布后客户端在 [0, STAGGER] 秒内随机错开开始下载
+STAGGER = float(os.environ.get('GLIMMER_APK_STAGGER') or 600)
+
+
+@dataclass(frozen=True)
+class ApkInfo:
+    path: Path
+    size: int
+    mtime_ns: int
+    sha256: str
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.sha256[:32]}"'
+
+    @property
+    def filename(self) -> str:
+        return self.path.name
+
+
+_lock = threading.Lock()
+_hash_lock = threading.Lock()
+_resolved: tuple[float, Path | None] | None = None
+_info: ApkInfo | None = None
+
+
+def resolve_path() -> Path | None:
+    env = (os.environ.get('GLIMMER_APK_PATH') or '').strip()
+    if env:
+        p = Path(env).expanduser()
+        return p if p.is_file() else None
+
+    for name in DEFAULT_NAMES:
+        p = PUBLIC_DIR / name
+        if p.is_file():
+            return p
+
+    if PUBLIC_DIR.is_dir():
+        apks = sorted(
+            PUBLIC_DIR.glob('*.apk'),
+            key=lambda x: x.stat().st_mtime,
+            reverse=True,
+        )
+        if apks:
+            return apks[0]
+
+    return None
+
+
+def _cached_path() -> Path | None:
+    global _resolved
+    now = time.monotonic()
+    with _lock:
+        hit = _resolved
+    if hit is not None and now - hit[0] < RECHECK and (hit[1] is None or hit[1].is_file()):
+        return hit[1]
+    p = resolve_path()
+    with _lock:
+        _resolved = (now, p)
+    return p
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def current() -> tuple[ApkInfo, os.stat_result] | None:
+    # 返回当前安装包信息与 stat 结果（FileResponse 复用，避免再 stat 一次）
+    global _info
+    p = _cached_path()
+    if p is None:
+        return None
+    try:
+        st = p.stat()
+    except OSError:
+        return None
+    info = _info
+    if info is None or info.path != p or info.size != st.st_size or info.mtime_ns != st.st_mtime_ns:
+        # 同一文件只算一次：并发请求等待正在进行的计算
+        with _hash_lock:
+            info = _info
+            if info is None or info.path != p or info.size != st.st_size or info.mtime_ns != st.st_mtime_ns:
+                t0 = time.perf_counter()
+                info = ApkInfo(path=p, size=st.st_size, mtime_ns=st.st_mtime_ns, sha256=_sha256(p))
+                _info = info
+                logger.info('apk %s: %d bytes, sha256 %s (%.0fms)', p.name, info.size, info.sha256, (time.perf_counter() - t0) * 1000)
+    return info, st
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag == '*' or tag == etag:
+            return True
+    return False
+
+
+class ApkFileResponse(FileResponse):
+    # Starlette 的 If-Range 只认它自己按 mtime 生成的 ETag；这里改为认本模块的 ETag（及 Last-Modified）
+    def __init__(self, info: ApkInfo, stat_result: os.stat_result, headers: dict[str, str]):
+        super().__init__(path=str(info.path), media_type=MEDIA_TYPE, filename=info.filename, stat_result=stat_result, headers=headers)
+        self._etag = info.etag
+
+    def _should_use_range(self, http_if_range: str, stat_result: os.stat_result) -> bool:
+        return http_if_range == self._etag or http_if_range == formatdate(stat_result.st_mtime, usegmt=True)
+
+
+def warm() -> None:
+    # 启动时后台计算校验和：首个下载/元数据请求不必等待几十 MB 的哈希
+    def _run():
+        try:
+            current()
+        except Exception:
+            logger.exception('apk checksum warm-up failed')
+
+    threading.Thread(target=_run, name='glimmer-apk-warm', daemon=True).start()
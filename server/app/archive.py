@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import copy
+import gzip
+import hashlib
+import logging
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import delete, func, select
+
+from . import metrics
+from .db import BASE_DIR, engine, read_engine
+from .jobs import PeriodicThread
+from .models import Attendance
+from .responses import dumps, loads
+
+
+# 考勤冷数据归档：早于保留期的月份按“月/团队”写入 gzip 压缩的 JSONL 文件并从热表删除，
+# 热表（及其索引）大小只与保留期有关。月度查询接口遇到已归档月份时自动合并读取归档文件。
+# - 目录：<GLIMMER_ARCHIVE_DIR>/<YYYY-MM>/group_<id|none>.jsonl.gz，另有 manifest.json 记录各文件行数/校验和
+# - 一致：按团队在同一写事务内读取、写文件、删除热表，期间的修改不会丢失；文件按 id 合并去重，中途失败重跑即可
+#   （补签等后写入的旧月份数据也会在下次归档时并入）
+# - 多 worker：归档任务通过文件锁只在一个进程内执行
+logger = logging.getLogger('glimmer.archive')
+
+ARCHIVE_DIR = os.environ.get('GLIMMER_ARCHIVE_DIR') or os.path.join(BASE_DIR, 'archive')
+# 热表保留最近 N 个月（不含当月）；0 表示不归档
+KEEP_MONTHS = int(os.environ.get('GLIMMER_ARCHIVE_MONTHS') or 3)
+INTERVAL = float(os.environ.get('GLIMMER_ARCHIVE_INTERVAL') or 6 * 3600)
+
+MANIFEST_PATH = os.path.join(ARCHIVE_DIR, 'manifest.json')
+
+_DELETE_CHUNK = 500
+_FILE_CACHE_SIZE = 32
+
+_FIELDS = ('id', 'user_id', 'group_id', 'date', 'punched_at', 'punch_type', 'status', 'lat', 'lon', 'notes')
+
+archive_rows = metrics.counter('glimmer_archive_rows_total', 'Attendance rows moved to cold storage.')
+
+_thread: PeriodicThread | None = None
+_cache_lock = threading.Lock()
+_manifest_cache: tuple[int, dict] | None = None
+_file_cache: OrderedDict[tuple[str, int], dict[int, list[dict[str, Any]]]] = OrderedDict()
+
+
+def cutoff_month(today: datetime | None = None) -> str:
+    # 早于该月份（YYYY-MM）的数据归档
+    t = today or datetime.now()
+    y, m = t.year, t.month - KEEP_MONTHS
+    while m <= 0:
+        y, m = y - 1, m + 12
+    return '%04d-%02d' % (y, m)
+
+
+def _group_file(month: str, group_id: int | None) -> str:
+    return os.path.join(ARCHIVE_DIR, month, 'group_%s.jsonl.gz' % ('none' if group_id is None else int(group_id)))
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load_manifest() -> dict:
+    global _manifest_cache
+    try:
+        mtime = os.stat(MANIFEST_PATH).st_mtime_ns
+    except OSError:
+        return {'months': {}}
+    with _cache_lock:
+        if _manifest_cache is not None and _manifest_cache[0] == mtime:
+            return _manifest_cache[1]
+    with open(MANIFEST_PATH, 'rb') as f:
+        manifest = loads(f.read())
+    with _cache_lock:
+        _manifest_cache = (mtime, manifest)
+    return manifest
+
+
+def _read_file(path: str) -> list[dict[str, Any]]:
+    if not os.path.exists(path):
+        return []
+    with gzip.open(path, 'rb') as f:
+        return [loads(line) for line in f if line.strip()]
+
+
+def _load_by_user(path: str) -> dict[int, list[dict[str, Any]]]:
+    try:
+        key = (path, os.stat(path).st_mtime_ns)
+    except OSError:
+        return {}
+    with _cache_lock:
+        hit = _file_cache.get(key)
+        if hit is not None:
+            _file_cache.move_to_end(key)
+            return hit
+
+    by_user: dict[int, list[dict[str, Any]]] = {}
+    for r in _read_file(path):
+        uid = int(r.pop('user_id'))
+        r['punched_at'] = datetime.fromisoformat(r['punched_at'])
+        by_user.setdefault(uid, []).append(r)
+
+    with _cache_lock:
+        _file_cache[key] = by_user
+        while len(_file_cache) > _FILE_CACHE_SIZE:
+            _file_cache.popitem(last=False)
+    return by_user
+
+
+def has_month(month: str) -> bool:
+    return month in load_manifest().get('months', {})
+
+
+def month_rows(month: str, user_id: int) -> list[dict[str, Any]]:
+    # 返回字段与 PunchOut 一致（不含 user_id）
+    entry = load_manifest().get('months', {}).get(month)
+    if not entry:
+        return []
+    out: list[dict[str, Any]] = []
+    for info in entry.get('groups', {}).values():
+        out.extend(dict(r) for r in _load_by_user(os.path.join(ARCHIVE_DIR, info['file'])).get(int(user_id), ()))
+    return out
+
+
+def _row_dict(r) -> dict[str, Any]:
+    d = {k: getattr(r, k) for k in _FIELDS}
+    d['punch_type'] = str(d['punch_type'] or '')
+    return d
+
+
+def _group_cond(group_id: int | None):
+    return Attendance.group_id.is_(None) if group_id is None else Attendance.group_id == int(group_id)
+
+
+def _archive_group(month: str, group_id: int | None) -> int:
+    # 读快照、写归档文件/manifest、删除热表在同一个写事务内完成（SQLite 用 BEGIN IMMEDIATE 先拿写锁）：
+    # 期间补签审批、管理员修改等写入只能排在本事务之后，不会出现“归档的是旧值、热表的新值被删掉”。
+    # 文件在提交前写入：提交失败时热表仍在，月度查询按 id 以热表为准，下次归档覆盖
+    with engine.connect() as conn:
+        if engine.dialect.name == 'sqlite':
+            conn.exec_driver_sql('BEGIN IMMEDIATE')
+        rows = conn.execute(
+            select(*(getattr(Attendance, k) for k in _FIELDS))
+            .where(Attendance.date.like(f'{month}-%'), _group_cond(group_id))
+            .with_for_update()
+        ).all()
+        if not rows:
+            conn.rollback()
+            return 0
+
+        path = _group_file(month, group_id)
+        merged = {int(r['id']): r for r in _read_file(path)}
+        for r in rows:
+            merged[int(r.id)] = _row_dict(r)
+        ordered = sorted(merged.values(), key=lambda r: (str(r['punched_at']), int(r['id'])))
+        data = gzip.compress(b''.join(dumps(r) + b'\n' for r in ordered), compresslevel=9)
+        _write_atomic(path, data)
+
+        # 缓存中的 manifest 可能正被其它线程读取：改副本，写盘后再生效
+        manifest = copy.deepcopy(load_manifest())
+        entry = manifest.setdefault('months', {}).setdefault(month, {'groups': {}})
+        entry['groups']['none' if group_id is None else str(int(group_id))] = {
+            'file': os.path.relpath(path, ARCHIVE_DIR).replace(os.sep, '/'),
+            'rows': len(ordered),
+            'bytes': len(data),
+            'sha256': hashlib.sha256(data).hexdigest(),
+        }
+        entry['rows'] = sum(int(g['rows']) for g in entry['groups'].values())
+        entry['archived_at'] = datetime.utcnow().isoformat(timespec='seconds')
+        _write_atomic(MANIFEST_PATH, dumps(manifest))
+
+        ids = [int(r.id) for r in rows]
+        for i in range(0, len(ids), _DELETE_CHUNK):
+            conn.execute(delete(Attendance).where(Attendance.id.in_(ids[i:i + _DELETE_CHUNK])))
+        conn.commit()
+    return len(ids)
+
+
+def archive_month(month: str) -> int:
+    # 按团队分批：每个团队一个短写事务，事务之间让出写连接
+    with read_engine.connect() as conn:
+        groups = conn.execute(
+            select(Attendance.group_id).where(Attendance.date.like(f'{month}-%')).group_by(Attendance.group_id)
+        ).scalars().all()
+    total = 0
+    for group_id in groups:
+        total += _archive_group(month, group_id)
+    if total:
+        archive_rows.inc(amount=total)
+        logger.info('archived %d attendance rows for %s', total, month)
+    return total
+
+
+def run() -> dict[str, int]:
+    if KEEP_MONTHS <= 0:
+        return {}
+    cutoff = cutoff_month()
+    with read_engine.connect() as conn:
+        months = conn.execute(
+            select(func.substr(Attendance.date, 1, 7).label('m'))
+            .where(Attendance.date < f'{cutoff}-01')
+            .group_by('m')
+            .order_by('m')
+        ).scalars().all()
+    return {m: archive_month(m) for m in months if m}
+
+
+def wipe() -> None:
+    # 工程师清空数据时同步删除归档
+    global _manifest_cache
+    shutil.rmtree(ARCHIVE_DIR, ignore_errors=True)
+    with _cache_lock:
+        _manifest_cache = None
+        _file_cache.clear()
+
+
+def start() -> None:
+    global _thread
+    if _thread is not None or KEEP_MONTHS <= 0 or INTERVAL <= 0:
+        return
+    _thread = PeriodicThread('archive', INTERVAL, run, leader=True, initial_delay=min(INTERVAL, 60.0))
+    _thread.start()
+
+
+def stop() -> None:
+    global _thread
+    if _thread is not None:
+        _thread.stop()
+        _thread = None
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from . import metrics
+from .db import BASE_DIR, engine
+from .jobs import PeriodicThread
+from .responses import dumps, loads
+
+
+# 在线热备份（SQLite backup API）：
+# - 备份连接先开启读事务固定快照：WAL 模式下写入不受影响，备份也不会因其它连接写入而反复重启
+# - 每步复制 PAGES 页后休眠 SLEEP 秒，让出磁盘 IO，打卡等请求不会感知到备份
+# - 先写临时文件，完成后原子改名；随后对备份文件执行 PRAGMA integrity_check（不触碰线上库）
+# - 只保留最近 KEEP 份校验通过的备份；校验失败的文件改名为 .corrupt 便于排查，只保留最近 _KEEP_CORRUPT 份
+# 多 worker 部署时只有一个进程执行（文件锁选主）。
+logger = logging.getLogger('glimmer.backup')
+
+BACKUP_DIR = os.environ.get('GLIMMER_BACKUP_DIR') or os.path.join(BASE_DIR, 'backups')
+INTERVAL = float(os.environ.get('GLIMMER_BACKUP_INTERVAL') or 24 * 3600)
+KEEP = max(1, int(os.environ.get('GLIMMER_BACKUP_KEEP') or 7))
+PAGES = max(1, int(os.environ.get('GLIMMER_BACKUP_PAGES') or 256))
+SLEEP = float(os.environ.get('GLIMMER_BACKUP_SLEEP') or 0.02)
+
+STATUS_PATH = os.path.join(BACKUP_DIR, 'status.json')
+_PREFIX = 'glimmer_'
+_SUFFIX = '.sqlite'
+_CORRUPT = '.corrupt'
+# 持续校验失败时每次都会多出一份完整大小的 .corrupt 文件：只留最近几份用于排查
+_KEEP_CORRUPT = 2
+
+backup_runs = metrics.counter('glimmer_backup_runs_total', 'Online backup runs by result.', ('result',))
+backup_seconds = metrics.gauge('glimmer_backup_last_seconds', 'Duration of the last online backup.')
+
+_thread: PeriodicThread | None = None
+_run_lock = threading.Lock()
+
+
+def source_path() -> str | None:
+    # 仅支持 SQLite 文件库
+    if engine.dialect.name != 'sqlite':
+        return None
+    path = engine.url.database
+    if not path or path == ':memory:':
+        return None
+    return path
+
+
+def _load_status() -> dict:
+    try:
+        with open(STATUS_PATH, 'rb') as f:
+            return loads(f.read())
+    except Exception:
+        return {'backups': {}}
+
+
+def _save_status(status: dict) -> None:
+    tmp = STATUS_PATH + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(dumps(status))
+    os.replace(tmp, STATUS_PATH)
+
+
+def list_backups() -> list[dict]:
+    status = _load_status()
+    out = []
+    try:
+        names = sorted((n for n in os.listdir(BACKUP_DIR) if n.startswith(_PREFIX) and n.endswith(_SUFFIX)), reverse=True)
+    except OSError:
+        names = []
+    for name in names:
+        info = dict(status.get('backups', {}).get(name) or {})
+        info['file'] = name
+        info.setdefault('bytes', os.path.getsize(os.path.join(BACKUP_DIR, name)))
+        out.append(info)
+    return out
+
+
+def _copy(src_path: str, dst_path: str) -> int:
+    steps = 0
+
+    def _progress(status, remaining, total):
+        nonlocal steps
+        steps += 1
+        if SLEEP > 0 and remaining:
+            time.sleep(SLEEP)
+
+    src = sqlite3.connect(src_path, timeout=30.0)
+    dst = sqlite3.connect(dst_path)
+    try:
+        # 固定读快照：备份期间其它连接的写入不会触发备份重启
+        src.execute('BEGIN')
+        src.execute('SELECT count(*) FROM sqlite_master').fetchone()
+        src.backup(dst, pages=PAGES, progress=_progress)
+        src.execute('COMMIT')
+        # 备份文件继承了源库的 WAL 标记：改回单文件模式，便于直接拷走/恢复
+        dst.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        dst.close()
+        src.close()
+    return steps
+
+
+def verify(path: str) -> str:
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        rows = conn.execute('PRAGMA integrity_check').fetchall()
+    finally:
+        conn.close()
+    return '; '.join(str(r[0]) for r in rows[:20])
+
+
+def _rotate(status: dict) -> None:
+    backups = status.get('backups', {})
+    ok = sorted((name for name, info in backups.items() if info.get('integrity') == 'ok'), reverse=True)
+    for name in ok[KEEP:]:
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.remove(os.path.join(BACKUP_DIR, name + suffix))
+            except OSError:
+                pass
+        backups.pop(name, None)
+
+    try:
+        names = os.listdir(BACKUP_DIR)
+    except OSError:
+        names = []
+    # 文件名含时间戳，按名称倒序即从新到旧
+    corrupt = sorted((n for n in names if n.startswith(_PREFIX) and n.endswith(_SUFFIX + _CORRUPT)), reverse=True)
+    for name in corrupt[_KEEP_CORRUPT:]:
+        try:
+            os.remove(os.path.join(BACKUP_DIR, name))
+        except OSError:
+            pass
+
+
+def run() -> dict:
+    src_path = source_path()
+    if src_path is None:
+        return {'skipped': 'not a sqlite file database'}
+    if not _run_lock.acquire(blocking=False):
+        return {'skipped': 'backup already running'}
+    try:
+        os.makedirs(BACKUP_DIR, exist_ok=True)
+        name = f"{_PREFIX}{datetime.now().strftime('%Y%m%d_%H%M%S')}{_SUFFIX}"
+        final = os.path.join(BACKUP_DIR, name)
+        tmp = final + '.tmp'
+
+        t0 = time.perf_counter()
+        try:
+            steps = _copy(src_path, tmp)
+        except Exception:
+            backup_runs.inc('error')
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        os.replace(tmp, final)
+        elapsed = time.perf_counter() - t0
+        backup_seconds.set(elapsed)
+
+        integrity = verify(final)
+        info = {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'seconds': round(elapsed, 3),
+            'steps': steps,
+            'bytes': os.path.getsize(final),
+            'integrity': integrity,
+        }
+        status = _load_status()
+        if integrity != 'ok':
+            os.replace(final, final + _CORRUPT)
+            backup_runs.inc('corrupt')
+            logger.error('backup %s failed integrity_check: %s', name, integrity)
+        else:
+            status.setdefault('backups', {})[name] = info
+            backup_runs.inc('ok')
+            logger.info('backup %s done in %.2fs (%d steps)', name, elapsed, steps)
+        status['last'] = dict(info, file=name)
+        _rotate(status)
+        _save_status(status)
+        return status['last']
+    finally:
+        _run_lock.release()
+
+
+def is_running() -> bool:
+    return _run_lock.locked()
+
+
+def run_async() -> bool:
+    # 工程师手动触发：在后台线程执行，接口立即返回
+    if is_running() or source_path() is None:
+        return False
+    threading.Thread(target=_run_logged, name='glimmer-backup-manual', daemon=True).start()
+    return True
+
+
+def _run_logged() -> None:
+    try:
+        run()
+    except Exception:
+        logger.exception('manual backup failed')
+
+
+def start() -> None:
+    global _thread
+    if _thread is not None or INTERVAL <= 0 or source_path() is None:
+        return
+    _thread = PeriodicThread('backup', INTERVAL, run, leader=True)
+    _thread.start()
+
+
+def stop() -> None:
+    global _thread
+    if _thread is not None:
+        _thread.stop()
+        _thread = None
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable
+
+from . import metrics
+
+
+# 进程内短 TTL 缓存：用于手机端高频轮询、但很少变化的数据（广告/版本配置等）。
+# 写接口修改数据后调用 invalidate()；多 worker 之间由 coherence.py 按版本号同步失效，TTL 兜底保证最终一致。
+CONFIG_CACHE_TTL = float(os.environ.get('GLIMMER_CONFIG_CACHE_TTL') or 30)
+
+
+_caches: dict[str, TTLCache] = {}
+
+
+def get_cache(name: str) -> TTLCache | None:
+    return _caches.get(name)
+
+
+class TTLCache:
+    def __init__(self, name: str, ttl: float):
+        self.name = name
+        self.ttl = float(ttl)
+        self._lock = threading.Lock()
+        self._data: dict[Any, tuple[float, Any]] = {}
+        _caches[name] = self
+
+    def get_or_load(self, key: Any, loader: Callable[[], Any]) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            hit = self._data.get(key)
+        if hit is not None and hit[0] > now:
+            metrics.record_cache(self.name, True)
+            return hit[1]
+
+        metrics.record_cache(self.name, False)
+        value = loader()
+        if self.ttl > 0:
+            with self._lock:
+                self._data[key] = (now + self.ttl, value)
+        return value
+
+    async def aget_or_load(self, key: Any, loader: Callable[[], Awaitable[Any]]) -> Any:
+        # 异步接口使用：命中判断同 get_or_load，未命中时 await 加载
+        now = time.monotonic()
+        with self._lock:
+            hit = self._data.get(key)
+        if hit is not None and hit[0] > now:
+            metrics.record_cache(self.name, True)
+            return hit[1]
+
+        metrics.record_cache(self.name, False)
+        value = await loader()
+        if self.ttl > 0:
+            with self._lock:
+                self._data[key] = (now + self.ttl, value)
+        return value
+
+    def invalidate(self, key: Any = None) -> None:
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+
+config_cache = TTLCache('config', CONFIG_CACHE_TTL)
@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import and_, delete, func, or_, select
+from sqlalchemy.orm import Session
+
+from . import metrics, migrations
+from .db import aexecute, engine, read_engine
+from .jobs import PeriodicThread
+from .models import ChangeEvent, Group, Membership, Role, SchemaMeta, User
+from .responses import dumps, loads
+
+
+# 增量同步变更日志：写接口在修改数据的同一事务里追加一条紧凑的变更事件（record），
+# 客户端用 GET /changes?after=<seq> 只拉取自己可见的增量，据此刷新本地缓存（我的团队、成员列表、待审核、月度打卡、公告、配置）。
+# - 恰好一次：事件与数据同事务提交，要么都在要么都不在；SQLite 同一时刻只有一个写事务，
+#   seq 的分配顺序即提交顺序，读者不会先看到大 seq 再看到小 seq，游标推进到 next 不会漏、也不会重复
+# - 可见范围：scope + user_id/group_id（见 models.ChangeEvent），与对应列表接口的权限一致
+# - 保留期：超过 KEEP_DAYS 的事件定期删除，并把“已清理到的 seq”记入 schema_meta；
+#   游标早于它（或晚于日志头，如从备份恢复）时返回 reset，客户端全量拉取后从 next 继续
+logger = logging.getLogger('glimmer.changes')
+
+KEEP_DAYS = float(os.environ.get('GLIMMER_CHANGES_KEEP_DAYS') or 30)
+PRUNE_INTERVAL = float(os.environ.get('GLIMMER_CHANGES_PRUNE_INTERVAL') or 6 * 3600)
+# 单次请求最多扫描的 seq 区间：落后很多的客户端分多次追上，每次请求的开销有上限
+SCAN_WINDOW = 5000
+FLOOR_KEY = 'changes_floor'
+
+_PRUNE_CHUNK = 2000
+
+SCOPE_ALL = 'all'
+SCOPE_GROUP = 'group'
+SCOPE_MANAGERS = 'managers'
+SCOPE_USER = 'user'
+
+change_events = metrics.counter('glimmer_change_events_total', 'Change journal events appended, by kind.', ('kind',))
+
+_thread: PeriodicThread | None = None
+
+
+def record(
+    db: Session,
+    kind: str,
+    op: str = 'upsert',
+    entity_id: int | None = None,
+    *,
+    scope: str,
+    user_id: int | None = None,
+    group_id: int | None = None,
+    **data: Any,
+) -> None:
+    # 在调用方 commit 之前调用；新建对象需要 id 时先 db.flush()
+    db.add(ChangeEvent(
+        kind=kind,
+        op=op,
+        entity_id=(int(entity_id) if entity_id is not None else None),
+        scope=scope,
+        user_id=(int(user_id) if user_id is not None else None),
+        group_id=(int(group_id) if group_id is not None else None),
+        data=(dumps(data).decode('utf-8') if data else ''),
+    ))
+    change_events.inc(kind)
+
+
+def _floor(conn) -> int:
+    return int(migrations.get_meta(conn, FLOOR_KEY) or 0)
+
+
+def _visible(user: User):
+    uid = int(user.id)
+    conds = [
+        ChangeEvent.scope == SCOPE_ALL,
+        ChangeEvent.user_id == uid,
+        and_(
+            ChangeEvent.scope == SCOPE_GROUP,
+            ChangeEvent.group_id.in_(select(Membership.group_id).where(Membership.user_id == uid)),
+        ),
+    ]
+    # 管理范围与待审核列表一致：工程师看全部团队，管理员只看自己创建的团队
+    if user.role == Role.engineer:
+        conds.append(ChangeEvent.scope == SCOPE_MANAGERS)
+    elif user.role == Role.admin:
+        conds.append(and_(
+            ChangeEvent.scope == SCOPE_MANAGERS,
+            ChangeEvent.group_id.in_(select(Group.id).where(Group.created_by_user_id == uid)),
+        ))
+    return or_(*conds)
+
+
+async def read(db, user: User, after: int | None, limit: int) -> dict[str, Any]:
+    # db 为 get_async_read_db 的会话（异步或同步退化），语句经 aexecute 执行
+    floor_value = select(SchemaMeta.value).where(SchemaMeta.key == FLOOR_KEY).scalar_subquery()
+    head_row = (await aexecute(db, select(func.max(ChangeEvent.seq), floor_value))).one()
+    floor = int(head_row[1] or 0)
+    # 日志被清理空时 max(seq) 为空：以 floor 作为日志头，游标停在 floor 上不会反复 reset
+    head = max(int(head_row[0] or 0), floor)
+    if after is None or after < floor or after > head:
+        return {'events': [], 'next': head, 'more': False, 'reset': True}
+
+    upper = min(head, after + SCAN_WINDOW)
+    stmt = (
+        select(
+            ChangeEvent.seq,
+            ChangeEvent.kind,
+            ChangeEvent.op,
+            ChangeEvent.entity_id,
+            ChangeEvent.group_id,
+            ChangeEvent.user_id,
+            ChangeEvent.data,
+            ChangeEvent.created_at,
+        )
+        .where(ChangeEvent.seq > after, ChangeEvent.seq <= upper, _visible(user))
+        .order_by(ChangeEvent.seq.asc())
+        .limit(limit)
+    )
+    rows = (await aexecute(db, stmt)).all()
+
+    events = [
+        {
+            'seq': r.seq,
+            'kind': r.kind,
+            'op': r.op,
+            'id': r.entity_id,
+            'group_id': r.group_id,
+            'user_id': r.user_id,
+            'data': (loads(r.data) if r.data else None),
+            'at': r.created_at,
+        }
+        for r in rows
+    ]
+    if len(rows) >= limit:
+        # 本页已满：从最后一条继续
+        return {'events': events, 'next': int(rows[-1].seq), 'more': True, 'reset': False}
+    # 区间内不可见的事件直接跳过：游标推进到扫描上界
+    return {'events': events, 'next': upper, 'more': upper < head, 'reset': False}
+
+
+def prune(now: datetime | None = None) -> int:
+    if KEEP_DAYS <= 0:
+        return 0
+    cutoff = (now or datetime.utcnow()) - timedelta(days=KEEP_DAYS)
+    with read_engine.connect() as conn:
+        upto = conn.execute(select(func.max(ChangeEvent.seq)).where(ChangeEvent.created_at < cutoff)).scalar()
+    if not upto:
+        return 0
+
+    # 先推进 floor 再删除：删除途中来查询的客户端会得到 reset，而不是悄悄漏掉事件
+    with engine.begin() as conn:
+        if int(upto) > _floor(conn):
+            migrations.set_meta(conn, FLOOR_KEY, str(int(upto)))
+
+    deleted = 0
+    while True:
+        with engine.begin() as conn:
+            batch = select(ChangeEvent.seq).where(ChangeEvent.seq <= int(upto)).limit(_PRUNE_CHUNK).scalar_subquery()
+            n = int(conn.execute(delete(ChangeEvent).where(ChangeEvent.seq.in_(batch))).rowcount or 0)
+        deleted += n
+        if n < _PRUNE_CHUNK:
+            break
+    if deleted:
+        logger.info('pruned %d change events up to seq %d', deleted, int(upto))
+    return deleted
+
+
+def start() -> None:
+    global _thread
+    if _thread is not None or KEEP_DAYS <= 0 or PRUNE_INTERVAL <= 0:
+        return
+    _thread = PeriodicThread('changes', PRUNE_INTERVAL, prune, leader=True, initial_delay=min(PRUNE_INTERVAL, 120.0))
+    _thread.start()
+
+
+def stop() -> None:
+    global _thread
+    if _thread is not None:
+        _thread.stop()
+        _thread = None
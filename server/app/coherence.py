@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import logging
+import os
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from . import cache
+from .db import read_engine
+from .jobs import PeriodicThread
+from .models import CacheVersion
+
+
+# 多 worker 进程间的缓存一致性：
+# - 写接口在同一事务内 bump(db, 'config:ads')，给对应缓存项的版本号 +1
+# - 每个进程后台轮询：先看 SQLite 的 PRAGMA data_version（其它连接提交后才会变化，开销极小），
+#   变化时再读取 cache_versions，对版本号变化的缓存项做失效
+# 单进程部署时同样生效（本进程写入后也会立即本地失效）。
+logger = logging.getLogger('glimmer.coherence')
+
+POLL_INTERVAL = float(os.environ.get('GLIMMER_COHERENCE_INTERVAL') or 1.0)
+
+_known: dict[str, int] = {}
+_baselined = False
+_thread: PeriodicThread | None = None
+_conn = None
+_data_version: int | None = None
+
+
+def bump(db: Session, name: str) -> None:
+    # name 形如 '<缓存名>:<键>'，或 '<缓存名>' 表示整个缓存
+    res = db.execute(update(CacheVersion).where(CacheVersion.name == name).values(version=CacheVersion.version + 1))
+    if not res.rowcount:
+        db.add(CacheVersion(name=name, version=1))
+
+
+def invalidate_local(name: str) -> None:
+    cache_name, _, key = name.partition(':')
+    c = cache.get_cache(cache_name)
+    if c is not None:
+        c.invalidate(key or None)
+
+
+def _poll() -> None:
+    global _conn, _data_version, _baselined
+
+    if _conn is None:
+        _conn = read_engine.connect()
+    try:
+        if read_engine.dialect.name == 'sqlite':
+            dv = _conn.exec_driver_sql('PRAGMA data_version').scalar()
+            if dv == _data_version:
+                return
+            _data_version = dv
+        rows = _conn.execute(select(CacheVersion.name, CacheVersion.version)).all()
+        _conn.commit()
+    except Exception:
+        try:
+            _conn.close()
+        finally:
+            _conn = None
+        raise
+
+    for name, version in rows:
+        # 基线建立后新出现的名称同样视为变化
+        old = _known.get(name, 0 if _baselined else None)
+        _known[name] = int(version)
+        if old is not None and old != int(version):
+            invalidate_local(name)
+    _baselined = True
+
+
+def start() -> None:
+    global _thread
+    if _thread is not None or POLL_INTERVAL <= 0:
+        return
+    try:
+        # 记录启动时的版本号基线
+        _poll()
+    except Exception:
+        logger.exception('cache coherence initial poll failed')
+    _thread = PeriodicThread('cache-coherence', POLL_INTERVAL, _poll)
+    _thread.start()
+
+
+def stop() -> None:
+    global _thread, _conn
+    if _thread is not None:
+        _thread.stop()
+        _thread = None
+    if _conn is not None:
+        try:
+            _conn.close()
+        except Exception:
+            pass
+        _conn = None
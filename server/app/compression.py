@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import os
+
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .responses import loads, msgpack, msgpack_dumps, MSGPACK_MEDIA_TYPE, prefer_msgpack
+
+
+# 响应压缩：弱网下公告流/月度打卡/成员列表/聊天记录的 JSON 体积较大。
+# - GZip：超过阈值才压缩（小响应压缩收益低，反而浪费 CPU）
+# - MessagePack：客户端 Accept 包含 application/msgpack 时返回更紧凑、解析更快的二进制格式
+GZIP_MIN_BYTES = int(os.environ.get('GLIMMER_GZIP_MIN_BYTES') or 1024)
+GZIP_LEVEL = int(os.environ.get('GLIMMER_GZIP_LEVEL') or 6)
+MSGPACK_ENABLED = (os.environ.get('GLIMMER_MSGPACK') or '1').strip().lower() in ('1', 'true', 'yes', 'y', 'on')
+
+
+def _accepts_msgpack(scope: Scope) -> bool:
+    for k, v in scope.get('headers') or ():
+        if k == b'accept':
+            return b'application/msgpack' in v or b'application/x-msgpack' in v
+    return False
+
+
+class MsgPackMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or msgpack is None or not _accepts_msgpack(scope):
+            await self.app(scope, receive, send)
+            return
+
+        # 快速通道（responses.FastJSONResponse）直接按上下文偏好输出 msgpack，无需 JSON 往返
+        token = prefer_msgpack.set(True)
+        try:
+            await self.app(scope, receive, _MsgPackSender(send))
+        finally:
+            prefer_msgpack.reset(token)
+
+
+class _MsgPackSender:
+    def __init__(self, send: Send) -> None:
+        self.send = send
+        self.start: Message | None = None
+        self.chunks: list[bytes] = []
+
+    async def __call__(self, message: Message) -> None:
+        if message['type'] == 'http.response.start':
+            headers = MutableHeaders(raw=message['headers'])
+            ctype = headers.get('content-type', '')
+            if ctype.startswith('application/json'):
+                # 其它接口的 JSON 响应：缓冲后转码
+                self.start = message
+                return
+            if ctype.startswith(MSGPACK_MEDIA_TYPE):
+                headers.add_vary_header('Accept')
+            await self.send(message)
+            return
+
+        if message['type'] == 'http.response.body' and self.start is not None:
+            self.chunks.append(message.get('body', b''))
+            if message.get('more_body', False):
+                return
+            body = msgpack_dumps(loads(b''.join(self.chunks)))
+            headers = MutableHeaders(raw=self.start['headers'])
+            headers['content-type'] = MSGPACK_MEDIA_TYPE
+            headers['content-length'] = str(len(body))
+            headers.add_vary_header('Accept')
+            await self.send(self.start)
+            await self.send({'type': 'http.response.body', 'body': body})
+            return
+
+        await self.send(message)
+
+
+# 不压缩：安装包本身已是 zip，gzip 只浪费 CPU，且会破坏 Range 续传的字节偏移
+_NO_GZIP_PATHS = ('/download/apk',)
+
+
+class _GZipMiddleware(GZipMiddleware):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] == 'http' and scope.get('path') in _NO_GZIP_PATHS:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+def install(app) -> None:
+    # 注意顺序：后添加的中间件在外层；GZip 需在外层，才能同时压缩 JSON 与 msgpack
+    if MSGPACK_ENABLED:
+        app.add_middleware(MsgPackMiddleware)
+    if GZIP_MIN_BYTES > 0:
+        app.add_middleware(_GZipMiddleware, minimum_size=GZIP_MIN_BYTES, compresslevel=GZIP_LEVEL)
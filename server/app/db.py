@@ -1,10 +1,23 @@
+from __future__ import annotations
+
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+try:
+    import aiosqlite  # noqa: F401
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+except Exception:  # pragma: no cover - 可选依赖
+    aiosqlite = None
+    AsyncSession = None
+
 
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 
+# 运行期产生的日志/报告目录（SQL 剖析报告等）
+LOG_DIR = os.environ.get('GLIMMER_LOG_DIR') or os.path.join(BASE_DIR, 'logs')
+
 # 说明：仅更换文件名并不能提供真正的安全性，核心仍应依赖鉴权/权限控制。
 # 这里提供一个更“隐蔽”的默认库文件名（同时保留可用环境变量覆盖）。
 _DEFAULT_DB_FILENAME = os.environ.get('GLIMMER_DB_FILENAME') or 'data_7b1c0a9f3e2d4c6b.sqlite'
@@ -21,17 +34,182 @@ if not os.environ.get('GLIMMER_DB_PATH'):
 
 DATABASE_URL = os.environ.get('GLIMMER_DATABASE_URL') or f"sqlite:///{DB_PATH}"
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith('sqlite') else {},
-)
+# SQLite 存储参数：连接建立时逐条执行 PRAGMA。
+# - default：WAL（读写互不阻塞）+ synchronous=NORMAL（WAL 下断电最多丢最后几个事务，不会损坏库）
+# - durable：WAL + synchronous=FULL，每次提交都落盘
+# - legacy：不做任何设置（回滚日志模式，仅用于对比/排查）
+# 单项可用 GLIMMER_SQLITE_<名称> 覆盖，例如 GLIMMER_SQLITE_SYNCHRONOUS=FULL
+SQLITE_PROFILES = {
+    'default': {
+        # 必须在 journal_mode 之前、建表之前设置才生效（新库）；旧库由 maintenance.py 视情况一次性转换
+        'auto_vacuum': 'INCREMENTAL',
+        'journal_mode': 'WAL',
+        'busy_timeout': 5000,  # 毫秒：写锁被占用时等待，而不是立即报 database is locked
+        'synchronous': 'NORMAL',
+        'cache_size': -16000,  # 负数单位为 KiB，约 16MB 页缓存
+        'mmap_size': 64 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+    },
+    'durable': {
+        'auto_vacuum': 'INCREMENTAL',
+        'journal_mode': 'WAL',
+        'busy_timeout': 10000,
+        'synchronous': 'FULL',
+        'cache_size': -16000,
+        'mmap_size': 0,
+        'temp_store': 'MEMORY',
+    },
+    'legacy': {},
+}
+
+SQLITE_PROFILE = (os.environ.get('GLIMMER_SQLITE_PROFILE') or 'default').strip().lower()
+
+
+def sqlite_pragmas(profile: str = SQLITE_PROFILE) -> dict:
+    pragmas = dict(SQLITE_PROFILES.get(profile, SQLITE_PROFILES['default']))
+    for name in ('auto_vacuum', 'journal_mode', 'busy_timeout', 'synchronous', 'cache_size', 'mmap_size', 'temp_store'):
+        raw = os.environ.get(f'GLIMMER_SQLITE_{name.upper()}')
+        if raw not in (None, ''):
+            pragmas[name] = raw.strip()
+    return pragmas
+
+
+def apply_sqlite_pragmas(engine, pragmas: dict) -> None:
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        try:
+            for name, value in pragmas.items():
+                try:
+                    cur.execute(f'PRAGMA {name}={value}')
+                except Exception:
+                    # 内存库不支持 WAL 等情况：忽略单项失败
+                    pass
+        finally:
+            cur.close()
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name) or default)
+    except Exception:
+        return default
+
+
+def _is_memory_url(url: str) -> bool:
+    return url.startswith('sqlite') and (':memory:' in url or url.rstrip('/').endswith(':'))
+
+
+def make_engine(
+    url: str = DATABASE_URL,
+    profile: str = SQLITE_PROFILE,
+    pool_size: int | None = None,
+    max_overflow: int | None = None,
+    read_only: bool = False,
+):
+    kwargs = {'pool_pre_ping': True}
+    is_sqlite = url.startswith('sqlite')
+    if is_sqlite:
+        kwargs['connect_args'] = {'check_same_thread': False}
+    if not _is_memory_url(url):
+        # 连接池：默认与线程池规模相当，避免同步接口在取连接时排队
+        kwargs['pool_size'] = _env_int('GLIMMER_DB_POOL_SIZE', 10) if pool_size is None else pool_size
+        kwargs['max_overflow'] = _env_int('GLIMMER_DB_MAX_OVERFLOW', 30) if max_overflow is None else max_overflow
+        kwargs['pool_timeout'] = _env_int('GLIMMER_DB_POOL_TIMEOUT', 30)
+    eng = create_engine(url, **kwargs)
+    if is_sqlite:
+        pragmas = sqlite_pragmas(profile)
+        if read_only:
+            # 只读连接：误写会直接报错，而不是去抢写锁
+            pragmas['query_only'] = 'ON'
+        apply_sqlite_pragmas(eng, pragmas)
+    return eng
+
+
+# 读写分离：
+# - engine / SessionLocal：写连接。SQLite 同一时刻只允许一个写事务，因此默认只有 1 个写连接，
+#   写请求在连接池上排队（GLIMMER_DB_WRITERS 可调，GLIMMER_DB_POOL_TIMEOUT 为排队上限），避免多个连接争抢写锁、
+#   busy_timeout 重试造成的延迟尖刺
+# - read_engine / ReadSessionLocal：只读连接池，WAL 模式下与写事务互不阻塞，GET 接口使用
+# 内存库无法跨连接共享，此时读写共用同一个 engine；非 SQLite 数据库不限制写连接数。
+_SERIALIZE_WRITES = DATABASE_URL.startswith('sqlite') and not _is_memory_url(DATABASE_URL)
+
+if _SERIALIZE_WRITES:
+    engine = make_engine(pool_size=max(1, _env_int('GLIMMER_DB_WRITERS', 1)), max_overflow=0)
+    read_engine = make_engine(read_only=True)
+else:
+    engine = make_engine()
+    read_engine = engine
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 Base = declarative_base()
 
 
-def get_db():
+def get_write_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# 兼容旧代码：默认按写会话处理
+get_db = get_write_db
+
+
+# 异步只读会话（aiosqlite）：高频轮询接口（未读数/公告/广告/我的团队）用 async def 处理，
+# 不再占用线程池；数千个空闲长轮询客户端不需要数千个线程。bcrypt 等 CPU 密集操作仍在同步接口/线程池中。
+# 未安装 aiosqlite、非 SQLite 或内存库时退化为同步只读会话 + run_in_threadpool，接口行为不变。
+ASYNC_DB_ENABLED = (os.environ.get('GLIMMER_ASYNC_DB') or '1').strip().lower() in ('1', 'true', 'yes', 'y', 'on')
+
+async_read_engine = None
+AsyncReadSessionLocal = None
+
+if ASYNC_DB_ENABLED and aiosqlite is not None and _SERIALIZE_WRITES:
+    _async_url = 'sqlite+aiosqlite:' + DATABASE_URL.split(':', 1)[1]
+    # aiosqlite 默认 NullPool（每次新建连接与后台线程）；这里显式复用连接
+    async_read_engine = create_async_engine(
+        _async_url,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_pre_ping=True,
+        pool_size=_env_int('GLIMMER_DB_ASYNC_POOL_SIZE', 10),
+        max_overflow=_env_int('GLIMMER_DB_MAX_OVERFLOW', 30),
+        pool_timeout=_env_int('GLIMMER_DB_POOL_TIMEOUT', 30),
+    )
+    _async_pragmas = sqlite_pragmas()
+    _async_pragmas['query_only'] = 'ON'
+    apply_sqlite_pragmas(async_read_engine.sync_engine, _async_pragmas)
+    AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+
+
+async def get_async_read_db():
+    if AsyncReadSessionLocal is None:
+        db = ReadSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+        return
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+
+async def aexecute(db, statement):
+    # 兼容 get_async_read_db 的两种会话：AsyncSession 直接 await；同步会话放到线程池执行
+    if AsyncSession is not None and isinstance(db, AsyncSession):
+        return await db.execute(statement)
+    from starlette.concurrency import run_in_threadpool
+
+    return await run_in_threadpool(db.execute, statement)
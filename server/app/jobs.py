@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from typing import Callable
+
+from .db import LOG_DIR
+
+
+# 后台周期任务（守护线程）。多 worker 部署时，备份/维护等任务只应由一个进程执行：
+# leader=True 时通过文件锁选主，拿不到锁的进程跳过本轮。
+logger = logging.getLogger('glimmer.jobs')
+
+try:
+    import fcntl
+except Exception:  # pragma: no cover - Windows
+    fcntl = None
+
+try:
+    import msvcrt
+except Exception:  # pragma: no cover - POSIX
+    msvcrt = None
+
+
+class FileLock:
+    def __init__(self, path: str):
+        self.path = path
+        self._fh = None
+
+    def try_acquire(self, blocking: bool = False) -> bool:
+        if self._fh is not None:
+            return True
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fh = open(self.path, 'a+')
+        try:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX if blocking else (fcntl.LOCK_EX | fcntl.LOCK_NB))
+            elif msvcrt is not None:
+                msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+        except OSError:
+            fh.close()
+            return False
+        self._fh = fh
+        return True
+
+    def release(self) -> None:
+        fh, self._fh = self._fh, None
+        if fh is not None:
+            fh.close()
+
+
+class PeriodicThread:
+    def __init__(self, name: str, interval: float, fn: Callable[[], None], leader: bool = False, initial_delay: float | None = None):
+        self.name = name
+        self.interval = float(interval)
+        self.fn = fn
+        self.initial_delay = self.interval if initial_delay is None else float(initial_delay)
+        self._lock = FileLock(os.path.join(LOG_DIR, f'.{name}.lock')) if leader else None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is not None or self.interval <= 0:
+            return
+        self._thread = threading.Thread(target=self._run, name=f'glimmer-{self.name}', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._lock is not None:
+            self._lock.release()
+
+    def _run(self) -> None:
+        delay = self.initial_delay
+        while not self._stop.wait(delay):
+            delay = self.interval
+            if self._lock is not None and not self._lock.try_acquire():
+                continue
+            try:
+                self.fn()
+            except Exception:
+                logger.exception('background job %s failed', self.name)
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import threading
+from typing import Any
+
+from . import metrics
+from .jobs import FileLock
+
+
+# 非阻塞的 JSONL 日志写入：请求线程只把记录放进有界队列（满了直接丢弃并计数），
+# 由后台线程批量序列化、写盘与按大小滚动（path -> path.1 -> ... -> path.N）。
+# 多 worker 写同一文件：行以追加方式整行写入；滚动时持文件锁，其他进程发现文件被换掉后重新打开。
+logger = logging.getLogger('glimmer.logsink')
+
+log_records = metrics.counter('glimmer_log_records_total', 'Records handed to background JSONL writers.', ('sink', 'result'))
+
+_BATCH = 512
+
+
+class JsonlWriter:
+    def __init__(self, name: str, path: str, max_bytes: int, backups: int, queue_size: int = 10000):
+        self.name = name
+        self.path = path
+        self.max_bytes = max(0, int(max_bytes))
+        self.backups = max(0, int(backups))
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._rotate_lock = FileLock(path + '.lock')
+        self._start_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._fh = None
+        self._stop = threading.Event()
+
+    def write(self, record: dict[str, Any]) -> bool:
+        # 请求路径上只做一次 put_nowait，不做任何 I/O
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            log_records.inc(self.name, 'dropped')
+            return False
+        return True
+
+    def _start(self) -> None:
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=f'glimmer-log-{self.name}', daemon=True)
+            self._thread.start()
+
+    def close(self, timeout: float = 2.0) -> None:
+        # 停止前把队列中剩余的记录写完
+        with self._start_lock:
+            t, self._thread = self._thread, None
+        if t is None:
+            return
+        self._stop.set()
+        t.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                if self._stop.is_set():
+                    break
+                continue
+            batch = [first]
+            while len(batch) < _BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch(batch)
+                log_records.inc(self.name, 'written', amount=len(batch))
+            except Exception:
+                log_records.inc(self.name, 'dropped', amount=len(batch))
+                logger.exception('failed to write %s log', self.name)
+                self._close_file()
+        self._close_file()
+
+    def _open(self):
+        if self._fh is not None:
+            try:
+                # 其他进程滚动后，路径指向新文件：重新打开
+                if os.stat(self.path).st_ino == os.fstat(self._fh.fileno()).st_ino:
+                    return self._fh
+            except OSError:
+                pass
+            self._close_file()
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._fh = open(self.path, 'ab')
+        return self._fh
+
+    def _close_file(self) -> None:
+        fh, self._fh = self._fh, None
+        if fh is not None:
+            try:
+                fh.close()
+            except Exception:
+                pass
+
+    def _write_batch(self, batch: list[dict[str, Any]]) -> None:
+        # responses -> tracing -> logsink：在写线程里再导入，避免循环导入
+        from .responses import dumps
+
+        fh = self._open()
+        fh.write(b''.join(dumps(r) + b'\n' for r in batch))
+        fh.flush()
+        if self.max_bytes and fh.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self) -> None:
+        if not self._rotate_lock.try_acquire(blocking=True):
+            return
+        try:
+            # 拿到锁时可能已被其他进程滚动过
+            if os.path.getsize(self.path) < self.max_bytes:
+                return
+            self._close_file()
+            if self.backups <= 0:
+                os.remove(self.path)
+                return
+            for i in range(self.backups - 1, 0, -1):
+                src = f'{self.path}.{i}'
+                if os.path.exists(src):
+                    os.replace(src, f'{self.path}.{i + 1}')
+            os.replace(self.path, self.path + '.1')
+        except OSError:
+            # Windows 上其他进程仍打开着文件时无法改名：下一批再试
+            logger.warning('failed to rotate %s', self.path)
+        finally:
+            self._rotate_lock.release()
+
+
+_writers: list[JsonlWriter] = []
+
+
+def writer(name: str, path: str, max_bytes: int, backups: int, queue_size: int = 10000) -> JsonlWriter:
+    w = JsonlWriter(name, path, max_bytes, backups, queue_size)
+    _writers.append(w)
+    return w
+
+
+def close_all() -> None:
+    for w in _writers:
+        w.close()
@@ -2,20 +2,26 @@ from __future__ import annotations
 
 import os
 import random
+import threading
+import time
 from datetime import datetime, timedelta, time as dt_time
 
-from pathlib import Path
 from typing import Annotated
 
-from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
 
-from fastapi.responses import FileResponse
+from fastapi.responses import PlainTextResponse
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy import select, and_, or_, func, delete
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import select, and_, or_, case, func, delete, lambda_stmt, update
 
 from sqlalchemy.orm import Session
 
-from .db import Base, engine, get_db
+from . import accesslog, admission, apk, archive, backup, changes, coherence, compression, logsink, maintenance, metrics, migrations, profiler, ratelimit, reqctx, sqlprof, stats, tracing, wipe
+from .cache import TTLCache, config_cache
+from .db import SessionLocal, aexecute, async_read_engine, engine, get_async_read_db, get_read_db, get_write_db, read_engine
+from .jobs import FileLock
+from .responses import TracedJSONResponse, list_response, result_rows, rows_response
 from .models import (
     AdConfig,
     Announcement,
@@ -28,6 +34,7 @@ from .models import (
     JoinRequest,
     JoinStatus,
     Membership,
+    PollConfig,
     Role,
     User,
     VersionConfig,
@@ -36,10 +43,12 @@ from .schemas import (
     AdIn,
     AdOut,
     AnnouncementCreateIn,
+    ApkMetaOut,
     AnnouncementOut,
     ApplyJoinIn,
     AdminCorrectionIn,
     ChatMarkReadIn,
+    ChangesOut,
     ChatMessageOut,
     ChatSendIn,
     ChatUnreadOut,
@@ -52,6 +61,8 @@ from .schemas import (
     JoinRequestOut,
     ChangePasswordIn,
     LoginIn,
+    PollHintIn,
+    PollHintOut,
     PunchIn,
     PunchOut,
     RegisterIn,
@@ -62,54 +73,158 @@ from .schemas import (
     UserProfileOut,
     EngineerUserDetailOut,
     EngineerWipeIn,
+    SqlProfConfigIn,
+    TraceConfigIn,
     VersionIn,
     VersionOut,
 )
 
 
 
-from .security import create_access_token, decode_token, hash_password, verify_password
+from .security import config_fingerprint, create_access_token, decode_token, hash_password, verify_password
 
 
-app = FastAPI(title='Glimmer Attendance Server', version='0.1.0')
+app = FastAPI(title='Glimmer Attendance Server', version='0.1.0', default_response_class=TracedJSONResponse)
+# 中间件：后安装的在外层。metrics 在最外层，才能统计到被准入控制拒绝的请求；追踪在准入控制之外，排队时间计入追踪
+compression.install(app)
+admission.install(app)
+tracing.install(app)
+metrics.install(app)
+sqlprof.instrument_engine(engine)
+if read_engine is engine:
+    metrics.instrument_engine(engine)
+    tracing.instrument_engine(engine)
+else:
+    metrics.instrument_engine(engine, 'write')
+    metrics.instrument_engine(read_engine, 'read')
+    tracing.instrument_engine(engine, 'write')
+    tracing.instrument_engine(read_engine, 'read')
+    sqlprof.instrument_engine(read_engine)
+if async_read_engine is not None:
+    metrics.instrument_engine(async_read_engine.sync_engine, 'read_async')
+    tracing.instrument_engine(async_read_engine.sync_engine, 'read_async')
+    sqlprof.instrument_engine(async_read_engine.sync_engine)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='/auth/login')
 
 
-_SERVER_DIR = Path(__file__).resolve().parents[1]  # .../server
-_PUBLIC_DIR = _SERVER_DIR / 'public'
-_DEFAULT_APK_NAMES = (
-    'app.apk',
-    'latest.apk',
-    '晨曦智能打卡.apk',
+def _now_date_str() -> str:
+    return datetime.now().strftime('%Y-%m-%d')
+
+
+# 列表接口直接输出的列：列名与对应 *Out 模型字段一致（见 responses.rows_response）
+_PUNCH_OUT_COLUMNS = (
+    Attendance.id,
+    Attendance.date,
+    Attendance.punched_at,
+    func.coalesce(Attendance.punch_type, '').label('punch_type'),
+    Attendance.status,
+    Attendance.group_id,
+    Attendance.lat,
+    Attendance.lon,
+    Attendance.notes,
 )
 
+_GROUP_MEMBER_OUT_COLUMNS = (
+    User.id.label('user_id'),
+    User.username,
+    Membership.joined_at,
+    Membership.is_group_admin,
+)
 
-def _resolve_apk_path() -> Path | None:
-    env = (os.environ.get('GLIMMER_APK_PATH') or '').strip()
-    if env:
-        p = Path(env).expanduser()
-        return p if p.is_file() else None
+_GROUP_OUT_COLUMNS = (
+    Group.id,
+    Group.name,
+    func.coalesce(Group.group_code, '').label('group_code'),
+)
 
-    for name in _DEFAULT_APK_NAMES:
-        p = _PUBLIC_DIR / name
-        if p.is_file():
-            return p
+_ANNOUNCEMENT_OUT_COLUMNS = (
+    Announcement.id,
+    Announcement.scope,
+    Announcement.group_id,
+    Announcement.title,
+    Announcement.content,
+    Announcement.created_at,
+)
 
-    if _PUBLIC_DIR.is_dir():
-        apks = sorted(
-            _PUBLIC_DIR.glob('*.apk'),
-            key=lambda x: x.stat().st_mtime,
-            reverse=True,
-        )
-        if apks:
-            return apks[0]
 
-    return None
+# 热点读接口的语句缓存（lambda_stmt）：语句只在首次调用时构造并生成缓存键，之后按 lambda 代码位置直接命中已编译的 SQL，
+# 每次调用只从闭包变量中取出参数值。闭包里只放 int/str/list 等普通值（不要放 ORM 对象），派生值在 lambda 外算好。
+# 配合列查询 + rows_response：结果是普通行，不经过 ORM 实体构造、identity map 与属性插桩。
+def _month_punches_stmt(user_id: int, month: str):
+    pattern = f'{month}-%'
+    return lambda_stmt(
+        lambda: select(*_PUNCH_OUT_COLUMNS)
+        .where(and_(Attendance.user_id == user_id, Attendance.date.like(pattern)))
+        .order_by(Attendance.punched_at.desc())
+        .limit(400)
+    )
 
 
-def _now_date_str() -> str:
-    return datetime.now().strftime('%Y-%m-%d')
+def _my_groups_stmt(user_id: int):
+    return lambda_stmt(
+        lambda: select(*_GROUP_OUT_COLUMNS)
+        .join(Membership, Membership.group_id == Group.id)
+        .where(Membership.user_id == user_id)
+        .order_by(Group.id.desc())
+    )
+
+
+def _managed_groups_stmt(owner_id: int | None):
+    # owner_id 为 None：工程师，全部团队
+    if owner_id is None:
+        return lambda_stmt(lambda: select(*_GROUP_OUT_COLUMNS).order_by(Group.id.desc()).limit(500))
+    return lambda_stmt(
+        lambda: select(*_GROUP_OUT_COLUMNS)
+        .where(Group.created_by_user_id == owner_id)
+        .order_by(Group.id.desc())
+        .limit(500)
+    )
+
+
+def _announcement_feed_stmt(group_ids: list[int], since_dt: datetime | None):
+    stmt = lambda_stmt(
+        lambda: select(*_ANNOUNCEMENT_OUT_COLUMNS).where(
+            or_(
+                Announcement.scope == AnnouncementScope.global_,
+                and_(Announcement.scope == AnnouncementScope.group, Announcement.group_id.in_(group_ids)),
+            )
+        )
+    )
+    if since_dt is not None:
+        stmt += lambda s: s.where(Announcement.created_at > since_dt)
+    stmt += lambda s: s.order_by(Announcement.created_at.asc()).limit(200)
+    return stmt
+
+
+def _chat_history_stmt(me_id: int, me_name: str, peer_id: int, peer_name: str, limit: int):
+    # 双向会话：各自删除不互相影响；收发双方用户名在 SQL 中按 sender/receiver 选出
+    return lambda_stmt(
+        lambda: select(
+            ChatMessage.id,
+            case((ChatMessage.sender_id == peer_id, peer_name), else_=me_name).label('from_username'),
+            case((ChatMessage.receiver_id == peer_id, peer_name), else_=me_name).label('to_username'),
+            ChatMessage.text,
+            ChatMessage.created_at,
+            ChatMessage.read_at,
+        )
+        .where(
+            or_(
+                and_(
+                    ChatMessage.sender_id == me_id,
+                    ChatMessage.receiver_id == peer_id,
+                    ChatMessage.deleted_by_sender == False,
+                ),
+                and_(
+                    ChatMessage.sender_id == peer_id,
+                    ChatMessage.receiver_id == me_id,
+                    ChatMessage.deleted_by_receiver == False,
+                ),
+            )
+        )
+        .order_by(ChatMessage.created_at.asc())
+        .limit(limit)
+    )
 
 
 def _ensure_group_code_unique(db: Session) -> str:
@@ -232,10 +347,7 @@ def _share_any_group(db: Session, user_a_id: int, user_b_id: int) -> bool:
 
 
 
-def get_current_user(
-    db: Annotated[Session, Depends(get_db)],
-    token: Annotated[str, Depends(oauth2_scheme)],
-) -> User:
+def _token_username(token: str) -> str:
     try:
         payload = decode_token(token)
         username = payload.get('sub')
@@ -245,55 +357,47 @@ def get_current_user(
         raise
     except Exception:
         raise HTTPException(status_code=401, detail='invalid token')
+    return str(username)
 
-    user = _get_user_by_username(db, str(username))
+
+def _bind_user(user: User | None) -> User:
     if not user:
         raise HTTPException(status_code=401, detail='user not found')
+
+    ctx = reqctx.current()
+    if ctx is not None:
+        ctx.user_id = int(user.id)
     return user
 
 
-@app.on_event('startup')
-def _startup():
-    Base.metadata.create_all(bind=engine)
+def get_current_user(
+    db: Annotated[Session, Depends(get_read_db)],
+    token: Annotated[str, Depends(oauth2_scheme)],
+) -> User:
+    with tracing.span('auth'):
+        return _bind_user(_get_user_by_username(db, _token_username(token)))
 
-    # 轻量迁移：SQLite 旧库可能没有新增字段
-    if getattr(engine, 'dialect', None) is not None and engine.dialect.name == 'sqlite':
-        try:
-            with engine.begin() as conn:
-                # ad_config.scroll_mode
-                cols = [r[1] for r in conn.exec_driver_sql("PRAGMA table_info('ad_config')").fetchall()]
-                if 'scroll_mode' not in cols:
-                    conn.exec_driver_sql("ALTER TABLE ad_config ADD COLUMN scroll_mode VARCHAR(20) DEFAULT '垂直滚动'")
-                conn.exec_driver_sql("UPDATE ad_config SET scroll_mode='垂直滚动' WHERE scroll_mode IS NULL OR scroll_mode='' ")
-
-                # users 个人资料/密保字段
-                ucols = [r[1] for r in conn.exec_driver_sql("PRAGMA table_info('users')").fetchall()]
-                if 'real_name' not in ucols:
-                    conn.exec_driver_sql("ALTER TABLE users ADD COLUMN real_name VARCHAR(120) DEFAULT ''")
-                if 'phone' not in ucols:
-                    conn.exec_driver_sql("ALTER TABLE users ADD COLUMN phone VARCHAR(40) DEFAULT ''")
-                if 'department' not in ucols:
-                    conn.exec_driver_sql("ALTER TABLE users ADD COLUMN department VARCHAR(120) DEFAULT ''")
-                if 'security_question' not in ucols:
-                    conn.exec_driver_sql("ALTER TABLE users ADD COLUMN security_question VARCHAR(200) DEFAULT ''")
-                if 'security_answer_hash' not in ucols:
-                    conn.exec_driver_sql("ALTER TABLE users ADD COLUMN security_answer_hash VARCHAR(255) DEFAULT ''")
-                if 'last_login' not in ucols:
-                    conn.exec_driver_sql("ALTER TABLE users ADD COLUMN last_login DATETIME")
-                if 'last_login_ip' not in ucols:
-                    conn.exec_driver_sql("ALTER TABLE users ADD COLUMN last_login_ip VARCHAR(64) DEFAULT ''")
-
-                # attendance.punch_type（支持同日上/下班两次）
-                acols = [r[1] for r in conn.exec_driver_sql("PRAGMA table_info('attendance')").fetchall()]
-                if 'punch_type' not in acols:
-                    conn.exec_driver_sql("ALTER TABLE attendance ADD COLUMN punch_type VARCHAR(16) DEFAULT ''")
 
-        except Exception:
-            pass
+async def get_current_user_async(
+    db: Annotated[Session, Depends(get_async_read_db)],
+    token: Annotated[str, Depends(oauth2_scheme)],
+) -> User:
+    # 异步接口专用：JWT 校验是 HMAC，开销很小，可以直接在事件循环中执行
+    with tracing.span('auth'):
+        username = _token_username(token)
+        user = (await aexecute(db, select(User).where(User.username == username))).scalar_one_or_none()
+        return _bind_user(user)
 
 
-    from .db import SessionLocal
+@app.on_event('startup')
+def _startup():
+    # 结构已是最新时只读一行 schema_meta，不再每次启动都 create_all + 探测字段
+    migrations.upgrade(engine)
 
+    # 配置单例与引导账号的“检查后插入”在迁移文件锁内串行执行：多 worker 同时首次启动时，
+    # 后拿到锁的进程能看到先前进程已提交的数据，不会重复插入 id=999 等而启动失败
+    lock = FileLock(migrations.LOCK_PATH)
+    lock.try_acquire(blocking=True)
     db = SessionLocal()
 
     try:
@@ -302,75 +406,184 @@ def _startup():
             db.add(VersionConfig(latest_version='1.0.0', note=''))
         if not db.execute(select(AdConfig.id)).first():
             db.add(AdConfig(enabled=True, text='', image_url='', link_url=''))
+        if not db.execute(select(PollConfig.id)).first():
+            db.add(PollConfig(
+                interval_seconds=float(os.environ.get('GLIMMER_POLL_INTERVAL') or 10),
+                backoff_seconds=float(os.environ.get('GLIMMER_POLL_BACKOFF') or 0),
+            ))
         db.commit()
 
-        # 引导工程师账号（超级管理员）
-        eng_user = os.environ.get('GLIMMER_ENGINEER_USER') or 'engineer'
-        eng_pass = os.environ.get('GLIMMER_ENGINEER_PASS') or 'engineer123'
-        u = _get_user_by_username(db, eng_user)
-        if not u:
-            # 工程师固定 id=999（若该 id 已被占用，会抛错）
-            eid = _alloc_role_user_id(db, Role.engineer)
-            db.add(User(id=int(eid), username=eng_user, password_hash=hash_password(eng_pass), role=Role.engineer))
-            db.commit()
+        _bootstrap_accounts(db)
+    finally:
+        db.close()
+        lock.release()
+
+    apk.warm()
+    coherence.start()
+    archive.start()
+    backup.start()
+    maintenance.start()
+    changes.start()
+    wipe.resume()
+
+
+def _bootstrap_accounts(db: Session):
+    eng_user = os.environ.get('GLIMMER_ENGINEER_USER') or 'engineer'
+    eng_pass = os.environ.get('GLIMMER_ENGINEER_PASS') or 'engineer123'
+    admin_user = os.environ.get('GLIMMER_ADMIN_USER') or 'admin'
+    admin_pass = os.environ.get('GLIMMER_ADMIN_PASS') or 'admin123'
+
+    # 引导账号涉及多次 bcrypt（每次数百毫秒）：配置未变化且账号都在时跳过
+    fp = config_fingerprint(eng_user, eng_pass, admin_user, admin_pass)
+    present = db.execute(select(func.count(User.id)).where(User.username.in_([eng_user, admin_user]))).scalar_one()
+    if migrations.get_meta(db, 'bootstrap') == fp and int(present) >= len({eng_user, admin_user}):
+        return
 
+    # 引导工程师账号（超级管理员）
+    u = _get_user_by_username(db, eng_user)
+    if not u:
+        # 工程师固定 id=999（若该 id 已被占用，会抛错）
+        eid = _alloc_role_user_id(db, Role.engineer)
+        db.add(User(id=int(eid), username=eng_user, password_hash=hash_password(eng_pass), role=Role.engineer))
+        db.commit()
 
-        # 引导管理员账号（仅管理权限，不含工程师权限）
-        admin_user = os.environ.get('GLIMMER_ADMIN_USER') or 'admin'
-        admin_pass = os.environ.get('GLIMMER_ADMIN_PASS') or 'admin123'
-        a = _get_user_by_username(db, admin_user)
-        if not a:
-            aid = _alloc_role_user_id(db, Role.admin)
-            db.add(
-                User(
-                    id=int(aid),
-                    username=admin_user,
-                    password_hash=hash_password(admin_pass),
-                    role=Role.admin,
-                    real_name='管理员',
-                    security_question='默认密保问题',
-                    security_answer_hash=hash_password('admin'),
-                )
+
+    # 引导管理员账号（仅管理权限，不含工程师权限）
+    a = _get_user_by_username(db, admin_user)
+    if not a:
+        aid = _alloc_role_user_id(db, Role.admin)
+        db.add(
+            User(
+                id=int(aid),
+                username=admin_user,
+                password_hash=hash_password(admin_pass),
+                role=Role.admin,
+                real_name='管理员',
+                security_question='默认密保问题',
+                security_answer_hash=hash_password('admin'),
             )
+        )
+        db.commit()
+
+    else:
+        # 若已有同名账号：确保其为管理员且可用（不覆盖 engineer）
+        if a.role != Role.engineer:
+            a.role = Role.admin
+            a.password_hash = hash_password(admin_pass)
+            if not str(getattr(a, 'security_question', '') or '').strip():
+                a.security_question = '默认密保问题'
+            if not str(getattr(a, 'security_answer_hash', '') or '').strip():
+                a.security_answer_hash = hash_password('admin')
             db.commit()
 
-        else:
-            # 若已有同名账号：确保其为管理员且可用（不覆盖 engineer）
-            if a.role != Role.engineer:
-                a.role = Role.admin
-                a.password_hash = hash_password(admin_pass)
-                if not str(getattr(a, 'security_question', '') or '').strip():
-                    a.security_question = '默认密保问题'
-                if not str(getattr(a, 'security_answer_hash', '') or '').strip():
-                    a.security_answer_hash = hash_password('admin')
-                db.commit()
+    migrations.set_meta(db, 'bootstrap', fp)
+    db.commit()
 
-    finally:
-        db.close()
+
+# 每个 worker 的线程池大小（同步路由/依赖都在线程池中执行）；与 uvicorn limit_concurrency 一起限制单进程并发
+_THREADPOOL_SIZE = int(os.environ.get('GLIMMER_THREADPOOL') or 0)
+
+
+@app.on_event('startup')
+async def _tune_threadpool():
+    if _THREADPOOL_SIZE > 0:
+        import anyio.to_thread
+
+        anyio.to_thread.current_default_thread_limiter().total_tokens = _THREADPOOL_SIZE
+
+
+@app.on_event('shutdown')
+def _shutdown():
+    coherence.stop()
+    archive.stop()
+    backup.stop()
+    maintenance.stop()
+    changes.stop()
+    logsink.close_all()
+
+
+@app.on_event('shutdown')
+async def _dispose_async_engine():
+    if async_read_engine is not None:
+        await async_read_engine.dispose()
 
 
 @app.get('/health')
-def health():
-    return {'ok': True}
+def health(db: Annotated[Session, Depends(get_read_db)], response: Response):
+    # 客户端每次轮询前都会探测 /health，借此下发轮询间隔建议（body + 响应头）
+    try:
+        hint = config_cache.get_or_load('poll', lambda: _load_poll_hint(db))
+        interval, backoff = hint.interval_seconds, hint.backoff_seconds
+    except Exception:
+        interval, backoff = 10.0, 0.0
+    response.headers['X-Poll-Interval'] = f'{interval:g}'
+    response.headers['X-Poll-Backoff'] = f'{backoff:g}'
+    return {'ok': True, 'poll_interval': interval, 'poll_backoff': backoff}
 
 
-@app.get('/download/apk')
-def download_apk():
-    p = _resolve_apk_path()
-    if not p:
-        raise HTTPException(status_code=404, detail='apk not found')
+# /metrics 的工程师令牌：按用户名缓存“当前是否仍为工程师”，抓取频繁时不必每次查库
+_metrics_engineers = TTLCache('metrics_auth', 30)
+
+
+@app.get('/metrics', response_class=PlainTextResponse)
+async def metrics_endpoint(request: Request, db: Annotated[Session, Depends(get_async_read_db)]):
+    # async 路由：不占用线程池，服务繁忙时仍可抓取（静态令牌不查库）
+    async def is_engineer(username: str) -> bool:
+        async def load() -> bool:
+            role = (await aexecute(db, select(User.role).where(User.username == username))).scalar_one_or_none()
+            return role == Role.engineer
+
+        return await _metrics_engineers.aget_or_load(username, load)
+
+    if not await metrics.check_token(request.headers.get('authorization'), decode_token, is_engineer):
+        raise HTTPException(status_code=401, detail='metrics token required')
+    return PlainTextResponse(metrics.render(), media_type='text/plain; version=0.0.4')
 
-    # filename 参数会自动设置 Content-Disposition: attachment
-    return FileResponse(
-        path=str(p),
-        media_type='application/vnd.android.package-archive',
-        filename=p.name,
+
+@app.api_route('/download/apk', methods=['GET', 'HEAD'])
+def download_apk(request: Request):
+    cur = apk.current()
+    if cur is None:
+        raise HTTPException(status_code=404, detail='apk not found')
+    info, st = cur
+
+    headers = {'ETag': info.etag, 'X-Checksum-SHA256': info.sha256, 'Cache-Control': 'no-cache'}
+    if apk.etag_matches(request.headers.get('if-none-match'), info.etag):
+        return Response(status_code=304, headers=headers)
+
+    # filename 参数会自动设置 Content-Disposition: attachment；Range/If-Range 由 FileResponse 处理
+    return apk.ApkFileResponse(info, st, headers)
+
+
+@app.get('/download/apk/meta', response_model=ApkMetaOut, dependencies=[Depends(ratelimit.limit_public_ip)])
+def download_apk_meta(response: Response, db: Annotated[Session, Depends(get_read_db)]):
+    v = get_version(db)
+    cur = apk.current()
+    response.headers['Cache-Control'] = 'no-cache'
+    if cur is None:
+        return ApkMetaOut(available=False, version=v.latest_version, note=v.note, updated_at=v.updated_at, stagger_seconds=apk.STAGGER)
+    info, _st = cur
+    return ApkMetaOut(
+        available=True,
+        version=v.latest_version,
+        note=v.note,
+        updated_at=v.updated_at,
+        filename=info.filename,
+        size=info.size,
+        sha256=info.sha256,
+        etag=info.etag,
+        url='/download/apk',
+        stagger_seconds=apk.STAGGER,
     )
 
 
-@app.post('/auth/register', response_model=UserOut)
-def register(data: RegisterIn, db: Annotated[Session, Depends(get_db)]):
-    if _get_user_by_username(db, data.username):
+@app.post('/auth/register', response_model=UserOut, dependencies=[Depends(ratelimit.limit_auth_ip)])
+def register(
+    data: RegisterIn,
+    rdb: Annotated[Session, Depends(get_read_db)],
+    db: Annotated[Session, Depends(get_write_db)],
+):
+    if _get_user_by_username(rdb, data.username):
         raise HTTPException(status_code=400, detail='username exists')
 
     q = str(getattr(data, 'security_question', '') or '').strip()
@@ -378,17 +591,24 @@ def register(data: RegisterIn, db: Annotated[Session, Depends(get_db)]):
     if not q or not a:
         raise HTTPException(status_code=400, detail='security_question/security_answer required')
 
+    # bcrypt 放在占用写连接之前计算
+    password_hash = hash_password(str(data.password))
+    answer_hash = hash_password(a)
+
+    if _get_user_by_username(db, data.username):
+        raise HTTPException(status_code=400, detail='username exists')
+
     uid = _alloc_role_user_id(db, Role.user)
     user = User(
         id=int(uid),
         username=str(data.username),
-        password_hash=hash_password(str(data.password)),
+        password_hash=password_hash,
         role=Role.user,
         real_name=str(getattr(data, 'real_name', '') or '').strip(),
         phone=str(getattr(data, 'phone', '') or '').strip(),
         department=str(getattr(data, 'department', '') or '').strip(),
         security_question=q,
-        security_answer_hash=hash_password(a),
+        security_answer_hash=answer_hash,
     )
 
     db.add(user)
@@ -398,19 +618,31 @@ def register(data: RegisterIn, db: Annotated[Session, Depends(get_db)]):
 
 
 
-@app.post('/auth/login', response_model=TokenOut)
-def login(data: LoginIn, db: Annotated[Session, Depends(get_db)], request: Request):
+@app.post('/auth/login', response_model=TokenOut, dependencies=[Depends(ratelimit.limit_auth_ip)])
+def login(
+    data: LoginIn,
+    rdb: Annotated[Session, Depends(get_read_db)],
+    db: Annotated[Session, Depends(get_write_db)],
+    request: Request,
+):
+    ratelimit.check('auth_user', str(data.username))
 
-    user = _get_user_by_username(db, data.username)
+    # 校验密码（bcrypt）只用读连接，写连接只用于最后的登录时间更新
+    user = _get_user_by_username(rdb, data.username)
     if not user or not verify_password(data.password, user.password_hash):
         raise HTTPException(status_code=401, detail='bad credentials')
+    _bind_user(user)
 
     try:
-        user.last_login = datetime.utcnow()
         try:
-            user.last_login_ip = str(getattr(getattr(request, 'client', None), 'host', '') or '')
+            login_ip = str(getattr(getattr(request, 'client', None), 'host', '') or '')
         except Exception:
-            user.last_login_ip = ''
+            login_ip = ''
+        db.execute(
+            update(User)
+            .where(User.id == int(user.id))
+            .values(last_login=datetime.utcnow(), last_login_ip=login_ip)
+        )
         db.commit()
     except Exception:
         db.rollback()
@@ -427,21 +659,23 @@ def login(data: LoginIn, db: Annotated[Session, Depends(get_db)], request: Reque
 @app.post('/auth/change_password')
 def change_password(
     data: ChangePasswordIn,
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_write_db)],
     user: Annotated[User, Depends(get_current_user)],
 ):
     if not verify_password(str(data.old_password), str(user.password_hash)):
         raise HTTPException(status_code=401, detail='bad credentials')
 
-    user.password_hash = hash_password(str(data.new_password))
+    # user 来自读会话：在写会话中按 id 更新
+    new_hash = hash_password(str(data.new_password))
+    db.execute(update(User).where(User.id == int(user.id)).values(password_hash=new_hash))
     db.commit()
     return {'ok': True}
 
 
-@app.get('/auth/security_question', response_model=SecurityQuestionOut)
+@app.get('/auth/security_question', response_model=SecurityQuestionOut, dependencies=[Depends(ratelimit.limit_auth_ip)])
 def get_security_question(
     username: str = Query(..., min_length=3, max_length=64),
-    db: Annotated[Session, Depends(get_db)] = None,
+    db: Annotated[Session, Depends(get_read_db)] = None,
 ):
     u = _get_user_by_username(db, str(username))
     if not u:
@@ -452,9 +686,15 @@ def get_security_question(
     return SecurityQuestionOut(username=u.username, security_question=q)
 
 
-@app.post('/auth/reset_password')
-def reset_password(data: ResetPasswordIn, db: Annotated[Session, Depends(get_db)]):
-    u = _get_user_by_username(db, str(data.username))
+@app.post('/auth/reset_password', dependencies=[Depends(ratelimit.limit_auth_ip)])
+def reset_password(
+    data: ResetPasswordIn,
+    rdb: Annotated[Session, Depends(get_read_db)],
+    db: Annotated[Session, Depends(get_write_db)],
+):
+    ratelimit.check('auth_user', str(data.username))
+
+    u = _get_user_by_username(rdb, str(data.username))
     if not u:
         raise HTTPException(status_code=404, detail='user not found')
 
@@ -465,7 +705,8 @@ def reset_password(data: ResetPasswordIn, db: Annotated[Session, Depends(get_db)
     if not verify_password(str(data.security_answer), stored):
         raise HTTPException(status_code=401, detail='security_answer mismatch')
 
-    u.password_hash = hash_password(str(data.new_password))
+    new_hash = hash_password(str(data.new_password))
+    db.execute(update(User).where(User.id == int(u.id)).values(password_hash=new_hash))
     db.commit()
     return {'ok': True}
 
@@ -490,7 +731,7 @@ def me(user: Annotated[User, Depends(get_current_user)]):
 @app.post('/groups', response_model=GroupOut)
 def create_group(
     data: GroupCreateIn,
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_write_db)],
     user: Annotated[User, Depends(get_current_user)],
 ):
     # engineer/admin 都允许创建团队；admin 只能管理自己创建的团队
@@ -506,50 +747,41 @@ def create_group(
     # 创建者默认加入该群；工程师在该群默认拥有群管理员权限
     if not db.execute(select(Membership.id).where(and_(Membership.user_id == user.id, Membership.group_id == g.id))).first():
         db.add(Membership(user_id=user.id, group_id=g.id, is_group_admin=True))
+        changes.record(db, 'membership', scope=changes.SCOPE_GROUP, user_id=user.id, group_id=g.id, is_group_admin=True)
         db.commit()
 
     return GroupOut(id=g.id, name=g.name, group_code=g.group_code)
 
 
 @app.get('/groups/my', response_model=list[GroupOut])
-def my_groups(db: Annotated[Session, Depends(get_db)], user: Annotated[User, Depends(get_current_user)]):
-    rows = db.execute(
-        select(Group)
-        .join(Membership, Membership.group_id == Group.id)
-        .where(Membership.user_id == user.id)
-        .order_by(Group.id.desc())
-    ).scalars().all()
-    return [GroupOut(id=g.id, name=g.name, group_code=g.group_code) for g in rows]
+async def my_groups(db: Annotated[Session, Depends(get_async_read_db)], user: Annotated[User, Depends(get_current_user_async)]):
+    return rows_response(await aexecute(db, _my_groups_stmt(int(user.id))))
 
 
 @app.get('/groups/{group_id}/members', response_model=list[GroupMemberOut])
 def group_members(
     group_id: int,
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_read_db)],
     user: Annotated[User, Depends(get_current_user)],
 ):
     # 只有团队成员可见
     if not db.execute(select(Membership.id).where(and_(Membership.user_id == user.id, Membership.group_id == group_id))).first():
         raise HTTPException(status_code=403, detail='not in group')
 
-    rows = db.execute(
-        select(User.id, User.username, Membership.joined_at, Membership.is_group_admin)
+    return rows_response(db.execute(
+        select(*_GROUP_MEMBER_OUT_COLUMNS)
         .join(Membership, Membership.user_id == User.id)
         .where(Membership.group_id == group_id)
         .order_by(Membership.joined_at.asc())
         .limit(800)
-    ).all()
-    return [
-        GroupMemberOut(user_id=int(uid), username=str(uname), joined_at=joined_at, is_group_admin=bool(is_admin))
-        for uid, uname, joined_at, is_admin in rows
-    ]
+    ))
 
 
 @app.post('/groups/apply')
 def apply_join(
 
     data: ApplyJoinIn,
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_write_db)],
     user: Annotated[User, Depends(get_current_user)],
 ):
     g = db.execute(select(Group).where(Group.group_code == data.group_code)).scalar_one_or_none()
@@ -568,16 +800,32 @@ def apply_join(
 
     req = JoinRequest(user_id=user.id, group_id=g.id, status=JoinStatus.pending)
     db.add(req)
+    db.flush()
+    changes.record(db, 'join_request', entity_id=req.id, scope=changes.SCOPE_MANAGERS, user_id=user.id, group_id=g.id, status='pending')
     db.commit()
     return {'ok': True, 'detail': 'requested'}
 
 
 @app.get('/groups/requests/pending', response_model=list[JoinRequestOut])
 def pending_join_requests(
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_read_db)],
     user: Annotated[User, Depends(get_current_user)],
 ):
-    q = select(JoinRequest, User.username, Group.name, Group.group_code).join(User, User.id == JoinRequest.user_id).join(Group, Group.id == JoinRequest.group_id).where(JoinRequest.status == JoinStatus.pending)
+    q = (
+        select(
+            JoinRequest.id,
+            JoinRequest.user_id,
+            User.username,
+            JoinRequest.group_id,
+            Group.name.label('group_name'),
+            func.coalesce(Group.group_code, '').label('group_code'),
+            JoinRequest.status,
+            JoinRequest.requested_at,
+        )
+        .join(User, User.id == JoinRequest.user_id)
+        .join(Group, Group.id == JoinRequest.group_id)
+        .where(JoinRequest.status == JoinStatus.pending)
+    )
 
     if user.role == Role.engineer:
         pass
@@ -587,28 +835,13 @@ def pending_join_requests(
     else:
         raise HTTPException(status_code=403, detail='admin only')
 
-    rows = db.execute(q.order_by(JoinRequest.requested_at.asc())).all()
-
-    out: list[JoinRequestOut] = []
-    for req, username, group_name, group_code in rows:
-        out.append(JoinRequestOut(
-            id=req.id,
-            user_id=req.user_id,
-            username=username,
-            group_id=req.group_id,
-            group_name=group_name,
-            group_code=str(group_code or ''),
-            status=req.status.value,
-            requested_at=req.requested_at,
-        ))
-
-    return out
+    return rows_response(db.execute(q.order_by(JoinRequest.requested_at.asc())))
 
 
 @app.post('/groups/requests/{request_id}/approve')
 def approve_join(
     request_id: int,
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_write_db)],
     user: Annotated[User, Depends(get_current_user)],
 ):
     req = db.execute(select(JoinRequest).where(JoinRequest.id == request_id)).scalar_one_or_none()
@@ -623,6 +856,8 @@ def approve_join(
 
     mem = Membership(user_id=req.user_id, group_id=req.group_id, is_group_admin=False)
     db.add(mem)
+    changes.record(db, 'join_request', entity_id=req.id, scope=changes.SCOPE_MANAGERS, user_id=req.user_id, group_id=req.group_id, status='approved')
+    changes.record(db, 'membership', scope=changes.SCOPE_GROUP, user_id=req.user_id, group_id=req.group_id, is_group_admin=False)
     db.commit()
     return {'ok': True}
 
@@ -630,7 +865,7 @@ def approve_join(
 @app.post('/groups/requests/{request_id}/reject')
 def reject_join(
     request_id: int,
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_write_db)],
     user: Annotated[User, Depends(get_current_user)],
 ):
     req = db.execute(select(JoinRequest).where(JoinRequest.id == request_id)).scalar_one_or_none()
@@ -642,6 +877,7 @@ def reject_join(
     req.status = JoinStatus.rejected
     req.reviewed_at = datetime.utcnow()
     req.reviewed_by_user_id = user.id
+    changes.record(db, 'join_request', entity_id=req.id, scope=changes.SCOPE_MANAGERS, user_id=req.user_id, group_id=req.group_id, status='rejected')
     db.commit()
     return {'ok': True}
 
@@ -650,7 +886,7 @@ def reject_join(
 def set_group_admin(
     group_id: int,
     member_user_id: int,
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_write_db)],
     user: Annotated[User, Depends(get_current_user)],
     is_admin: bool = True,
 ):
@@ -684,6 +920,7 @@ def set_group_admin(
             if not still_admin:
                 target.role = Role.user
 
+    changes.record(db, 'membership', scope=changes.SCOPE_GROUP, user_id=member_user_id, group_id=group_id, is_group_admin=bool(mem.is_group_admin))
     db.commit()
     return {'ok': True}
 
@@ -691,7 +928,7 @@ def set_group_admin(
 @app.post('/announcements/global', response_model=AnnouncementOut)
 def post_global_announcement(
     data: AnnouncementCreateIn,
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_write_db)],
     user: Annotated[User, Depends(get_current_user)],
 ):
     # engineer/admin 都允许创建团队；admin 只能管理自己创建的团队
@@ -704,6 +941,8 @@ def post_global_announcement(
     a = Announcement(scope=AnnouncementScope.global_, group_id=None, title=data.title, content=data.content, created_by_user_id=user.id)
 
     db.add(a)
+    db.flush()
+    changes.record(db, 'announcement', entity_id=a.id, scope=changes.SCOPE_ALL)
     db.commit()
     db.refresh(a)
     return AnnouncementOut(id=a.id, scope=a.scope.value, group_id=a.group_id, title=a.title, content=a.content, created_at=a.created_at)
@@ -713,7 +952,7 @@ def post_global_announcement(
 def post_group_announcement(
     group_id: int,
     data: AnnouncementCreateIn,
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_write_db)],
     user: Annotated[User, Depends(get_current_user)],
 ):
     _require_group_admin(db, user, group_id)
@@ -725,15 +964,17 @@ def post_group_announcement(
     a = Announcement(scope=AnnouncementScope.group, group_id=group_id, title=data.title, content=data.content, created_by_user_id=user.id)
 
     db.add(a)
+    db.flush()
+    changes.record(db, 'announcement', entity_id=a.id, scope=changes.SCOPE_GROUP, group_id=group_id)
     db.commit()
     db.refresh(a)
     return AnnouncementOut(id=a.id, scope=a.scope.value, group_id=a.group_id, title=a.title, content=a.content, created_at=a.created_at)
 
 
 @app.get('/announcements/feed', response_model=list[AnnouncementOut])
-def announcements_feed(
-    db: Annotated[Session, Depends(get_db)],
-    user: Annotated[User, Depends(get_current_user)],
+async def announcements_feed(
+    db: Annotated[Session, Depends(get_async_read_db)],
+    user: Annotated[User, Depends(get_current_user_async)],
     since: str | None = Query(default=None, description='ISO datetime, e.g. 2026-01-28T10:00:00'),
 ):
 
@@ -744,31 +985,35 @@ def announcements_feed(
         except Exception:
             raise HTTPException(status_code=400, detail='bad since')
 
-    group_ids = db.execute(select(Membership.group_id).where(Membership.user_id == user.id)).scalars().all()
+    group_ids = (await aexecute(db, select(Membership.group_id).where(Membership.user_id == user.id))).scalars().all()
+    return rows_response(await aexecute(db, _announcement_feed_stmt(list(group_ids) or [-1], since_dt)))
 
-    q = select(Announcement).where(
-        or_(
-            Announcement.scope == AnnouncementScope.global_,
-            and_(Announcement.scope == AnnouncementScope.group, Announcement.group_id.in_(group_ids or [-1])),
-        )
-    )
-    if since_dt:
-        q = q.where(Announcement.created_at > since_dt)
 
-    rows = db.execute(q.order_by(Announcement.created_at.asc()).limit(200)).scalars().all()
-    return [AnnouncementOut(id=a.id, scope=a.scope.value, group_id=a.group_id, title=a.title, content=a.content, created_at=a.created_at) for a in rows]
+@app.get('/changes', response_model=ChangesOut)
+async def list_changes(
+    db: Annotated[Session, Depends(get_async_read_db)],
+    user: Annotated[User, Depends(get_current_user_async)],
+    after: int | None = Query(default=None, ge=0, description='上次返回的 next；不传表示首次同步'),
+    limit: int = Query(default=200, ge=1, le=500),
+):
+    # 增量同步：只返回 after 之后当前用户可见的变更（见 changes.py）；reset=true 时客户端全量拉取后从 next 继续
+    return await changes.read(db, user, after, int(limit))
 
 
-@app.get('/config/version', response_model=VersionOut)
-def get_version(db: Annotated[Session, Depends(get_db)]):
+def _load_version(db: Session) -> VersionOut:
     v = db.execute(select(VersionConfig).order_by(VersionConfig.id.asc())).scalar_one()
     return VersionOut(latest_version=v.latest_version, note=v.note, updated_at=v.updated_at)
 
 
+@app.get('/config/version', response_model=VersionOut)
+def get_version(db: Annotated[Session, Depends(get_read_db)]):
+    return config_cache.get_or_load('version', lambda: _load_version(db))
+
+
 @app.post('/config/version', response_model=VersionOut)
 def set_version(
     data: VersionIn,
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_write_db)],
     user: Annotated[User, Depends(get_current_user)],
 ):
     # engineer/admin 都允许创建团队；admin 只能管理自己创建的团队
@@ -780,10 +1025,44 @@ def set_version(
     v.note = data.note
     v.updated_at = datetime.utcnow()
     v.updated_by_user_id = user.id
+    coherence.bump(db, 'config:version')
+    changes.record(db, 'config', scope=changes.SCOPE_ALL, name='version')
     db.commit()
+    config_cache.invalidate('version')
     return VersionOut(latest_version=v.latest_version, note=v.note, updated_at=v.updated_at)
 
 
+def _load_poll_hint(db: Session) -> PollHintOut:
+    p = db.execute(select(PollConfig).order_by(PollConfig.id.asc())).scalar_one()
+    return PollHintOut(interval_seconds=p.interval_seconds, backoff_seconds=p.backoff_seconds, updated_at=p.updated_at)
+
+
+@app.get('/config/poll', response_model=PollHintOut)
+def get_poll_hint(db: Annotated[Session, Depends(get_read_db)]):
+    return config_cache.get_or_load('poll', lambda: _load_poll_hint(db))
+
+
+@app.post('/config/poll', response_model=PollHintOut)
+def set_poll_hint(
+    data: PollHintIn,
+    db: Annotated[Session, Depends(get_write_db)],
+    user: Annotated[User, Depends(get_current_user)],
+):
+    # 故障/高峰期统一拉长全体客户端的轮询间隔（如 10s -> 60s），恢复后再调回
+    _require_engineer(user)
+
+    p = db.execute(select(PollConfig).order_by(PollConfig.id.asc())).scalar_one()
+    p.interval_seconds = float(data.interval_seconds)
+    p.backoff_seconds = float(data.backoff_seconds)
+    p.updated_at = datetime.utcnow()
+    p.updated_by_user_id = user.id
+    coherence.bump(db, 'config:poll')
+    changes.record(db, 'config', scope=changes.SCOPE_ALL, name='poll')
+    db.commit()
+    config_cache.invalidate('poll')
+    return PollHintOut(interval_seconds=p.interval_seconds, backoff_seconds=p.backoff_seconds, updated_at=p.updated_at)
+
+
 def _normalize_scroll_mode(v: str) -> str:
     x = str(v or '').strip()
     if x in ('水平滚动', '垂直滚动', '静止'):
@@ -796,9 +1075,11 @@ def _normalize_scroll_mode(v: str) -> str:
     return '垂直滚动'
 
 
-@app.get('/config/ads', response_model=AdOut)
-def get_ads(db: Annotated[Session, Depends(get_db)]):
-    a = db.execute(select(AdConfig).order_by(AdConfig.id.asc())).scalar_one()
+def _load_ads(db: Session) -> AdOut:
+    return _ad_out(db.execute(select(AdConfig).order_by(AdConfig.id.asc())).scalar_one())
+
+
+def _ad_out(a: AdConfig) -> AdOut:
     return AdOut(
         enabled=a.enabled,
         text=a.text,
@@ -809,10 +1090,18 @@ def get_ads(db: Annotated[Session, Depends(get_db)]):
     )
 
 
+@app.get('/config/ads', response_model=AdOut)
+async def get_ads(db: Annotated[Session, Depends(get_async_read_db)]):
+    async def load():
+        return _ad_out((await aexecute(db, select(AdConfig).order_by(AdConfig.id.asc()))).scalar_one())
+
+    return await config_cache.aget_or_load('ads', load)
+
+
 @app.post('/config/ads', response_model=AdOut)
 def set_ads(
     data: AdIn,
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_write_db)],
     user: Annotated[User, Depends(get_current_user)],
 ):
     # engineer/admin 都允许创建团队；admin 只能管理自己创建的团队
@@ -834,7 +1123,10 @@ def set_ads(
     a.scroll_mode = _normalize_scroll_mode(getattr(data, 'scroll_mode', '') or '垂直滚动')
     a.updated_at = datetime.utcnow()
     a.updated_by_user_id = user.id
+    coherence.bump(db, 'config:ads')
+    changes.record(db, 'config', scope=changes.SCOPE_ALL, name='ads')
     db.commit()
+    config_cache.invalidate('ads')
     return AdOut(
         enabled=a.enabled,
         text=a.text,
@@ -846,10 +1138,18 @@ def set_ads(
 
 
 
+def _record_punch(db: Session, r: Attendance) -> None:
+    # 本人与所在团队的管理者可见（管理端查看成员月度打卡）；客户端按 date 的月份刷新缓存
+    changes.record(
+        db, 'attendance', entity_id=r.id, scope=changes.SCOPE_MANAGERS, user_id=r.user_id, group_id=r.group_id,
+        date=r.date, punch_type=str(r.punch_type or ''),
+    )
+
+
 @app.post('/attendance/punch', response_model=PunchOut)
 def punch(
     data: PunchIn,
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_write_db)],
     user: Annotated[User, Depends(get_current_user)],
 ):
     # 若指定群，则要求是群成员
@@ -939,6 +1239,7 @@ def punch(
             target.lat = data.lat
             target.lon = data.lon
             target.notes = (data.notes or '')[:200]
+            _record_punch(db, target)
             db.commit()
             db.refresh(target)
         return PunchOut(
@@ -966,6 +1267,8 @@ def punch(
     )
 
     db.add(r)
+    db.flush()
+    _record_punch(db, r)
     db.commit()
     db.refresh(r)
     return PunchOut(
@@ -982,41 +1285,35 @@ def punch(
 
 
 
+def _month_punches(db: Session, user_id: int, month: str):
+    result = db.execute(_month_punches_stmt(user_id, month))
+    if not archive.has_month(month):
+        return rows_response(result)
+
+    # 已归档月份：热表（归档后补签写入的数据）+ 归档文件；归档进行中同一条可能两边都有，按 id 去重
+    rows = result_rows(result)
+    seen = {int(r['id']) for r in rows}
+    rows.extend(r for r in archive.month_rows(month, user_id) if int(r['id']) not in seen)
+    rows.sort(key=lambda r: r['punched_at'], reverse=True)
+    return list_response(rows[:400])
+
+
 @app.get('/attendance/month', response_model=list[PunchOut])
 def attendance_month(
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_read_db)],
     user: Annotated[User, Depends(get_current_user)],
     month: str = Query(..., description='YYYY-MM'),
 ):
 
     if len(month) != 7:
         raise HTTPException(status_code=400, detail='bad month')
-    rows = db.execute(
-        select(Attendance)
-        .where(and_(Attendance.user_id == user.id, Attendance.date.like(f"{month}-%")))
-        .order_by(Attendance.punched_at.desc())
-        .limit(400)
-    ).scalars().all()
-    return [
-        PunchOut(
-            id=r.id,
-            date=r.date,
-            punched_at=r.punched_at,
-            punch_type=str(getattr(r, 'punch_type', '') or ''),
-            status=r.status,
-            group_id=r.group_id,
-            lat=r.lat,
-            lon=r.lon,
-            notes=r.notes,
-        )
-        for r in rows
-    ]
+    return _month_punches(db, int(user.id), month)
 
 
 @app.get('/admin/users/{target_user_id}/attendance/month', response_model=list[PunchOut])
 def admin_attendance_month(
     target_user_id: int,
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_read_db)],
     user: Annotated[User, Depends(get_current_user)],
     month: str = Query(..., description='YYYY-MM'),
 ):
@@ -1043,33 +1340,14 @@ def admin_attendance_month(
 
 
 
-    rows = db.execute(
-        select(Attendance)
-        .where(and_(Attendance.user_id == int(target_user_id), Attendance.date.like(f"{month}-%")))
-        .order_by(Attendance.punched_at.desc())
-        .limit(400)
-    ).scalars().all()
-    return [
-        PunchOut(
-            id=r.id,
-            date=r.date,
-            punched_at=r.punched_at,
-            punch_type=str(getattr(r, 'punch_type', '') or ''),
-            status=r.status,
-            group_id=r.group_id,
-            lat=r.lat,
-            lon=r.lon,
-            notes=r.notes,
-        )
-        for r in rows
-    ]
+    return _month_punches(db, int(target_user_id), month)
 
 
 
 @app.post('/corrections/request', response_model=CorrectionOut)
 def request_correction(
     data: CorrectionIn,
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_write_db)],
     user: Annotated[User, Depends(get_current_user)],
 ):
     # 只有入群用户可以申请补录
@@ -1084,6 +1362,8 @@ def request_correction(
         status=CorrectionStatus.pending,
     )
     db.add(req)
+    db.flush()
+    changes.record(db, 'correction', entity_id=req.id, scope=changes.SCOPE_MANAGERS, user_id=req.user_id, group_id=req.group_id, status='pending', date=req.date)
     db.commit()
     db.refresh(req)
     return CorrectionOut(
@@ -1101,7 +1381,7 @@ def request_correction(
 @app.post('/admin/corrections/request', response_model=CorrectionOut)
 def admin_request_correction(
     data: AdminCorrectionIn,
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_write_db)],
     user: Annotated[User, Depends(get_current_user)],
 ):
     # 管理端：工程师允许；管理员仅允许对自己创建的团队操作
@@ -1124,6 +1404,8 @@ def admin_request_correction(
         status=CorrectionStatus.pending,
     )
     db.add(req)
+    db.flush()
+    changes.record(db, 'correction', entity_id=req.id, scope=changes.SCOPE_MANAGERS, user_id=req.user_id, group_id=req.group_id, status='pending', date=req.date)
     db.commit()
     db.refresh(req)
     return CorrectionOut(
@@ -1141,11 +1423,20 @@ def admin_request_correction(
 @app.get('/corrections/pending', response_model=list[CorrectionOut])
 def pending_corrections(
 
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_read_db)],
     user: Annotated[User, Depends(get_current_user)],
 ):
     q = (
-        select(CorrectionRequest, User.username)
+        select(
+            CorrectionRequest.id,
+            CorrectionRequest.user_id,
+            User.username,
+            CorrectionRequest.group_id,
+            CorrectionRequest.date,
+            CorrectionRequest.reason,
+            CorrectionRequest.status,
+            CorrectionRequest.requested_at,
+        )
         .join(User, User.id == CorrectionRequest.user_id)
         .join(Group, Group.id == CorrectionRequest.group_id)
         .where(CorrectionRequest.status == CorrectionStatus.pending)
@@ -1158,27 +1449,13 @@ def pending_corrections(
     else:
         raise HTTPException(status_code=403, detail='admin only')
 
-    rows = db.execute(q.order_by(CorrectionRequest.requested_at.asc()).limit(200)).all()
-
-    out: list[CorrectionOut] = []
-    for req, username in rows:
-        out.append(CorrectionOut(
-            id=req.id,
-            user_id=req.user_id,
-            username=username,
-            group_id=req.group_id,
-            date=req.date,
-            reason=req.reason,
-            status=req.status.value,
-            requested_at=req.requested_at,
-        ))
-    return out
+    return rows_response(db.execute(q.order_by(CorrectionRequest.requested_at.asc()).limit(200)))
 
 
 @app.post('/corrections/{request_id}/approve')
 def approve_correction(
     request_id: int,
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_write_db)],
     user: Annotated[User, Depends(get_current_user)],
 ):
     req = db.execute(select(CorrectionRequest).where(CorrectionRequest.id == request_id)).scalar_one_or_none()
@@ -1203,6 +1480,9 @@ def approve_correction(
         notes=req.reason or '',
     )
     db.add(r)
+    db.flush()
+    changes.record(db, 'correction', entity_id=req.id, scope=changes.SCOPE_MANAGERS, user_id=req.user_id, group_id=req.group_id, status='approved', date=req.date)
+    _record_punch(db, r)
 
     db.commit()
     return {'ok': True}
@@ -1211,7 +1491,7 @@ def approve_correction(
 @app.post('/corrections/{request_id}/reject')
 def reject_correction(
     request_id: int,
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_write_db)],
     user: Annotated[User, Depends(get_current_user)],
 ):
     req = db.execute(select(CorrectionRequest).where(CorrectionRequest.id == request_id)).scalar_one_or_none()
@@ -1223,30 +1503,24 @@ def reject_correction(
     req.status = CorrectionStatus.rejected
     req.reviewed_at = datetime.utcnow()
     req.reviewed_by_user_id = user.id
+    changes.record(db, 'correction', entity_id=req.id, scope=changes.SCOPE_MANAGERS, user_id=req.user_id, group_id=req.group_id, status='rejected', date=req.date)
     db.commit()
     return {'ok': True}
 
 
 @app.get('/admin/groups/managed', response_model=list[GroupOut])
 def managed_groups(
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_read_db)],
     user: Annotated[User, Depends(get_current_user)],
 ):
     # 工程师：可管理全部群；管理员：默认只看到/管理自己创建的群
     if user.role == Role.engineer:
-        rows = db.execute(select(Group).order_by(Group.id.desc()).limit(500)).scalars().all()
-        return [GroupOut(id=g.id, name=g.name, group_code=g.group_code) for g in rows]
+        return rows_response(db.execute(_managed_groups_stmt(None)))
 
     if user.role != Role.admin:
         raise HTTPException(status_code=403, detail='admin only')
 
-    rows = db.execute(
-        select(Group)
-        .where(Group.created_by_user_id == user.id)
-        .order_by(Group.id.desc())
-        .limit(500)
-    ).scalars().all()
-    return [GroupOut(id=g.id, name=g.name, group_code=g.group_code) for g in rows]
+    return rows_response(db.execute(_managed_groups_stmt(int(user.id))))
 
 
 
@@ -1254,21 +1528,17 @@ def managed_groups(
 @app.get('/admin/groups/{group_id}/members', response_model=list[GroupMemberOut])
 def list_group_members(
     group_id: int,
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_read_db)],
     user: Annotated[User, Depends(get_current_user)],
 ):
     _require_group_admin(db, user, group_id)
-    rows = db.execute(
-        select(User.id, User.username, Membership.joined_at, Membership.is_group_admin)
+    return rows_response(db.execute(
+        select(*_GROUP_MEMBER_OUT_COLUMNS)
         .join(Membership, Membership.user_id == User.id)
         .where(Membership.group_id == group_id)
         .order_by(Membership.joined_at.asc())
         .limit(800)
-    ).all()
-    return [
-        GroupMemberOut(user_id=int(uid), username=str(uname), joined_at=joined_at, is_group_admin=bool(is_admin))
-        for uid, uname, joined_at, is_admin in rows
-    ]
+    ))
 
 
 
@@ -1276,7 +1546,7 @@ def list_group_members(
 def remove_group_member(
     group_id: int,
     member_user_id: int,
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_write_db)],
     user: Annotated[User, Depends(get_current_user)],
 ):
     _require_group_admin(db, user, group_id)
@@ -1290,32 +1560,36 @@ def remove_group_member(
     if not mem:
         raise HTTPException(status_code=404, detail='membership not found')
     db.delete(mem)
+    changes.record(db, 'membership', 'delete', scope=changes.SCOPE_GROUP, user_id=member_user_id, group_id=group_id)
     db.commit()
     return {'ok': True}
 
 
 @app.post('/engineer/admins/create')
 def engineer_create_admin(
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_write_db)],
     user: Annotated[User, Depends(get_current_user)],
     base: str | None = Query(default='admin', description='基础用户名（默认 admin）'),
 ):
     # 支持多个 admin 用户名：{base}, {base}1, {base}2 ... 自动累加
     _require_engineer(user)
 
-    uname = _alloc_admin_username(db, str(base or 'admin'))
     pwd = 'admin123'
+    # bcrypt 放在占用写连接之前计算
+    password_hash = hash_password(pwd)
+    answer_hash = hash_password('admin')
 
+    uname = _alloc_admin_username(db, str(base or 'admin'))
     aid = _alloc_role_user_id(db, Role.admin)
     db.add(
         User(
             id=int(aid),
             username=uname,
-            password_hash=hash_password(pwd),
+            password_hash=password_hash,
             role=Role.admin,
             real_name='管理员',
             security_question='默认密保问题',
-            security_answer_hash=hash_password('admin'),
+            security_answer_hash=answer_hash,
         )
     )
 
@@ -1327,7 +1601,6 @@ def engineer_create_admin(
 @app.post('/engineer/wipe_all')
 def engineer_wipe_all(
     data: EngineerWipeIn,
-    db: Annotated[Session, Depends(get_db)],
     user: Annotated[User, Depends(get_current_user)],
 ):
     _require_engineer(user)
@@ -1335,28 +1608,117 @@ def engineer_wipe_all(
     if not verify_password(str(data.password or ''), str(getattr(user, 'password_hash', '') or '')):
         raise HTTPException(status_code=401, detail='password mismatch')
 
-    # 清理“用户所有数据”（不可恢复）：清空业务表 + 删除非工程师账号。
-    # 保留工程师账号，以便后续重新初始化/创建管理员。
-    db.execute(delete(ChatMessage))
-    db.execute(delete(Attendance))
-    db.execute(delete(CorrectionRequest))
-    db.execute(delete(JoinRequest))
-    db.execute(delete(Membership))
-    db.execute(delete(Announcement))
-    db.execute(delete(Group))
+    # 清理“用户所有数据”（不可恢复）：清空业务表 + 删除非工程师账号，保留工程师账号。
+    # 后台分批执行（见 wipe.py），立即返回；进度通过 GET /engineer/wipe_all 查看。
+    started, state = wipe.start(int(user.id))
+    return {'ok': True, 'started': started, 'job': state}
 
-    db.execute(delete(User).where(User.role != Role.engineer))
 
-    db.commit()
-    return {'ok': True}
+@app.get('/engineer/wipe_all')
+def engineer_wipe_status(user: Annotated[User, Depends(get_current_user)]):
+    _require_engineer(user)
+    return wipe.status()
+
+
+@app.get('/engineer/sqlprof')
+def engineer_sqlprof_report(user: Annotated[User, Depends(get_current_user)]):
+    _require_engineer(user)
+    return sqlprof.report()
+
+
+@app.post('/engineer/sqlprof')
+def engineer_sqlprof_configure(data: SqlProfConfigIn, user: Annotated[User, Depends(get_current_user)]):
+    # 运行时开关 SQL 剖析并调整阈值（仅影响当前进程）
+    _require_engineer(user)
+    if data.reset:
+        sqlprof.reset()
+    cfg = sqlprof.configure(
+        enabled=data.enabled,
+        slow_ms=data.slow_ms,
+        max_statements=data.max_statements,
+        repeat_threshold=data.repeat_threshold,
+    )
+    return {'ok': True, 'config': cfg}
+
+
+@app.get('/engineer/trace')
+def engineer_trace_config(user: Annotated[User, Depends(get_current_user)]):
+    _require_engineer(user)
+    return {'config': dict(tracing.config), 'path': tracing.TRACE_PATH}
 
 
+@app.post('/engineer/trace')
+def engineer_trace_configure(data: TraceConfigIn, user: Annotated[User, Depends(get_current_user)]):
+    # 运行时调整请求追踪（仅影响当前进程）
+    _require_engineer(user)
+    cfg = tracing.configure(
+        enabled=data.enabled,
+        sample=data.sample,
+        slow_ms=data.slow_ms,
+        max_spans=data.max_spans,
+    )
+    return {'ok': True, 'config': cfg}
+
+
+@app.get('/engineer/backups')
+def engineer_backups(user: Annotated[User, Depends(get_current_user)]):
+    _require_engineer(user)
+    return {'backups': backup.list_backups(), 'running': backup.is_running()}
+
+
+@app.post('/engineer/backups')
+def engineer_backup_now(user: Annotated[User, Depends(get_current_user)]):
+    # 立即执行一次在线备份（后台线程，不阻塞请求）
+    _require_engineer(user)
+    return {'started': backup.run_async()}
+
+
+@app.get('/engineer/maintenance')
+def engineer_maintenance_report(user: Annotated[User, Depends(get_current_user)]):
+    _require_engineer(user)
+    return {'running': maintenance.is_running(), 'window': maintenance.WINDOW, 'last': maintenance.last_report()}
+
+
+@app.post('/engineer/maintenance')
+def engineer_maintenance_run(
+    user: Annotated[User, Depends(get_current_user)],
+    budget: float | None = Query(default=None, gt=0, le=600, description='本轮时间预算（秒）'),
+):
+    # 立即执行一轮维护（不受低峰时间窗口限制，后台线程执行）
+    _require_engineer(user)
+    return {'started': maintenance.run_async(budget)}
+
+
+@app.post('/engineer/profile')
+async def engineer_profile(
+    user: Annotated[User, Depends(get_current_user_async)],
+    seconds: float = Query(default=10, gt=0, description='采样时长（秒），上限 GLIMMER_PROFILE_MAX_SECONDS'),
+    interval_ms: float | None = Query(default=None, ge=1, le=1000, description='采样间隔（毫秒）'),
+    idle: bool = Query(default=False, description='是否包含空闲线程（线程池等待、事件循环 select）'),
+    format: str = Query(default='collapsed', pattern='^(collapsed|json)$'),
+):
+    # 对当前 worker 进程做采样剖析：collapsed 直接下载（flamegraph.pl / speedscope 可用），json 额外给出热点函数排行
+    _require_engineer(user)
+    result = await profiler.profile(seconds, interval_ms, idle)
+    if result is None:
+        raise HTTPException(status_code=409, detail='profile already running')
+    if format == 'json':
+        return result
+    name = os.path.basename(result['file']) or 'profile.collapsed'
+    return PlainTextResponse(
+        result['collapsed'],
+        headers={
+            'Content-Disposition': f'attachment; filename="{name}"',
+            'X-Profile-Samples': str(result['samples']),
+            'X-Profile-Pid': str(result['pid']),
+        },
+    )
 
 
 @app.get('/admin/users')
 
 def admin_users(
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_read_db)],
     user: Annotated[User, Depends(get_current_user)],
     q: str | None = Query(default=None),
 ):
@@ -1394,7 +1756,7 @@ def admin_users(
 
 @app.get('/admin/stats/user_count')
 def admin_user_count(
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_read_db)],
     user: Annotated[User, Depends(get_current_user)],
 ):
     _require_engineer(user)
@@ -1402,10 +1764,20 @@ def admin_user_count(
     return {'count': int(cnt or 0)}
 
 
+@app.get('/engineer/stats')
+def engineer_stats(
+    user: Annotated[User, Depends(get_current_user)],
+    refresh: bool = Query(default=False, description='跳过缓存立即重新统计'),
+):
+    # 运营统计面板：结果按 GLIMMER_STATS_TTL 缓存（见 stats.py）
+    _require_engineer(user)
+    return stats.snapshot(refresh)
+
+
 @app.get('/engineer/users/{target_user_id}/detail', response_model=EngineerUserDetailOut)
 def engineer_user_detail(
     target_user_id: int,
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_read_db)],
     user: Annotated[User, Depends(get_current_user)],
 ):
     _require_engineer(user)
@@ -1431,7 +1803,7 @@ def engineer_user_detail(
 
 
 def my_join_requests(
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_read_db)],
     user: Annotated[User, Depends(get_current_user)],
 ):
     rows = db.execute(
@@ -1457,19 +1829,20 @@ def my_join_requests(
 @app.post('/groups/{group_id}/leave')
 def leave_group(
     group_id: int,
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_write_db)],
     user: Annotated[User, Depends(get_current_user)],
 ):
     mem = db.execute(select(Membership).where(and_(Membership.group_id == group_id, Membership.user_id == user.id))).scalar_one_or_none()
     if not mem:
         raise HTTPException(status_code=404, detail='not in group')
     db.delete(mem)
+    changes.record(db, 'membership', 'delete', scope=changes.SCOPE_GROUP, user_id=user.id, group_id=group_id)
     db.commit()
     return {'ok': True}
 
 
-@app.get('/public/announcements/global/latest')
-def public_latest_global_announcement(db: Annotated[Session, Depends(get_db)]):
+@app.get('/public/announcements/global/latest', dependencies=[Depends(ratelimit.limit_public_ip)])
+def public_latest_global_announcement(db: Annotated[Session, Depends(get_read_db)]):
     a = db.execute(
         select(Announcement)
         .where(Announcement.scope == AnnouncementScope.global_)
@@ -1486,16 +1859,38 @@ def public_latest_global_announcement(db: Annotated[Session, Depends(get_db)]):
     }
 
 
-@app.get('/public/config/version', response_model=VersionOut)
-def public_get_version(db: Annotated[Session, Depends(get_db)]):
+@app.get('/public/config/version', response_model=VersionOut, dependencies=[Depends(ratelimit.limit_public_ip)])
+def public_get_version(db: Annotated[Session, Depends(get_read_db)]):
     return get_version(db)
 
 
 # --- 团队成员离线聊天 ---
 
 
-def _chat_cleanup_old(db: Session):
+_CHAT_CLEANUP_INTERVAL = float(os.environ.get('GLIMMER_CHAT_CLEANUP_INTERVAL') or 300)
+_chat_cleanup_lock = threading.Lock()
+_chat_cleanup_next = 0.0
+
+
+def _chat_cleanup_due() -> bool:
+    # 清理需要写连接：节流到每 _CHAT_CLEANUP_INTERVAL 秒最多一次，避免每个聊天轮询都去排队抢写锁
+    global _chat_cleanup_next
+    now = time.monotonic()
+    with _chat_cleanup_lock:
+        if now < _chat_cleanup_next:
+            return False
+        _chat_cleanup_next = now + _CHAT_CLEANUP_INTERVAL
+    return True
+
+
+def _chat_cleanup_old():
+    if _chat_cleanup_due():
+        _chat_cleanup_run()
+
+
+def _chat_cleanup_run():
     # 聊天数据只保留约 1 个月
+    db = SessionLocal()
     try:
         cutoff = datetime.utcnow() - timedelta(days=31)
         db.execute(delete(ChatMessage).where(ChatMessage.created_at < cutoff))
@@ -1505,16 +1900,18 @@ def _chat_cleanup_old(db: Session):
             db.rollback()
         except Exception:
             pass
+    finally:
+        db.close()
 
 
 @app.post('/chat/send', response_model=ChatMessageOut)
 
 def chat_send(
     data: ChatSendIn,
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_write_db)],
     user: Annotated[User, Depends(get_current_user)],
 ):
-    _chat_cleanup_old(db)
+    _chat_cleanup_old()
 
     target = _get_user_by_username(db, str(data.to_username))
 
@@ -1546,10 +1943,10 @@ def chat_send(
 def chat_history(
     peer: str = Query(..., description='对方用户名'),
     limit: int = Query(default=200, ge=1, le=400),
-    db: Annotated[Session, Depends(get_db)] = None,
+    db: Annotated[Session, Depends(get_read_db)] = None,
     user: Annotated[User, Depends(get_current_user)] = None,
 ):
-    _chat_cleanup_old(db)
+    _chat_cleanup_old()
 
     peer_user = _get_user_by_username(db, str(peer))
 
@@ -1559,66 +1956,39 @@ def chat_history(
     if not _share_any_group(db, int(user.id), int(peer_user.id)):
         raise HTTPException(status_code=403, detail='not in same group')
 
-    # 双向会话：各自删除不互相影响
-    q = select(ChatMessage).where(
-        or_(
-            and_(
-                ChatMessage.sender_id == int(user.id),
-                ChatMessage.receiver_id == int(peer_user.id),
-                ChatMessage.deleted_by_sender == False,
-            ),
-            and_(
-                ChatMessage.sender_id == int(peer_user.id),
-                ChatMessage.receiver_id == int(user.id),
-                ChatMessage.deleted_by_receiver == False,
-            ),
-        )
-    )
-
-    rows = db.execute(q.order_by(ChatMessage.created_at.asc()).limit(int(limit))).scalars().all()
-
-    out: list[ChatMessageOut] = []
-    for m in rows:
-        out.append(
-            ChatMessageOut(
-                id=m.id,
-                from_username=(peer_user.username if int(m.sender_id) == int(peer_user.id) else user.username),
-                to_username=(peer_user.username if int(m.receiver_id) == int(peer_user.id) else user.username),
-                text=m.text,
-                created_at=m.created_at,
-                read_at=m.read_at,
-            )
-        )
-    return out
+    return rows_response(db.execute(
+        _chat_history_stmt(int(user.id), str(user.username), int(peer_user.id), str(peer_user.username), int(limit))
+    ))
 
 
 @app.get('/chat/unread_count', response_model=ChatUnreadOut)
-def chat_unread_count(
-    db: Annotated[Session, Depends(get_db)],
-    user: Annotated[User, Depends(get_current_user)],
+async def chat_unread_count(
+    db: Annotated[Session, Depends(get_async_read_db)],
+    user: Annotated[User, Depends(get_current_user_async)],
 ):
-    _chat_cleanup_old(db)
-
-    cnt = db.execute(
+    if _chat_cleanup_due():
+        await run_in_threadpool(_chat_cleanup_run)
 
+    cnt = (await aexecute(
+        db,
         select(func.count(ChatMessage.id)).where(
             and_(
                 ChatMessage.receiver_id == int(user.id),
                 ChatMessage.read_at.is_(None),
                 ChatMessage.deleted_by_receiver == False,
             )
-        )
-    ).scalar_one()
+        ),
+    )).scalar_one()
     return ChatUnreadOut(count=int(cnt or 0))
 
 
 @app.post('/chat/mark_read')
 def chat_mark_read(
     data: ChatMarkReadIn,
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_write_db)],
     user: Annotated[User, Depends(get_current_user)],
 ):
-    _chat_cleanup_old(db)
+    _chat_cleanup_old()
 
     peer_user = _get_user_by_username(db, str(data.peer_username))
 
@@ -1654,10 +2024,10 @@ def chat_mark_read(
 @app.delete('/chat/messages/{message_id}')
 def chat_delete_message(
     message_id: int,
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_write_db)],
     user: Annotated[User, Depends(get_current_user)],
 ):
-    _chat_cleanup_old(db)
+    _chat_cleanup_old()
 
     msg = db.execute(select(ChatMessage).where(ChatMessage.id == int(message_id))).scalar_one_or_none()
 
@@ -0,0 +1,257 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from . import metrics
+from .db import LOG_DIR, engine, read_engine
+from .jobs import PeriodicThread
+from .responses import dumps, loads
+
+
+# 定时数据库维护（SQLite）：在低峰时间窗口内依次执行
+#   1. PRAGMA optimize（analysis_limit 限制采样量；首次没有统计信息时按同样的采样量做一次 ANALYZE）
+#   2. 增量回收空闲页（auto_vacuum=INCREMENTAL）；旧库为 NONE 时，库较小且空闲页较多才一次性 VACUUM 转换
+#   3. WAL 检查点：PASSIVE 不等待任何人；TRUNCATE 只做短暂尝试（busy_timeout 很短），失败不影响业务
+# 每轮有总时间预算，超时的步骤记为 skipped；结果写入 logs/maintenance_report.json，工程师接口可查看。
+# 维护语句走写连接池：与业务写入排队，而不是争抢写锁。多 worker 部署时只有一个进程执行。
+logger = logging.getLogger('glimmer.maintenance')
+
+# 低峰时间窗口（本地时间，可跨零点），为空表示不限时段
+WINDOW = (os.environ.get('GLIMMER_MAINT_WINDOW') or '02:00-05:00').strip()
+# 两轮维护的最小间隔（秒）
+MIN_GAP = float(os.environ.get('GLIMMER_MAINT_MIN_GAP') or 20 * 3600)
+# 检查是否该执行的间隔（秒）；0 关闭定时维护
+CHECK_INTERVAL = float(os.environ.get('GLIMMER_MAINT_CHECK_INTERVAL') or 600)
+# 单轮时间预算（秒）
+BUDGET = float(os.environ.get('GLIMMER_MAINT_BUDGET') or 30)
+# 每次增量回收的页数（每批一个短事务）
+VACUUM_PAGES = int(os.environ.get('GLIMMER_MAINT_VACUUM_PAGES') or 256)
+# 旧库（auto_vacuum=NONE）一次性 VACUUM 转换的条件：空闲页比例与库大小上限
+CONVERT_FREE_RATIO = float(os.environ.get('GLIMMER_MAINT_CONVERT_RATIO') or 0.2)
+CONVERT_MAX_MB = float(os.environ.get('GLIMMER_MAINT_CONVERT_MAX_MB') or 256)
+
+REPORT_PATH = os.path.join(LOG_DIR, 'maintenance_report.json')
+
+maintenance_runs = metrics.counter('glimmer_maintenance_runs_total', 'Database maintenance runs by result.', ('result',))
+
+_thread: PeriodicThread | None = None
+_run_lock = threading.Lock()
+
+
+def _parse_window(raw: str) -> tuple[int, int] | None:
+    if not raw:
+        return None
+    try:
+        a, b = raw.split('-', 1)
+        ha, ma = a.strip().split(':')
+        hb, mb = b.strip().split(':')
+        return int(ha) * 60 + int(ma), int(hb) * 60 + int(mb)
+    except Exception:
+        logger.warning('bad GLIMMER_MAINT_WINDOW %r, maintenance runs at any time', raw)
+        return None
+
+
+_WINDOW = _parse_window(WINDOW)
+
+
+def in_window(now: datetime | None = None) -> bool:
+    if _WINDOW is None:
+        return True
+    t = now or datetime.now()
+    minute = t.hour * 60 + t.minute
+    start, end = _WINDOW
+    if start <= end:
+        return start <= minute < end
+    return minute >= start or minute < end
+
+
+def _pragma(conn, sql: str):
+    res = conn.exec_driver_sql(sql)
+    return res.fetchall() if res.returns_rows else []
+
+
+def _file_sizes(path: str | None) -> dict:
+    out = {}
+    if path:
+        for key, suffix in (('db_bytes', ''), ('wal_bytes', '-wal')):
+            try:
+                out[key] = os.path.getsize(path + suffix)
+            except OSError:
+                out[key] = 0
+    return out
+
+
+def _stats(conn) -> dict:
+    return {
+        'page_count': int(_pragma(conn, 'PRAGMA page_count')[0][0]),
+        'freelist_count': int(_pragma(conn, 'PRAGMA freelist_count')[0][0]),
+        'page_size': int(_pragma(conn, 'PRAGMA page_size')[0][0]),
+        'auto_vacuum': int(_pragma(conn, 'PRAGMA auto_vacuum')[0][0]),
+    }
+
+
+def _optimize(deadline: float) -> dict:
+    with engine.connect() as conn:
+        # 每个索引最多采样 analysis_limit 行：首次 ANALYZE 也不会在持有写锁时扫描整张 attendance/chat_messages
+        _pragma(conn, 'PRAGMA analysis_limit=400')
+        has_stats = bool(_pragma(conn, "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"))
+        if not has_stats:
+            _pragma(conn, 'ANALYZE')
+            return {'analyze': 'sampled'}
+        _pragma(conn, 'PRAGMA optimize')
+        return {'analyze': 'optimize'}
+
+
+def _checkpoint(deadline: float) -> dict:
+    with engine.connect() as conn:
+        busy, log, done = _pragma(conn, 'PRAGMA wal_checkpoint(PASSIVE)')[0]
+        out = {'passive': {'busy': busy, 'log': log, 'checkpointed': done}}
+        if time.monotonic() >= deadline:
+            return out
+        # TRUNCATE 需要等待所有读者：只给很短的等待时间，避免拖住写入
+        prev = _pragma(conn, 'PRAGMA busy_timeout')[0][0]
+        try:
+            _pragma(conn, 'PRAGMA busy_timeout=200')
+            busy, log, done = _pragma(conn, 'PRAGMA wal_checkpoint(TRUNCATE)')[0]
+            out['truncate'] = {'busy': busy, 'log': log, 'checkpointed': done}
+        finally:
+            _pragma(conn, f'PRAGMA busy_timeout={int(prev)}')
+        return out
+
+
+def _vacuum(deadline: float) -> dict:
+    with engine.connect() as conn:
+        st = _stats(conn)
+        if st['auto_vacuum'] == 0:
+            size_mb = st['page_count'] * st['page_size'] / 1024 / 1024
+            ratio = st['freelist_count'] / max(1, st['page_count'])
+            if ratio < CONVERT_FREE_RATIO or size_mb > CONVERT_MAX_MB:
+                return {'mode': 'none', 'freelist_ratio': round(ratio, 3), 'converted': False}
+            _pragma(conn, 'PRAGMA auto_vacuum=INCREMENTAL')
+            _pragma(conn, 'VACUUM')
+            return {'mode': 'none', 'freelist_ratio': round(ratio, 3), 'converted': True}
+    if st['auto_vacuum'] != 2:
+        return {'mode': 'full'}
+
+    # 每批单独取写连接，批次之间业务写入可以插队
+    freed = 0
+    while time.monotonic() < deadline:
+        with engine.connect() as conn:
+            free = int(_pragma(conn, 'PRAGMA freelist_count')[0][0])
+            if free <= 0:
+                break
+            # sqlite3 的 execute() 只 step 一次（只回收 1 页）；executescript 会执行到底
+            conn.connection.driver_connection.executescript(f'PRAGMA incremental_vacuum({min(free, VACUUM_PAGES)});')
+            freed += free - int(_pragma(conn, 'PRAGMA freelist_count')[0][0])
+    return {'mode': 'incremental', 'freed_pages': freed}
+
+
+# 先回收空闲页再做检查点，TRUNCATE 后库文件即可缩小
+_TASKS = (('optimize', _optimize), ('vacuum', _vacuum), ('checkpoint', _checkpoint))
+
+
+def run(budget: float | None = None) -> dict:
+    if engine.dialect.name != 'sqlite':
+        return {'skipped': 'not a sqlite database'}
+    if not _run_lock.acquire(blocking=False):
+        return {'skipped': 'maintenance already running'}
+    try:
+        t0 = time.monotonic()
+        deadline = t0 + (BUDGET if budget is None else float(budget))
+        path = engine.url.database if engine.url.database not in (None, '', ':memory:') else None
+        report = {'started_at': datetime.now().isoformat(timespec='seconds'), 'tasks': {}}
+        result = 'ok'
+        # 统计信息只读，走读连接，不占用写连接
+        with read_engine.connect() as conn:
+            report['before'] = dict(_stats(conn), **_file_sizes(path))
+        for name, fn in _TASKS:
+            if time.monotonic() >= deadline:
+                report['tasks'][name] = {'status': 'skipped'}
+                result = 'partial'
+                continue
+            ts = time.perf_counter()
+            try:
+                detail = fn(deadline)
+                report['tasks'][name] = {'status': 'ok', 'ms': round((time.perf_counter() - ts) * 1000, 1), **detail}
+            except Exception as e:
+                result = 'error'
+                report['tasks'][name] = {'status': 'error', 'ms': round((time.perf_counter() - ts) * 1000, 1), 'error': str(e)}
+                logger.exception('maintenance task %s failed', name)
+        with read_engine.connect() as conn:
+            report['after'] = dict(_stats(conn), **_file_sizes(path))
+        report['seconds'] = round(time.monotonic() - t0, 3)
+        report['result'] = result
+        report['finished_ts'] = time.time()
+        maintenance_runs.inc(result)
+        _write_report(report)
+        logger.info('database maintenance %s in %.2fs', result, report['seconds'])
+        return report
+    finally:
+        _run_lock.release()
+
+
+def _write_report(report: dict) -> None:
+    try:
+        os.makedirs(LOG_DIR, exist_ok=True)
+        tmp = REPORT_PATH + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(dumps(report))
+        os.replace(tmp, REPORT_PATH)
+    except Exception:
+        logger.exception('failed to write maintenance report')
+
+
+def last_report() -> dict | None:
+    try:
+        with open(REPORT_PATH, 'rb') as f:
+            return loads(f.read())
+    except Exception:
+        return None
+
+
+def is_running() -> bool:
+    return _run_lock.locked()
+
+
+def run_async(budget: float | None = None) -> bool:
+    # 工程师手动触发：不受时间窗口限制，在后台线程执行
+    if is_running():
+        return False
+    threading.Thread(target=_run_logged, args=(budget,), name='glimmer-maintenance-manual', daemon=True).start()
+    return True
+
+
+def _run_logged(budget: float | None) -> None:
+    try:
+        run(budget)
+    except Exception:
+        logger.exception('manual maintenance failed')
+
+
+def _tick() -> None:
+    if not in_window():
+        return
+    # 上一轮时间从报告文件读取：重启或换 leader 进程后同样生效
+    last = last_report() or {}
+    if time.time() - float(last.get('finished_ts') or 0) < MIN_GAP:
+        return
+    run()
+
+
+def start() -> None:
+    global _thread
+    if _thread is not None or CHECK_INTERVAL <= 0 or engine.dialect.name != 'sqlite':
+        return
+    _thread = PeriodicThread('maintenance', CHECK_INTERVAL, _tick, leader=True)
+    _thread.start()
+
+
+def stop() -> None:
+    global _thread
+    if _thread is not None:
+        _thread.stop()
+        _thread = None
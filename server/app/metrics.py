@@ -0,0 +1,338 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Awaitable, Callable, Iterable
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from . import reqctx
+
+
+# 轻量 Prometheus 指标（文本格式），不引入 prometheus_client 依赖。
+# 访问 /metrics 需携带 GLIMMER_METRICS_TOKEN（Bearer）或工程师登录令牌。
+METRICS_TOKEN = (os.environ.get('GLIMMER_METRICS_TOKEN') or '').strip()
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _fmt_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = '') -> str:
+    parts = [f'{k}="{_escape(v)}"' for k, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _escape(v: str) -> str:
+    return str(v).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _fmt_num(v: float) -> str:
+    if v == float('inf'):
+        return '+Inf'
+    if float(v).is_integer():
+        return str(int(v))
+    return repr(float(v))
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, doc: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.doc = doc
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self) -> list[str]:
+        return [f'# HELP {self.name} {self.doc}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, doc: str, labels: Iterable[str] = ()):
+        super().__init__(name, doc, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def get(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f'{self.name}{_fmt_labels(self.labels, k)} {_fmt_num(v)}' for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, name: str, doc: str, labels: Iterable[str] = (), func: Callable[[], float] | None = None):
+        super().__init__(name, doc, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+        self._func = func
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = float(value)
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def get(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> list[str]:
+        if self._func is not None:
+            try:
+                self.set(self._func())
+            except Exception:
+                pass
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f'{self.name}{_fmt_labels(self.labels, k)} {_fmt_num(v)}' for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, doc: str, labels: Iterable[str] = (), buckets: tuple[float, ...] = _LATENCY_BUCKETS):
+        super().__init__(name, doc, labels)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [每个桶计数..., +Inf 计数, 总和]
+        self._values: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(labels)
+            if row is None:
+                row = self._values[labels] = [0.0] * (len(self.buckets) + 2)
+            row[i] += 1
+            row[-1] += value
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        out = self.header()
+        for k, row in items:
+            acc = 0.0
+            for b, c in zip(self.buckets + (float('inf'),), row[:-1]):
+                acc += c
+                le = 'le="%s"' % _fmt_num(b)
+                out.append(f'{self.name}_bucket{_fmt_labels(self.labels, k, le)} {_fmt_num(acc)}')
+            out.append(f'{self.name}_sum{_fmt_labels(self.labels, k)} {_fmt_num(row[-1])}')
+            out.append(f'{self.name}_count{_fmt_labels(self.labels, k)} {_fmt_num(acc)}')
+        return out
+
+
+_registry: list[_Metric] = []
+
+
+def _register(m):
+    _registry.append(m)
+    return m
+
+
+def counter(name: str, doc: str, labels: Iterable[str] = ()) -> Counter:
+    return _register(Counter(name, doc, labels))
+
+
+def gauge(name: str, doc: str, labels: Iterable[str] = (), func: Callable[[], float] | None = None) -> Gauge:
+    return _register(Gauge(name, doc, labels, func))
+
+
+def histogram(name: str, doc: str, labels: Iterable[str] = (), buckets: tuple[float, ...] = _LATENCY_BUCKETS) -> Histogram:
+    return _register(Histogram(name, doc, labels, buckets))
+
+
+def render() -> str:
+    lines: list[str] = []
+    for m in _registry:
+        lines.extend(m.render())
+    return '\n'.join(lines) + '\n'
+
+
+# --- HTTP ---
+
+http_requests = counter('glimmer_http_requests_total', 'HTTP requests by route template and status.', ('method', 'route', 'status'))
+http_latency = histogram('glimmer_http_request_duration_seconds', 'HTTP request latency.', ('method', 'route'))
+http_in_flight = gauge('glimmer_http_requests_in_flight', 'HTTP requests currently being served.')
+
+# --- 数据库 ---
+
+db_pool_checkouts = counter('glimmer_db_pool_checkouts_total', 'Connections checked out of the SQLAlchemy pool.', ('engine',))
+db_pool_checked_out = gauge('glimmer_db_pool_checked_out', 'Connections currently checked out.', ('engine',))
+db_pool_wait = histogram('glimmer_db_pool_wait_seconds', 'Time spent waiting for a pooled connection.', ('engine',))
+db_statements = counter('glimmer_db_statements_total', 'SQL statements executed, by route.', ('route',))
+db_statement_seconds = counter('glimmer_db_statement_seconds_total', 'Time spent executing SQL, by route.', ('route',))
+db_request_statements = histogram('glimmer_db_statements_per_request', 'SQL statements per HTTP request.', ('route',), _COUNT_BUCKETS)
+db_request_seconds = histogram('glimmer_db_seconds_per_request', 'SQL time per HTTP request.', ('route',))
+db_errors = counter('glimmer_db_errors_total', 'Database errors (locked = SQLite busy/locked).', ('kind',))
+
+# --- 线程池 / 加解密 / 序列化 / 缓存 ---
+
+threadpool_tokens = gauge('glimmer_threadpool_tokens', 'anyio default thread limiter capacity.')
+threadpool_borrowed = gauge('glimmer_threadpool_borrowed', 'Worker threads currently in use.')
+threadpool_waiting = gauge('glimmer_threadpool_waiting', 'Tasks waiting for a worker thread.')
+crypto_seconds = histogram('glimmer_crypto_seconds', 'Password hashing/verification time.', ('op',))
+serialize_seconds = histogram('glimmer_serialize_seconds', 'Response body encoding time (fast path).', ('format',))
+cache_requests = counter('glimmer_cache_requests_total', 'In-process cache lookups.', ('cache', 'result'))
+
+
+def record_cache(name: str, hit: bool) -> None:
+    cache_requests.inc(name, 'hit' if hit else 'miss')
+
+
+class timed:
+    # 用法：with metrics.timed(metrics.crypto_seconds, 'verify'): ...
+    def __init__(self, hist: Histogram, *labels: str):
+        self.hist = hist
+        self.labels = labels
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.t0, *self.labels)
+        return False
+
+
+def _sample_threadpool() -> None:
+    # 必须在事件循环线程内调用
+    try:
+        import anyio.to_thread
+
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        threadpool_tokens.set(limiter.total_tokens)
+        threadpool_borrowed.set(limiter.borrowed_tokens)
+        threadpool_waiting.set(limiter.statistics().tasks_waiting)
+    except Exception:
+        pass
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        ctx, token = reqctx.begin(scope)
+        _sample_threadpool()
+        http_in_flight.inc()
+
+        async def _send(message: Message) -> None:
+            if message['type'] == 'http.response.start':
+                ctx.status = int(message.get('status') or 0)
+            elif message['type'] == 'http.response.body':
+                ctx.response_bytes += len(message.get('body') or b'')
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        except Exception:
+            ctx.status = 500
+            raise
+        finally:
+            http_in_flight.dec()
+            ctx.elapsed = time.perf_counter() - ctx.started
+            route = ctx.route
+            http_requests.inc(ctx.method, route, str(ctx.status or 500))
+            http_latency.observe(ctx.elapsed, ctx.method, route)
+            db_request_statements.observe(ctx.sql_count, route)
+            db_request_seconds.observe(ctx.sql_time, route)
+            reqctx.end(ctx, token)
+
+
+def instrument_engine(engine: Engine, name: str = 'main') -> None:
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('glimmer_t0', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stack = conn.info.get('glimmer_t0')
+        if not stack:
+            return
+        dt = time.perf_counter() - stack.pop()
+        ctx = reqctx.current()
+        route = ctx.route if ctx is not None else 'background'
+        if ctx is not None:
+            ctx.sql_count += 1
+            ctx.sql_time += dt
+        db_statements.inc(route)
+        db_statement_seconds.inc(route, amount=dt)
+
+    @event.listens_for(engine, 'handle_error')
+    def _error(exc_ctx):
+        stack = exc_ctx.connection.info.get('glimmer_t0') if exc_ctx.connection is not None else None
+        if stack:
+            stack.pop()
+        msg = str(getattr(exc_ctx, 'original_exception', '') or '').lower()
+        db_errors.inc('locked' if ('locked' in msg or 'busy' in msg) else 'other')
+
+    pool = engine.pool
+
+    @event.listens_for(pool, 'checkout')
+    def _checkout(dbapi_conn, record, proxy):
+        db_pool_checkouts.inc(name)
+        db_pool_checked_out.inc(name)
+
+    @event.listens_for(pool, 'checkin')
+    def _checkin(dbapi_conn, record):
+        db_pool_checked_out.dec(name)
+
+    # 连接池没有“开始等待”事件：包装 pool.connect 统计从请求连接到拿到连接的耗时
+    raw_connect = pool.connect
+
+    def _timed_connect():
+        t0 = time.perf_counter()
+        try:
+            return raw_connect()
+        finally:
+            db_pool_wait.observe(time.perf_counter() - t0, name)
+
+    pool.connect = _timed_connect
+
+
+async def check_token(
+    authorization: str | None,
+    decode: Callable[[str], dict],
+    is_engineer: Callable[[str], Awaitable[bool]],
+) -> bool:
+    raw = str(authorization or '')
+    if not raw.lower().startswith('bearer '):
+        return False
+    tok = raw[7:].strip()
+    if METRICS_TOKEN and tok == METRICS_TOKEN:
+        return True
+    # 工程师 JWT：签名与 role 声明先过滤，再由 is_engineer 确认账号当前仍是工程师（调用方做短 TTL 缓存），
+    # 被降级/删除的工程师在缓存过期后即失去访问权限，而不是等到令牌过期
+    try:
+        payload = decode(tok)
+    except Exception:
+        return False
+    if str(payload.get('role') or '') != 'engineer' or not payload.get('sub'):
+        return False
+    return await is_engineer(str(payload['sub']))
+
+
+def install(app) -> None:
+    app.add_middleware(MetricsMiddleware)
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import logging
+import os
+from typing import Callable
+
+from sqlalchemy import select, update
+from sqlalchemy.engine import Connection, Engine
+
+from . import models  # noqa: F401  注册全部表
+from .db import LOG_DIR, Base
+from .jobs import FileLock
+from .models import SchemaMeta
+
+
+# 版本化结构迁移：
+# - schema_meta.schema_version 记录已应用的最高版本；启动时只读这一行，已是最新则直接跳过（毫秒级）
+# - 有待执行步骤时：文件锁串行化（多 worker 同时启动），create_all 补齐新表，再按版本顺序执行步骤并逐个盖章
+# - 步骤必须幂等：新库由 create_all 直接建成最新结构后，仍会顺序执行一遍全部步骤
+# 新增表/字段/索引时在 MIGRATIONS 末尾追加一步，不要修改已发布的步骤。
+logger = logging.getLogger('glimmer.migrations')
+
+SCHEMA_VERSION_KEY = 'schema_version'
+LOCK_PATH = os.path.join(LOG_DIR, '.migrate.lock')
+
+
+def get_meta(conn, key: str) -> str | None:
+    return conn.execute(select(SchemaMeta.value).where(SchemaMeta.key == key)).scalar_one_or_none()
+
+
+def set_meta(conn, key: str, value: str) -> None:
+    res = conn.execute(update(SchemaMeta).where(SchemaMeta.key == key).values(value=value))
+    if not res.rowcount:
+        conn.execute(SchemaMeta.__table__.insert().values(key=key, value=value))
+
+
+def _columns(conn: Connection, table: str) -> list[str]:
+    return [r[1] for r in conn.exec_driver_sql(f"PRAGMA table_info('{table}')").fetchall()]
+
+
+def _v1_legacy_columns(conn: Connection) -> None:
+    # 原 _startup 中的轻量迁移：SQLite 旧库可能没有新增字段
+    if conn.dialect.name != 'sqlite':
+        return
+
+    # ad_config.scroll_mode
+    if 'scroll_mode' not in _columns(conn, 'ad_config'):
+        conn.exec_driver_sql("ALTER TABLE ad_config ADD COLUMN scroll_mode VARCHAR(20) DEFAULT '垂直滚动'")
+    conn.exec_driver_sql("UPDATE ad_config SET scroll_mode='垂直滚动' WHERE scroll_mode IS NULL OR scroll_mode='' ")
+
+    # users 个人资料/密保字段
+    ucols = _columns(conn, 'users')
+    for name, ddl in (
+        ('real_name', "VARCHAR(120) DEFAULT ''"),
+        ('phone', "VARCHAR(40) DEFAULT ''"),
+        ('department', "VARCHAR(120) DEFAULT ''"),
+        ('security_question', "VARCHAR(200) DEFAULT ''"),
+        ('security_answer_hash', "VARCHAR(255) DEFAULT ''"),
+        ('last_login', 'DATETIME'),
+        ('last_login_ip', "VARCHAR(64) DEFAULT ''"),
+    ):
+        if name not in ucols:
+            conn.exec_driver_sql(f'ALTER TABLE users ADD COLUMN {name} {ddl}')
+
+    # attendance.punch_type（支持同日上/下班两次）
+    if 'punch_type' not in _columns(conn, 'attendance'):
+        conn.exec_driver_sql("ALTER TABLE attendance ADD COLUMN punch_type VARCHAR(16) DEFAULT ''")
+
+
+def _v2_hot_query_indexes(conn: Connection) -> None:
+    # 热点查询的组合索引（见 tests/test_query_plans.py）
+    for table, name in (('attendance', 'ix_attendance_user_date'), ('chat_messages', 'ix_chat_pair')):
+        idx = next(i for i in Base.metadata.tables[table].indexes if i.name == name)
+        idx.create(conn, checkfirst=True)
+
+
+def _v3_change_journal(conn: Connection) -> None:
+    # 增量同步变更日志（见 changes.py）
+    table = Base.metadata.tables['change_events']
+    table.create(conn, checkfirst=True)
+    for idx in table.indexes:
+        idx.create(conn, checkfirst=True)
+
+
+MIGRATIONS: list[tuple[int, str, Callable[[Connection], None]]] = [
+    (1, 'legacy columns', _v1_legacy_columns),
+    (2, 'hot query indexes', _v2_hot_query_indexes),
+    (3, 'change journal', _v3_change_journal),
+]
+
+LATEST = MIGRATIONS[-1][0]
+
+
+def current_version(engine: Engine) -> int:
+    try:
+        with engine.connect() as conn:
+            return int(get_meta(conn, SCHEMA_VERSION_KEY) or 0)
+    except Exception:
+        # 新库/旧库：schema_meta 表尚不存在
+        return 0
+
+
+def upgrade(engine: Engine) -> int:
+    if current_version(engine) >= LATEST:
+        return LATEST
+
+    lock = FileLock(LOCK_PATH)
+    lock.try_acquire(blocking=True)
+    try:
+        Base.metadata.create_all(bind=engine)
+        version = current_version(engine)
+        for step, name, fn in MIGRATIONS:
+            if step <= version:
+                continue
+            try:
+                with engine.begin() as conn:
+                    fn(conn)
+                    set_meta(conn, SCHEMA_VERSION_KEY, str(step))
+            except Exception:
+                # 与旧行为一致：迁移失败不阻止启动，下次启动重试
+                logger.exception('schema migration %d (%s) failed', step, name)
+                break
+            version = step
+            logger.info('schema migrated to version %d (%s)', step, name)
+        return version
+    finally:
+        lock.release()
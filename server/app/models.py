@@ -143,6 +143,36 @@ class AdConfig(Base):
     updated_by_user_id: Mapped[int | None] = mapped_column(Integer, ForeignKey('users.id'), nullable=True)
 
 
+class PollConfig(Base):
+    __tablename__ = 'poll_config'
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    # 客户端轮询建议：以 10 秒为基准间隔，客户端各轮询任务按 interval/10 等比缩放
+    interval_seconds: Mapped[float] = mapped_column(Float, default=10.0)
+    # 请求失败后客户端至少等待的秒数
+    backoff_seconds: Mapped[float] = mapped_column(Float, default=0.0)
+
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_by_user_id: Mapped[int | None] = mapped_column(Integer, ForeignKey('users.id'), nullable=True)
+
+
+class CacheVersion(Base):
+    __tablename__ = 'cache_versions'
+
+    # 多进程缓存一致性：缓存项名称 -> 版本号（见 coherence.py）
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, default=0)
+
+
+class SchemaMeta(Base):
+    __tablename__ = 'schema_meta'
+
+    # 结构版本号/引导配置指纹等元数据（见 migrations.py）
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    value: Mapped[str] = mapped_column(String(255), default='')
+
+
 class ChatMessage(Base):
     __tablename__ = 'chat_messages'
 
@@ -162,6 +192,8 @@ class ChatMessage(Base):
 
     __table_args__ = (
         Index('ix_chat_receiver_read', 'receiver_id', 'read_at'),
+        # 会话历史：两个方向各走一次 (sender_id, receiver_id) 查找
+        Index('ix_chat_pair', 'sender_id', 'receiver_id', 'created_at'),
     )
 
 
@@ -184,6 +216,12 @@ class Attendance(Base):
     lon: Mapped[float | None] = mapped_column(Float, nullable=True)
     notes: Mapped[str] = mapped_column(String(200), default='')
 
+    __table_args__ = (
+        # 打卡去重（同日上/下班）按 (user_id, date, group_id) 定位；月度查询用 user_id 前缀。
+        # 三列都是等值条件：没有统计信息时也稳定优于单列的 group_id/date 索引
+        Index('ix_attendance_user_date', 'user_id', 'date', 'group_id'),
+    )
+
 
 class CorrectionRequest(Base):
     __tablename__ = 'correction_requests'
@@ -203,3 +241,30 @@ class CorrectionRequest(Base):
     __table_args__ = (
         Index('ix_corrections_group_status', 'group_id', 'status'),
     )
+
+
+class ChangeEvent(Base):
+    __tablename__ = 'change_events'
+
+    # 增量同步变更日志（见 changes.py）：seq 全局单调递增，AUTOINCREMENT 保证删除/清理后也不复用
+    seq: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+
+    # membership / join_request / correction / announcement / attendance / config / reset
+    kind: Mapped[str] = mapped_column(String(24))
+    # upsert / delete
+    op: Mapped[str] = mapped_column(String(8), default='upsert')
+    entity_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+
+    # 可见范围：all（所有人）/ group（group_id 的成员）/ managers（group_id 的管理者）/ user（仅 user_id）；
+    # user_id 为事件的当事人，任何范围下当事人本人都可见。不加外键：事件要比用户/团队活得久
+    scope: Mapped[str] = mapped_column(String(8))
+    user_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    group_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+
+    # 紧凑 JSON：客户端更新本地缓存所需的少量字段
+    data: Mapped[str] = mapped_column(Text, default='')
+
+    __table_args__ = (
+        {'sqlite_autoincrement': True},
+    )
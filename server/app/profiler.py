@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any
+
+from .db import LOG_DIR
+
+
+# 按需采样剖析（工程师接口 /engineer/profile）：后台线程按固定间隔读取本进程所有线程的调用栈（sys._current_frames），
+# 不需要预先插桩、不需要重新部署，开销只在剖析期间存在。
+# 输出 collapsed stacks（每行“线程;外层函数;...;内层函数 次数”），可直接交给 flamegraph.pl / speedscope 生成火焰图；
+# 同时保存到 logs/profiles/。同一时刻只允许一次剖析，时长有上限。多 worker 部署时只剖析处理该请求的进程。
+MAX_SECONDS = float(os.environ.get('GLIMMER_PROFILE_MAX_SECONDS') or 60)
+DEFAULT_INTERVAL_MS = float(os.environ.get('GLIMMER_PROFILE_INTERVAL_MS') or 10)
+PROFILE_DIR = os.path.join(LOG_DIR, 'profiles')
+# 保留最近的剖析文件数
+KEEP = int(os.environ.get('GLIMMER_PROFILE_KEEP') or 20)
+
+_running = threading.Lock()
+
+# 线程阻塞等待时最内层的 Python 帧（空闲线程：线程池等任务、事件循环等 I/O）
+_IDLE_LEAVES = {
+    ('threading.py', 'wait'),
+    ('threading.py', '_wait_for_tstate_lock'),
+    ('selectors.py', 'select'),
+    ('queue.py', 'get'),
+    ('thread.py', '_worker'),
+    ('_thread.py', 'run'),
+    # aiosqlite 连接线程在 C 实现的队列上等待
+    ('core.py', '_connection_worker_thread'),
+}
+
+
+def is_running() -> bool:
+    return _running.locked()
+
+
+def _label(code) -> str:
+    path = code.co_filename.replace('\\', '/')
+    parts = path.rsplit('/', 2)
+    short = '/'.join(parts[-2:]) if len(parts) >= 2 else path
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f'{name} ({short}:{code.co_firstlineno})'
+
+
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES
+
+
+def _sample(stacks: Counter, skip: set[int], include_idle: bool, cache: dict) -> int:
+    names = {t.ident: t.name for t in threading.enumerate()}
+    n = 0
+    for ident, frame in sys._current_frames().items():
+        if ident in skip or (not include_idle and _is_idle(frame)):
+            continue
+        labels = []
+        f = frame
+        while f is not None:
+            code = f.f_code
+            label = cache.get(code)
+            if label is None:
+                label = cache[code] = _label(code)
+            labels.append(label)
+            f = f.f_back
+        labels.append(names.get(ident, f'thread-{ident}').replace(';', ':'))
+        stacks[';'.join(reversed(labels))] += 1
+        n += 1
+    return n
+
+
+def _run(seconds: float, interval: float, include_idle: bool, out: dict[str, Any], done: threading.Event) -> None:
+    stacks: Counter = Counter()
+    cache: dict = {}
+    skip = {threading.get_ident()}
+    ticks = 0
+    t0 = time.perf_counter()
+    deadline = t0 + seconds
+    next_at = t0
+    try:
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            _sample(stacks, skip, include_idle, cache)
+            ticks += 1
+            # 固定节拍：采样本身的耗时不累积到间隔里
+            next_at += interval
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_at = time.perf_counter()
+    finally:
+        out.update(stacks=stacks, ticks=ticks, elapsed=time.perf_counter() - t0)
+        done.set()
+
+
+def _top(stacks: Counter, n: int = 30) -> list[dict[str, Any]]:
+    own: Counter = Counter()
+    total: Counter = Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(';')[1:]
+        if not frames:
+            continue
+        own[frames[-1]] += count
+        for label in set(frames):
+            total[label] += count
+    samples = sum(stacks.values()) or 1
+    return [
+        {'function': label, 'self': c, 'total': total[label], 'self_pct': round(c * 100.0 / samples, 1)}
+        for label, c in own.most_common(n)
+    ]
+
+
+def collapsed(stacks: Counter) -> str:
+    return ''.join(f'{stack} {count}\n' for stack, count in sorted(stacks.items()))
+
+
+def _save(text: str) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, datetime.now().strftime('profile-%Y%m%d-%H%M%S') + f'-{os.getpid()}.collapsed')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    try:
+        files = sorted(x for x in os.listdir(PROFILE_DIR) if x.endswith('.collapsed'))
+        for old in files[:-KEEP] if KEEP > 0 else ():
+            os.remove(os.path.join(PROFILE_DIR, old))
+    except OSError:
+        pass
+    return path
+
+
+async def profile(seconds: float, interval_ms: float | None = None, include_idle: bool = False) -> dict[str, Any] | None:
+    # 返回 None 表示已有剖析在运行。采样在独立线程中进行，这里只在事件循环上等待，不占用线程池。
+    if not _running.acquire(blocking=False):
+        return None
+    try:
+        seconds = max(0.1, min(float(seconds), MAX_SECONDS))
+        interval = max(1.0, float(interval_ms or DEFAULT_INTERVAL_MS)) / 1000.0
+        out: dict[str, Any] = {}
+        done = threading.Event()
+        threading.Thread(
+            target=_run, args=(seconds, interval, include_idle, out, done), name='glimmer-profiler', daemon=True,
+        ).start()
+        while not done.is_set():
+            await asyncio.sleep(0.05)
+
+        stacks: Counter = out['stacks']
+        text = collapsed(stacks)
+        try:
+            path = await asyncio.get_running_loop().run_in_executor(None, _save, text)
+        except OSError:
+            path = ''
+        return {
+            'pid': os.getpid(),
+            'seconds': round(out['elapsed'], 3),
+            'interval_ms': round(interval * 1000, 3),
+            'ticks': out['ticks'],
+            'samples': sum(stacks.values()),
+            'include_idle': include_idle,
+            'file': path,
+            'top': _top(stacks),
+            'collapsed': text,
+        }
+    finally:
+        _running.release()
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+
+from fastapi import HTTPException, Request
+
+from . import metrics
+from .db import DB_PATH
+
+
+# 令牌桶限流：保护未鉴权接口（登录/找回密码会触发 bcrypt，公开接口无需令牌），
+# 避免异常客户端或重试风暴占满 CPU。按 IP 与用户名分别计数。
+# - 默认进程内存储；多 worker 部署可设置 GLIMMER_RATELIMIT_BACKEND=sqlite 共享同一个计数文件
+ENABLED = (os.environ.get('GLIMMER_RATELIMIT') or '1').strip().lower() in ('1', 'true', 'yes', 'y', 'on')
+BACKEND = (os.environ.get('GLIMMER_RATELIMIT_BACKEND') or 'memory').strip().lower()
+SHARED_DB_PATH = os.environ.get('GLIMMER_RATELIMIT_DB') or (DB_PATH + '.ratelimit')
+
+# 仅在反向代理之后部署时开启，否则客户端可伪造 X-Forwarded-For 绕过限流
+TRUST_PROXY = (os.environ.get('GLIMMER_TRUST_PROXY') or '0').strip().lower() in ('1', 'true', 'yes', 'y', 'on')
+
+
+def _rule(name: str, per_minute: float, burst: int) -> tuple[float, float]:
+    key = f'GLIMMER_RL_{name.upper()}'
+    try:
+        pm = float(os.environ.get(f'{key}_RATE') or per_minute)
+        b = float(os.environ.get(f'{key}_BURST') or burst)
+    except Exception:
+        pm, b = float(per_minute), float(burst)
+    # (每秒补充令牌数, 桶容量)
+    return pm / 60.0, max(1.0, b)
+
+
+RULES: dict[str, tuple[float, float]] = {
+    # 登录/注册/密保/找回密码：按 IP
+    'auth_ip': _rule('auth_ip', 30, 20),
+    # 登录/找回密码：按用户名（防止针对单个账号的暴力尝试）
+    'auth_user': _rule('auth_user', 10, 5),
+    # /public/*：按 IP
+    'public_ip': _rule('public_ip', 120, 60),
+}
+
+# 超过该秒数未访问的桶视为已回满，可以丢弃（内存/共享两种存储一致）
+_IDLE_SECONDS = 600
+
+ratelimit_requests = metrics.counter('glimmer_ratelimit_requests_total', 'Rate limiter decisions.', ('rule', 'result'))
+
+
+class MemoryBackend:
+    _MAX_KEYS = 100000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: dict[str, list[float]] = {}
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        # 返回 0 表示放行；否则为需要等待的秒数
+        now = time.monotonic()
+        with self._lock:
+            b = self._buckets.get(key)
+            if b is None:
+                if len(self._buckets) >= self._MAX_KEYS:
+                    self._prune(now)
+                b = self._buckets[key] = [burst, now]
+            tokens = min(burst, b[0] + (now - b[1]) * rate)
+            b[1] = now
+            if tokens >= 1.0:
+                b[0] = tokens - 1.0
+                return 0.0
+            b[0] = tokens
+            return (1.0 - tokens) / rate if rate > 0 else 60.0
+
+    def _prune(self, now: float) -> None:
+        # 丢弃长时间未访问的桶（已回满，丢弃不影响判定）
+        stale = [k for k, (_, ts) in self._buckets.items() if now - ts > _IDLE_SECONDS]
+        for k in stale:
+            self._buckets.pop(k, None)
+        if len(self._buckets) >= self._MAX_KEYS:
+            self._buckets.clear()
+
+
+class SQLiteBackend:
+    # 多 worker 共享：每次扣减在 BEGIN IMMEDIATE 事务内完成，保证跨进程原子性
+    # 每个 IP/用户名一行：每 _PRUNE_EVERY 次扣减清理一次长时间未访问的行，随机用户名的请求不会让文件无限增长
+    _PRUNE_EVERY = 1000
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._count_lock = threading.Lock()
+        self._takes = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=2.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute('CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, ts REAL NOT NULL)')
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        now = time.time()
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, ts FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens = burst if row is None else min(burst, float(row[0]) + (now - float(row[1])) * rate)
+            wait = 0.0
+            if tokens >= 1.0:
+                tokens -= 1.0
+            else:
+                wait = (1.0 - tokens) / rate if rate > 0 else 60.0
+            conn.execute('INSERT OR REPLACE INTO buckets (key, tokens, ts) VALUES (?, ?, ?)', (key, tokens, now))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        if self._due():
+            self._prune(conn, now)
+        return wait
+
+    def _due(self) -> bool:
+        with self._count_lock:
+            self._takes += 1
+            return self._takes % self._PRUNE_EVERY == 0
+
+    def _prune(self, conn: sqlite3.Connection, now: float) -> None:
+        try:
+            conn.execute('DELETE FROM buckets WHERE ts < ?', (now - _IDLE_SECONDS,))
+        except Exception:
+            # 清理失败（如锁等待超时）不影响限流判定，下一轮再试
+            pass
+
+
+_backend = SQLiteBackend(SHARED_DB_PATH) if BACKEND == 'sqlite' else MemoryBackend()
+
+
+def client_ip(request: Request) -> str:
+    if TRUST_PROXY:
+        fwd = str(request.headers.get('x-forwarded-for') or '').split(',')[0].strip()
+        if fwd:
+            return fwd
+    return str(getattr(getattr(request, 'client', None), 'host', '') or '')
+
+
+def check(rule: str, key: str) -> None:
+    if not ENABLED or not key:
+        return
+    rate, burst = RULES[rule]
+    try:
+        wait = _backend.take(f'{rule}:{key}', rate, burst)
+    except Exception:
+        # 限流存储异常时放行，不影响正常业务
+        ratelimit_requests.inc(rule, 'error')
+        return
+    if wait <= 0:
+        ratelimit_requests.inc(rule, 'allowed')
+        return
+    ratelimit_requests.inc(rule, 'limited')
+    raise HTTPException(
+        status_code=429,
+        detail='too many requests',
+        headers={'Retry-After': str(max(1, int(wait + 0.999)))},
+    )
+
+
+def limit_auth_ip(request: Request) -> None:
+    check('auth_ip', client_ip(request))
+
+
+def limit_public_ip(request: Request) -> None:
+    check('public_ip', client_ip(request))
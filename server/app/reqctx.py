@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+
+# 请求级上下文：由最外层中间件创建，SQL 事件/鉴权/序列化等环节往里累加统计。
+# 同步路由运行在线程池中，anyio 会拷贝 contextvars，因此线程内也能拿到同一个对象。
+@dataclass
+class RequestContext:
+    method: str
+    path: str
+    scope: dict[str, Any] = field(repr=False, default_factory=dict)
+    started: float = field(default_factory=time.perf_counter)
+    user_id: int | None = None
+    status: int = 0
+    elapsed: float = 0.0
+    sql_count: int = 0
+    sql_time: float = 0.0
+    response_bytes: int = 0
+    # SQL 文本 -> 执行次数（仅 SQL 剖析开启时记录，用于 N+1 检测）
+    sql_statements: dict[str, int] | None = None
+    # 请求 ID 与追踪数据（tracing.TraceMiddleware 设置）
+    request_id: str = ''
+    trace: Any = field(repr=False, default=None)
+
+    @property
+    def route(self) -> str:
+        # 路由模板（如 /groups/{group_id}/members）；未匹配到路由时归为 unmatched，避免标签基数爆炸
+        r = self.scope.get('route')
+        p = getattr(r, 'path', None)
+        return str(p) if p else 'unmatched'
+
+
+_current: ContextVar[RequestContext | None] = ContextVar('glimmer_request_ctx', default=None)
+_end_hooks: list[Callable[[RequestContext], None]] = []
+
+
+def current() -> RequestContext | None:
+    return _current.get()
+
+
+def begin(scope: dict[str, Any]) -> tuple[RequestContext, Any]:
+    ctx = RequestContext(method=str(scope.get('method') or ''), path=str(scope.get('path') or ''), scope=scope)
+    return ctx, _current.set(ctx)
+
+
+def add_end_hook(fn: Callable[[RequestContext], None]) -> None:
+    # 请求结束时（已写出响应）回调；钩子异常不影响请求本身
+    _end_hooks.append(fn)
+
+
+def end(ctx: RequestContext, token: Any) -> None:
+    try:
+        for fn in _end_hooks:
+            try:
+                fn(ctx)
+            except Exception:
+                pass
+    finally:
+        _current.reset(token)
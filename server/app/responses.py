@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import enum
+import json
+import os
+from contextvars import ContextVar
+from datetime import date, datetime
+from typing import Any
+
+from sqlalchemy.engine import Result
+from starlette.responses import JSONResponse, Response
+
+from . import metrics, tracing
+
+# orjson 为可选依赖：未安装时回退到标准库 json（输出格式与 FastAPI 默认 JSONResponse 一致）
+try:
+    import orjson
+except Exception:  # pragma: no cover
+    orjson = None
+
+# msgpack 为可选依赖：未安装时忽略客户端的 msgpack 协商，始终返回 JSON
+try:
+    import msgpack
+except Exception:  # pragma: no cover
+    msgpack = None
+
+MSGPACK_MEDIA_TYPE = 'application/msgpack'
+
+# 由 compression.MsgPackMiddleware 按 Accept 头设置
+prefer_msgpack: ContextVar[bool] = ContextVar('glimmer_prefer_msgpack', default=False)
+
+
+# 列表接口的快速序列化通道：直接由 Core 查询行生成 JSON，跳过逐行构造 Pydantic 模型 + FastAPI 二次校验。
+# 出现兼容问题时可设置 GLIMMER_FAST_JSON=0 回退到原有的 response_model 校验路径。
+FAST_JSON_ENABLED = (os.environ.get('GLIMMER_FAST_JSON') or '1').strip().lower() in ('1', 'true', 'yes', 'y', 'on')
+
+
+def _default(o: Any):
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    if isinstance(o, enum.Enum):
+        return o.value
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(',', ':'), default=_default).encode('utf-8')
+
+
+def loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def msgpack_dumps(content: Any) -> bytes:
+    # datetime 等与 JSON 输出保持一致（ISO 字符串），客户端无需区分两种格式的字段类型
+    return msgpack.packb(content, use_bin_type=True, default=_default)
+
+
+class FastJSONResponse(Response):
+    media_type = 'application/json'
+
+    def render(self, content: Any) -> bytes:
+        if msgpack is not None and prefer_msgpack.get():
+            self.media_type = MSGPACK_MEDIA_TYPE
+            with metrics.timed(metrics.serialize_seconds, 'msgpack'), tracing.span('serialize', format='msgpack'):
+                return msgpack_dumps(content)
+        with metrics.timed(metrics.serialize_seconds, 'json'), tracing.span('serialize', format='json'):
+            return dumps(content)
+
+
+class TracedJSONResponse(JSONResponse):
+    # 应用默认响应类：与 FastAPI 默认 JSONResponse 输出一致，仅把编码过程记入请求追踪
+    def render(self, content: Any) -> bytes:
+        with tracing.span('serialize', format='json'):
+            return super().render(content)
+
+
+def result_rows(result: Result) -> list[dict[str, Any]]:
+    # 以查询列名（label）作为字段名；查询侧负责把列命名/空值处理成与 *Out 模型一致
+    keys = list(result.keys())
+    return [dict(zip(keys, row)) for row in result]
+
+
+def rows_response(result: Result):
+    return list_response(result_rows(result))
+
+
+def list_response(rows: list[dict[str, Any]]):
+    if not FAST_JSON_ENABLED:
+        # 返回普通 dict 列表，由路由上的 response_model 做校验/序列化（旧路径）
+        return rows
+    return FastJSONResponse(rows)
@@ -79,6 +79,21 @@ class EngineerWipeIn(BaseModel):
     password: str = Field(min_length=1, max_length=128)
 
 
+class SqlProfConfigIn(BaseModel):
+    enabled: bool | None = None
+    slow_ms: float | None = Field(default=None, ge=0)
+    max_statements: int | None = Field(default=None, ge=1)
+    repeat_threshold: int | None = Field(default=None, ge=2)
+    reset: bool = False
+
+
+class TraceConfigIn(BaseModel):
+    enabled: bool | None = None
+    sample: float | None = Field(default=None, ge=0, le=1)
+    slow_ms: float | None = Field(default=None, ge=0)
+    max_spans: int | None = Field(default=None, ge=1)
+
+
 class GroupOut(BaseModel):
     id: int
     name: str
@@ -138,6 +153,21 @@ class VersionOut(BaseModel):
     updated_at: datetime
 
 
+class ApkMetaOut(BaseModel):
+    # 安装包元数据：版本取自 VersionConfig；客户端据 sha256 校验、据 etag 续传（If-Range）
+    available: bool
+    version: str
+    note: str
+    updated_at: datetime
+    filename: str = ''
+    size: int = 0
+    sha256: str = ''
+    etag: str = ''
+    url: str = ''
+    # 建议客户端在 [0, stagger_seconds] 内随机延后自动下载，避免发版后全员同时下载
+    stagger_seconds: float = 0
+
+
 class VersionIn(BaseModel):
     latest_version: str = Field(min_length=1, max_length=32)
     note: str = Field(default='', max_length=5000)
@@ -160,6 +190,17 @@ class AdIn(BaseModel):
     scroll_mode: str = '垂直滚动'
 
 
+class PollHintOut(BaseModel):
+    interval_seconds: float
+    backoff_seconds: float
+    updated_at: datetime
+
+
+class PollHintIn(BaseModel):
+    interval_seconds: float = Field(ge=2, le=600)
+    backoff_seconds: float = Field(default=0, ge=0, le=3600)
+
+
 class ChatSendIn(BaseModel):
     to_username: str = Field(min_length=1, max_length=64)
     text: str = Field(min_length=1, max_length=1000)
@@ -230,3 +271,22 @@ class CorrectionOut(BaseModel):
     reason: str
     status: str
     requested_at: datetime
+
+
+class ChangeOut(BaseModel):
+    seq: int
+    kind: str
+    op: str
+    id: int | None = None
+    group_id: int | None = None
+    user_id: int | None = None
+    data: dict | None = None
+    at: datetime
+
+
+class ChangesOut(BaseModel):
+    # reset=True：游标已失效（日志被清理/数据被清空/首次同步），客户端应全量拉取后从 next 继续
+    events: list[ChangeOut]
+    next: int
+    more: bool = False
+    reset: bool = False
@@ -1,9 +1,13 @@
+import hashlib
+import hmac
 import os
 from datetime import datetime, timedelta
 
 from jose import jwt
 from passlib.context import CryptContext
 
+from . import metrics, tracing
+
 
 pwd_context = CryptContext(schemes=["bcrypt_sha256"], deprecated="auto")
 
@@ -13,11 +17,19 @@ JWT_EXPIRE_MINUTES = int(os.environ.get('GLIMMER_JWT_EXPIRE_MINUTES') or 60 * 24
 
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    with metrics.timed(metrics.crypto_seconds, 'hash'), tracing.span('crypto', op='hash'):
+        return pwd_context.hash(password)
 
 
 def verify_password(password: str, password_hash: str) -> bool:
-    return pwd_context.verify(password, password_hash)
+    with metrics.timed(metrics.crypto_seconds, 'verify'), tracing.span('crypto', op='verify'):
+        return pwd_context.verify(password, password_hash)
+
+
+def config_fingerprint(*parts: str) -> str:
+    # 配置指纹（用于判断引导账号配置是否变化）：以 JWT_SECRET 为密钥的 HMAC，库里不留可离线爆破的明文摘要
+    msg = '\0'.join(str(p) for p in parts).encode('utf-8')
+    return hmac.new(JWT_SECRET.encode('utf-8'), msg, hashlib.sha256).hexdigest()
 
 
 def create_access_token(subject: str, extra: dict | None = None) -> str:
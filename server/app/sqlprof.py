@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from . import reqctx
+from .db import LOG_DIR
+
+
+# 按请求的 SQL 剖析：
+# - 每条语句带上当前路由注释（/* route=... */），便于在 SQLite 侧追踪来源
+# - 超过阈值的慢语句记录 EXPLAIN QUERY PLAN
+# - 单请求语句数超过阈值、或同一语句重复执行多次（N+1）时告警
+# - 汇总写入滚动报告文件
+# 默认关闭；工程师可通过 /engineer/sqlprof 在运行时开关与调整阈值。
+logger = logging.getLogger('glimmer.sqlprof')
+
+_lock = threading.Lock()
+
+config: dict[str, Any] = {
+    'enabled': (os.environ.get('GLIMMER_SQLPROF') or '0').strip().lower() in ('1', 'true', 'yes', 'y', 'on'),
+    'slow_ms': float(os.environ.get('GLIMMER_SQLPROF_SLOW_MS') or 50),
+    'max_statements': int(os.environ.get('GLIMMER_SQLPROF_MAX_STATEMENTS') or 30),
+    # 同一语句在单个请求内重复执行达到该次数，视为疑似 N+1
+    'repeat_threshold': int(os.environ.get('GLIMMER_SQLPROF_REPEAT') or 5),
+    'report_interval': float(os.environ.get('GLIMMER_SQLPROF_REPORT_INTERVAL') or 60),
+}
+
+REPORT_PATH = os.environ.get('GLIMMER_SQLPROF_REPORT') or os.path.join(LOG_DIR, 'sqlprof_report.json')
+
+_slow: deque[dict[str, Any]] = deque(maxlen=200)
+_flagged: deque[dict[str, Any]] = deque(maxlen=200)
+# route -> {requests, statements, max_statements, flagged}
+_routes: dict[str, dict[str, Any]] = {}
+_last_write = 0.0
+
+
+def configure(**kwargs: Any) -> dict[str, Any]:
+    with _lock:
+        for k, v in kwargs.items():
+            if v is None or k not in config:
+                continue
+            config[k] = type(config[k])(v)
+    return dict(config)
+
+
+def reset() -> None:
+    with _lock:
+        _slow.clear()
+        _flagged.clear()
+        _routes.clear()
+
+
+def _explain(cursor, statement: str, parameters: Any) -> list[str]:
+    try:
+        cur = cursor.connection.cursor()
+        try:
+            cur.execute('EXPLAIN QUERY PLAN ' + statement, parameters or ())
+            return [str(r[-1]) for r in cur.fetchall()]
+        finally:
+            cur.close()
+    except Exception as e:
+        return [f'explain failed: {e}']
+
+
+def instrument_engine(engine: Engine) -> None:
+    is_sqlite = engine.dialect.name == 'sqlite'
+
+    @event.listens_for(engine, 'before_cursor_execute', retval=True)
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if not config['enabled']:
+            return statement, parameters
+        ctx = reqctx.current()
+        route = ctx.route if ctx is not None else 'background'
+        conn.info.setdefault('glimmer_prof', []).append((time.perf_counter(), statement))
+        return f'/* route={route} */ {statement}', parameters
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stack = conn.info.get('glimmer_prof')
+        if not stack:
+            return
+        t0, raw = stack.pop()
+        ms = (time.perf_counter() - t0) * 1000.0
+
+        ctx = reqctx.current()
+        if ctx is not None:
+            if ctx.sql_statements is None:
+                ctx.sql_statements = {}
+            ctx.sql_statements[raw] = ctx.sql_statements.get(raw, 0) + 1
+
+        if ms < config['slow_ms']:
+            return
+        plan = _explain(cursor, raw, parameters) if (is_sqlite and not executemany) else []
+        item = {
+            'ts': datetime.now().isoformat(timespec='seconds'),
+            'route': (ctx.route if ctx is not None else 'background'),
+            'ms': round(ms, 2),
+            'statement': raw[:2000],
+            'plan': plan,
+        }
+        with _lock:
+            _slow.append(item)
+        logger.warning('slow sql %.1fms route=%s plan=%s sql=%s', ms, item['route'], ' | '.join(plan), raw[:500])
+
+    @event.listens_for(engine, 'handle_error')
+    def _error(exc_ctx):
+        stack = exc_ctx.connection.info.get('glimmer_prof') if exc_ctx.connection is not None else None
+        if stack:
+            stack.pop()
+
+
+def _on_request_end(ctx: reqctx.RequestContext) -> None:
+    stmts = ctx.sql_statements
+    if not config['enabled'] or stmts is None:
+        return
+
+    total = sum(stmts.values())
+    route = ctx.route
+    repeated = sorted(((n, s) for s, n in stmts.items() if n >= config['repeat_threshold']), reverse=True)
+    flagged = total > config['max_statements'] or bool(repeated)
+
+    with _lock:
+        r = _routes.setdefault(route, {'requests': 0, 'statements': 0, 'max_statements': 0, 'flagged': 0})
+        r['requests'] += 1
+        r['statements'] += total
+        r['max_statements'] = max(r['max_statements'], total)
+        if flagged:
+            r['flagged'] += 1
+            _flagged.append({
+                'ts': datetime.now().isoformat(timespec='seconds'),
+                'route': route,
+                'method': ctx.method,
+                'statements': total,
+                'repeated': [{'count': n, 'statement': s[:500]} for n, s in repeated[:5]],
+            })
+
+    if flagged:
+        logger.warning('sql statements=%d route=%s %s (possible N+1)', total, route, ctx.method)
+    _maybe_write_report()
+
+
+def report() -> dict[str, Any]:
+    with _lock:
+        routes = {
+            k: dict(v, avg_statements=round(v['statements'] / v['requests'], 2) if v['requests'] else 0)
+            for k, v in _routes.items()
+        }
+        return {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'config': dict(config),
+            'routes': dict(sorted(routes.items(), key=lambda kv: -kv[1]['avg_statements'])),
+            'slow_queries': list(_slow),
+            'flagged_requests': list(_flagged),
+        }
+
+
+def write_report() -> None:
+    data = report()
+    os.makedirs(os.path.dirname(REPORT_PATH), exist_ok=True)
+    tmp = REPORT_PATH + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, REPORT_PATH)
+
+
+def _maybe_write_report() -> None:
+    global _last_write
+    now = time.monotonic()
+    with _lock:
+        if now - _last_write < config['report_interval']:
+            return
+        _last_write = now
+
+    # 报告写盘放到后台线程，避免阻塞请求
+    def _run():
+        try:
+            write_report()
+        except Exception:
+            logger.exception('failed to write sqlprof report')
+
+    threading.Thread(target=_run, name='glimmer-sqlprof-report', daemon=True).start()
+
+
+reqctx.add_end_hook(_on_request_end)
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import os
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import distinct, func, select
+
+from . import backup
+from .cache import TTLCache
+from .db import read_engine
+from .models import Attendance, ChatMessage, CorrectionRequest, CorrectionStatus, Group, JoinRequest, JoinStatus, User
+
+
+# 工程师统计面板（/engineer/stats）：各角色用户数、今日活跃、今日按小时打卡量、待审核队列、聊天量、数据库大小。
+# 每项都只走索引（role/status/date/created_at/read_at），不扫业务大表；结果放进短 TTL 缓存，
+# 面板反复刷新或多人同时查看时 TTL 内只查一次。多 worker 时各进程各自缓存，数字最多滞后 TTL 秒。
+STATS_TTL = float(os.environ.get('GLIMMER_STATS_TTL') or 30)
+
+_cache = TTLCache('stats', STATS_TTL)
+
+
+def _db_size(conn) -> dict:
+    out = {}
+    if read_engine.dialect.name == 'sqlite':
+        page_size = int(conn.exec_driver_sql('PRAGMA page_size').scalar() or 0)
+        out['page_count'] = int(conn.exec_driver_sql('PRAGMA page_count').scalar() or 0)
+        out['freelist_count'] = int(conn.exec_driver_sql('PRAGMA freelist_count').scalar() or 0)
+        out['page_size'] = page_size
+    path = backup.source_path()
+    if path:
+        for key, suffix in (('db_bytes', ''), ('wal_bytes', '-wal')):
+            try:
+                out[key] = os.path.getsize(path + suffix)
+            except OSError:
+                out[key] = 0
+    return out
+
+
+def collect() -> dict:
+    t0 = time.perf_counter()
+    now = datetime.now()
+    # 打卡的 date/punched_at 为客户端本地时间；聊天 created_at 为 UTC
+    today = now.strftime('%Y-%m-%d')
+    utcnow = datetime.utcnow()
+    with read_engine.connect() as conn:
+        roles = {str(getattr(r, 'value', r)): int(n) for r, n in conn.execute(select(User.role, func.count()).group_by(User.role))}
+
+        active = conn.execute(select(func.count(distinct(Attendance.user_id))).where(Attendance.date == today)).scalar_one()
+        by_hour = [0] * 24
+        for hour, n in conn.execute(
+            select(func.strftime('%H', Attendance.punched_at).label('h'), func.count())
+            .where(Attendance.date == today)
+            .group_by('h')
+        ):
+            if hour is not None and 0 <= int(hour) < 24:
+                by_hour[int(hour)] = int(n)
+
+        pending_joins = conn.execute(
+            select(func.count()).select_from(JoinRequest).where(JoinRequest.status == JoinStatus.pending)
+        ).scalar_one()
+        pending_corrections = conn.execute(
+            select(func.count()).select_from(CorrectionRequest).where(CorrectionRequest.status == CorrectionStatus.pending)
+        ).scalar_one()
+
+        chat_1h = conn.execute(
+            select(func.count()).select_from(ChatMessage).where(ChatMessage.created_at >= utcnow - timedelta(hours=1))
+        ).scalar_one()
+        chat_24h = conn.execute(
+            select(func.count()).select_from(ChatMessage).where(ChatMessage.created_at >= utcnow - timedelta(hours=24))
+        ).scalar_one()
+        unread = conn.execute(select(func.count()).select_from(ChatMessage).where(ChatMessage.read_at.is_(None))).scalar_one()
+
+        groups = conn.execute(select(func.count()).select_from(Group)).scalar_one()
+        db = _db_size(conn)
+
+    return {
+        'generated_at': now.isoformat(timespec='seconds'),
+        'ttl': STATS_TTL,
+        'users': {'total': sum(roles.values()), 'by_role': roles},
+        'groups': int(groups),
+        'today': {
+            'date': today,
+            'active_users': int(active),
+            'punches': sum(by_hour),
+            'punches_by_hour': by_hour,
+        },
+        'pending': {'join_requests': int(pending_joins), 'corrections': int(pending_corrections)},
+        'chat': {'messages_1h': int(chat_1h), 'messages_24h': int(chat_24h), 'unread': int(unread)},
+        'db': db,
+        'query_ms': round((time.perf_counter() - t0) * 1000, 1),
+    }
+
+
+def snapshot(refresh: bool = False) -> dict:
+    if refresh:
+        _cache.invalidate()
+    return _cache.get_or_load('engineer', collect)
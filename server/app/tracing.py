@@ -0,0 +1,302 @@
+from __future__ import annotations
+
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from . import logsink, metrics, reqctx
+from .db import LOG_DIR
+
+
+# 请求追踪：每个请求分配请求 ID（响应头 X-Request-ID，客户端可自带），请求内各环节记为嵌套 span：
+#   admission 排队、auth（get_current_user）、db.connect（连接池等待）、每条 SQL、session.commit（含 flush 与落盘）、
+#   crypto（bcrypt）、serialize（响应编码）；未被 span 覆盖的时间即路由函数本身/响应校验。
+# 开启时每个请求都在内存中收集 span（尾部采样）：按 sample 比例随机导出，慢请求（slow_ms）、5xx、
+# 以及带 X-Glimmer-Trace: 1 请求头的请求总是导出。导出经后台队列写入滚动 JSONL 文件，
+# 用 tools/trace_view.py 汇总。工程师可通过 /engineer/trace 在运行时调整。
+config: dict[str, Any] = {
+    'enabled': (os.environ.get('GLIMMER_TRACE') or '1').strip().lower() in ('1', 'true', 'yes', 'y', 'on'),
+    'sample': float(os.environ.get('GLIMMER_TRACE_SAMPLE') or 0.01),
+    'slow_ms': float(os.environ.get('GLIMMER_TRACE_SLOW_MS') or 500),
+    # 单个请求最多记录的 span 数（N+1 请求不会无限占用内存），超出部分只计数
+    'max_spans': int(os.environ.get('GLIMMER_TRACE_MAX_SPANS') or 200),
+}
+
+TRACE_PATH = os.environ.get('GLIMMER_TRACE_FILE') or os.path.join(LOG_DIR, 'traces.jsonl')
+
+_lock = threading.Lock()
+
+_writer = logsink.writer(
+    'trace',
+    TRACE_PATH,
+    max_bytes=int(float(os.environ.get('GLIMMER_TRACE_MAX_MB') or 20) * 1024 * 1024),
+    backups=int(os.environ.get('GLIMMER_TRACE_BACKUPS') or 5),
+)
+
+traces_exported = metrics.counter('glimmer_traces_exported_total', 'Request traces exported, by reason.', ('reason',))
+
+_REQUEST_ID_RE = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+_SQL_MAX = 300
+
+# 当前 span id：嵌套 span 以它为父节点（0 = 请求本身）。同步路由在线程池中运行时 contextvars 被拷贝，嵌套关系不受影响。
+_parent: ContextVar[int] = ContextVar('glimmer_span_parent', default=0)
+
+
+class Trace:
+    __slots__ = ('request_id', 'forced', 'spans', 'dropped', '_next')
+
+    def __init__(self, request_id: str, forced: bool = False):
+        self.request_id = request_id
+        self.forced = forced
+        # [id, parent, name, start, end, attrs]；start/end 为 perf_counter 秒
+        self.spans: list[list[Any]] = []
+        self.dropped = 0
+        self._next = 0
+
+    def open(self, name: str, parent: int, start: float, attrs: dict[str, Any] | None) -> list[Any] | None:
+        if len(self.spans) >= config['max_spans']:
+            self.dropped += 1
+            return None
+        self._next += 1
+        rec = [self._next, parent, name, start, None, attrs]
+        self.spans.append(rec)
+        return rec
+
+
+def configure(**kwargs: Any) -> dict[str, Any]:
+    with _lock:
+        for k, v in kwargs.items():
+            if v is None or k not in config:
+                continue
+            config[k] = type(config[k])(v)
+    return dict(config)
+
+
+def _current_trace() -> Trace | None:
+    ctx = reqctx.current()
+    return ctx.trace if ctx is not None else None
+
+
+class span:
+    # 用法：with tracing.span('crypto', op='verify'): ...；不在请求内或未开启追踪时几乎没有开销
+    __slots__ = ('name', 'attrs', '_rec', '_token')
+
+    def __init__(self, name: str, **attrs: Any):
+        self.name = name
+        self.attrs = attrs or None
+        self._rec = None
+        self._token = None
+
+    def __enter__(self):
+        tr = _current_trace()
+        if tr is not None:
+            self._rec = tr.open(self.name, _parent.get(), time.perf_counter(), self.attrs)
+            if self._rec is not None:
+                self._token = _parent.set(self._rec[0])
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        rec = self._rec
+        if rec is not None:
+            rec[4] = time.perf_counter()
+            if exc_type is not None:
+                rec[5] = dict(rec[5] or {}, error=exc_type.__name__)
+            _parent.reset(self._token)
+        return False
+
+
+def add_span(name: str, start: float, end: float, **attrs: Any) -> None:
+    # 记录一个已结束的 span（如 admission 排队，开始时追踪上下文尚不可用的场景）
+    tr = _current_trace()
+    if tr is not None:
+        rec = tr.open(name, _parent.get(), start, attrs or None)
+        if rec is not None:
+            rec[4] = end
+
+
+def _sql_text(statement: str) -> str:
+    s = ' '.join(statement.split())
+    return s if len(s) <= _SQL_MAX else s[:_SQL_MAX] + '...'
+
+
+def instrument_engine(engine: Engine, name: str = 'main') -> None:
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        tr = _current_trace()
+        rec = tr.open('db', _parent.get(), time.perf_counter(), None) if tr is not None else None
+        conn.info.setdefault('glimmer_trace', []).append(rec)
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stack = conn.info.get('glimmer_trace')
+        rec = stack.pop() if stack else None
+        if rec is not None:
+            rec[4] = time.perf_counter()
+            rec[5] = {'engine': name, 'sql': _sql_text(statement)}
+            if executemany:
+                rec[5]['many'] = True
+
+    @event.listens_for(engine, 'handle_error')
+    def _error(exc_ctx):
+        stack = exc_ctx.connection.info.get('glimmer_trace') if exc_ctx.connection is not None else None
+        rec = stack.pop() if stack else None
+        if rec is not None:
+            rec[4] = time.perf_counter()
+            rec[5] = {'engine': name, 'sql': _sql_text(exc_ctx.statement or ''), 'error': type(exc_ctx.original_exception).__name__}
+
+    # 连接池等待（写连接只有一个，写请求在这里排队）
+    pool = engine.pool
+    raw_connect = pool.connect
+
+    def _traced_connect():
+        tr = _current_trace()
+        if tr is None:
+            return raw_connect()
+        t0 = time.perf_counter()
+        try:
+            return raw_connect()
+        finally:
+            rec = tr.open('db.connect', _parent.get(), t0, {'engine': name})
+            if rec is not None:
+                rec[4] = time.perf_counter()
+
+    pool.connect = _traced_connect
+
+
+# session.commit()：before_commit 之后依次 flush（SQL 作为子 span）、COMMIT（WAL 写入/fsync），最后 after_commit
+@event.listens_for(Session, 'before_commit')
+def _before_commit(session):
+    tr = _current_trace()
+    if tr is None:
+        return
+    rec = tr.open('session.commit', _parent.get(), time.perf_counter(), None)
+    if rec is not None:
+        session.info['glimmer_trace_commit'] = (rec, _parent.set(rec[0]))
+
+
+def _end_commit(session, error: bool) -> None:
+    item = session.info.pop('glimmer_trace_commit', None)
+    if item is None:
+        return
+    rec, token = item
+    rec[4] = time.perf_counter()
+    if error:
+        rec[5] = {'error': 'rollback'}
+    try:
+        _parent.reset(token)
+    except Exception:
+        pass
+
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session):
+    _end_commit(session, False)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _after_rollback(session, previous_transaction):
+    _end_commit(session, True)
+
+
+def _request_id(scope: Scope) -> tuple[str, bool]:
+    rid, forced = '', False
+    for k, v in scope.get('headers') or ():
+        if k == b'x-request-id':
+            raw = v.decode('latin-1').strip()
+            if _REQUEST_ID_RE.match(raw):
+                rid = raw
+        elif k == b'x-glimmer-trace':
+            forced = v.strip() in (b'1', b'true', b'yes', b'on')
+    return rid or uuid.uuid4().hex[:16], forced
+
+
+class TraceMiddleware:
+    # 位于 metrics 中间件之内（请求上下文已建立）、准入控制之外（排队时间计入追踪）
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        ctx = reqctx.current()
+        if scope['type'] != 'http' or ctx is None:
+            await self.app(scope, receive, send)
+            return
+
+        rid, forced = _request_id(scope)
+        ctx.request_id = rid
+        if config['enabled']:
+            ctx.trace = Trace(rid, forced)
+        header = (b'x-request-id', rid.encode('latin-1'))
+
+        async def _send(message: Message) -> None:
+            if message['type'] == 'http.response.start':
+                message['headers'] = list(message.get('headers') or ()) + [header]
+            await send(message)
+
+        await self.app(scope, receive, _send)
+
+
+def _export_reason(ctx: reqctx.RequestContext, tr: Trace) -> str:
+    if tr.forced:
+        return 'forced'
+    if ctx.status >= 500 or ctx.status == 0:
+        return 'error'
+    if ctx.elapsed * 1000 >= config['slow_ms']:
+        return 'slow'
+    if random.random() < config['sample']:
+        return 'sample'
+    return ''
+
+
+def _on_request_end(ctx: reqctx.RequestContext) -> None:
+    tr = ctx.trace
+    if tr is None:
+        return
+    reason = _export_reason(ctx, tr)
+    if not reason:
+        return
+
+    t0 = ctx.started
+    end = t0 + ctx.elapsed
+    spans = []
+    for sid, parent, name, start, stop, attrs in tr.spans:
+        item = {'id': sid, 'parent': parent, 'name': name, 'start': round((start - t0) * 1000, 3)}
+        # 未正常结束的 span（如请求中途异常）按请求结束时间截断
+        item['ms'] = round(((stop if stop is not None else end) - start) * 1000, 3)
+        if attrs:
+            item.update(attrs)
+        spans.append(item)
+
+    traces_exported.inc(reason)
+    _writer.write({
+        'ts': datetime.now().isoformat(timespec='milliseconds'),
+        'request_id': tr.request_id,
+        'reason': reason,
+        'method': ctx.method,
+        'route': ctx.route,
+        'path': ctx.path,
+        'status': ctx.status,
+        'user_id': ctx.user_id,
+        'ms': round(ctx.elapsed * 1000, 3),
+        'sql_count': ctx.sql_count,
+        'sql_ms': round(ctx.sql_time * 1000, 3),
+        'dropped_spans': tr.dropped,
+        'spans': spans,
+    })
+
+
+def install(app) -> None:
+    app.add_middleware(TraceMiddleware)
+
+
+reqctx.add_end_hook(_on_request_end)
@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy import delete, func, select
+
+from . import archive, changes, metrics
+from .db import LOG_DIR, SessionLocal, engine, read_engine
+from .jobs import FileLock
+from .models import (
+    Announcement, Attendance, ChangeEvent, ChatMessage, CorrectionRequest, Group, JoinRequest, Membership, Role, User,
+)
+from .responses import dumps, loads
+
+
+# 工程师“清理全部数据”的后台任务：按表分批删除（每批一个短事务，批次之间让出写连接），
+# 其它接口在清理期间照常响应。进度写入 logs/wipe_state.json，GET /engineer/wipe_all 查看。
+# - 可恢复：每批提交后更新进度；进程崩溃/重启后，启动时发现未完成的任务会自动继续（删除本身幂等）
+# - 顺序按外键依赖：先子表后父表，最后删除非工程师账号；全部删完后再扫一遍，把清理期间新写入的数据一并删掉
+# - 收尾：删除归档文件，VACUUM 回收空间，WAL 检查点（TRUNCATE）缩小 -wal 文件
+# 多 worker 部署时通过文件锁只在一个进程内执行。
+logger = logging.getLogger('glimmer.wipe')
+
+# 每批删除的行数
+BATCH = max(1, int(os.environ.get('GLIMMER_WIPE_BATCH') or 2000))
+# 批次之间的间隔（秒），让排队的业务写入先执行
+PAUSE = float(os.environ.get('GLIMMER_WIPE_PAUSE') or 0.02)
+# 扫尾轮数上限（清理期间仍有写入时）
+_MAX_PASSES = 3
+
+STATE_PATH = os.path.join(LOG_DIR, 'wipe_state.json')
+
+# (步骤名, 模型, 额外条件)
+_STEPS = (
+    ('chat_messages', ChatMessage, None),
+    ('attendance', Attendance, None),
+    ('correction_requests', CorrectionRequest, None),
+    ('join_requests', JoinRequest, None),
+    ('memberships', Membership, None),
+    ('announcements', Announcement, None),
+    ('groups', Group, None),
+    # 变更日志里有已删除数据的内容：一并删除，最后追加一条 reset 事件（不含数据，保留）通知客户端全量刷新
+    ('change_events', ChangeEvent, ChangeEvent.kind != 'reset'),
+    # 保留工程师账号，以便后续重新初始化/创建管理员
+    ('users', User, User.role != Role.engineer),
+)
+
+wipe_rows = metrics.counter('glimmer_wipe_rows_total', 'Rows deleted by the engineer wipe job, by table.', ('table',))
+
+_lock = FileLock(os.path.join(LOG_DIR, '.wipe.lock'))
+_guard = threading.Lock()
+_thread: threading.Thread | None = None
+
+
+def _where(extra):
+    return (extra,) if extra is not None else ()
+
+
+def load_state() -> dict | None:
+    try:
+        with open(STATE_PATH, 'rb') as f:
+            return loads(f.read())
+    except Exception:
+        return None
+
+
+def _save_state(state: dict) -> None:
+    state['updated_at'] = datetime.now().isoformat(timespec='seconds')
+    os.makedirs(LOG_DIR, exist_ok=True)
+    tmp = STATE_PATH + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(dumps(state))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, STATE_PATH)
+
+
+def _count(model, extra) -> int:
+    with read_engine.connect() as conn:
+        return int(conn.execute(select(func.count()).select_from(model).where(*_where(extra))).scalar_one())
+
+
+def _delete_batch(model, extra) -> int:
+    # DELETE ... WHERE id IN (SELECT id ... LIMIT n)：每批只锁定有限行数，事务很短
+    pk = model.__mapper__.primary_key[0]
+    ids = select(pk).where(*_where(extra)).limit(BATCH).scalar_subquery()
+    with engine.begin() as conn:
+        return int(conn.execute(delete(model).where(pk.in_(ids))).rowcount or 0)
+
+
+def _new_state(by: int | None) -> dict:
+    return {
+        'id': uuid.uuid4().hex[:12],
+        'status': 'running',
+        'requested_by': by,
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'finished_at': None,
+        'pass': 1,
+        'step': _STEPS[0][0],
+        'tables': {name: {'total': _count(model, extra), 'deleted': 0, 'done': False} for name, model, extra in _STEPS},
+        'journal_reset': False,
+        'archive': False,
+        'vacuum': None,
+        'resumed': 0,
+        'error': None,
+    }
+
+
+def _finish_sqlite(state: dict) -> None:
+    if engine.dialect.name != 'sqlite':
+        return
+    t0 = time.perf_counter()
+    with engine.connect() as conn:
+        # 数据已基本清空，VACUUM 很快；之后 TRUNCATE 检查点把 VACUUM 写入 WAL 的页落回主库并截断 -wal
+        conn.exec_driver_sql('VACUUM')
+        busy, log, done = conn.exec_driver_sql('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()[0]
+    state['vacuum'] = {'ms': round((time.perf_counter() - t0) * 1000, 1), 'checkpoint_busy': int(busy)}
+
+
+def _run(state: dict) -> None:
+    try:
+        while True:
+            for name, model, extra in _STEPS:
+                info = state['tables'][name]
+                if info['done']:
+                    continue
+                state['step'] = name
+                while True:
+                    n = _delete_batch(model, extra)
+                    if n:
+                        info['deleted'] += n
+                        wipe_rows.inc(name, amount=n)
+                        _save_state(state)
+                    if n < BATCH:
+                        break
+                    time.sleep(PAUSE)
+                info['done'] = True
+                _save_state(state)
+
+            # 扫尾：清理期间新写入的数据（如已清空的表又有人打卡）再删一轮
+            leftover = [name for name, model, extra in _STEPS if _count(model, extra)]
+            if not leftover or state['pass'] >= _MAX_PASSES:
+                break
+            state['pass'] += 1
+            for name in leftover:
+                state['tables'][name]['done'] = False
+            _save_state(state)
+
+        if not state.get('journal_reset'):
+            db = SessionLocal()
+            try:
+                changes.record(db, 'reset', scope=changes.SCOPE_ALL)
+                db.commit()
+            finally:
+                db.close()
+            state['journal_reset'] = True
+            _save_state(state)
+
+        if not state['archive']:
+            state['step'] = 'archive'
+            archive.wipe()
+            state['archive'] = True
+            _save_state(state)
+
+        state['step'] = 'vacuum'
+        _save_state(state)
+        _finish_sqlite(state)
+        state.update(status='done', step=None, finished_at=datetime.now().isoformat(timespec='seconds'))
+        _save_state(state)
+        logger.info('wipe %s finished: %s', state['id'], {k: v['deleted'] for k, v in state['tables'].items()})
+    except Exception as e:
+        logger.exception('wipe %s failed at %s', state.get('id'), state.get('step'))
+        state.update(status='error', error=f'{type(e).__name__}: {e}')
+        try:
+            _save_state(state)
+        except Exception:
+            pass
+    finally:
+        _lock.release()
+
+
+def is_running() -> bool:
+    return _thread is not None and _thread.is_alive()
+
+
+def _launch(state: dict) -> None:
+    global _thread
+    _thread = threading.Thread(target=_run, args=(state,), name='glimmer-wipe', daemon=True)
+    _thread.start()
+
+
+def start(requested_by: int | None = None) -> tuple[bool, dict | None]:
+    # 返回 (是否新启动, 当前状态)；已有任务在运行（本进程或其它 worker）时不重复启动
+    with _guard:
+        if is_running() or not _lock.try_acquire():
+            return False, load_state()
+        try:
+            state = load_state()
+            if state is None or state.get('status') != 'running':
+                state = _new_state(requested_by)
+            else:
+                state['resumed'] = int(state.get('resumed') or 0) + 1
+            state['status'] = 'running'
+            _save_state(state)
+        except Exception:
+            _lock.release()
+            raise
+        _launch(state)
+        return True, state
+
+
+def resume() -> bool:
+    # 启动时调用：上次任务未完成（进程崩溃/重启）则继续执行
+    state = load_state()
+    if state is None or state.get('status') != 'running':
+        return False
+    started, _ = start(state.get('requested_by'))
+    if started:
+        logger.warning('resuming interrupted wipe %s at %s', state.get('id'), state.get('step'))
+    return started
+
+
+def status() -> dict:
+    state = load_state()
+    if state is not None:
+        tables = state.get('tables') or {}
+        total = sum(int(t.get('total') or 0) for t in tables.values())
+        deleted = sum(int(t.get('deleted') or 0) for t in tables.values())
+        state['progress'] = round(min(1.0, deleted / total), 4) if total else (1.0 if state.get('status') == 'done' else 0.0)
+    # 状态文件为 running 但没有进程在执行（崩溃后尚未重启）时，再次 POST /engineer/wipe_all 即可继续
+    running = is_running() or bool(state and state.get('status') == 'running')
+    return {'running': running, 'batch': BATCH, 'job': state}
@@ -18,6 +18,15 @@ if __name__ == '__main__':
     reload_flag = (os.environ.get('GLIMMER_RELOAD') or '0').strip().lower() in ('1', 'true', 'yes', 'y', 'on')
     log_level = (os.environ.get('GLIMMER_LOG_LEVEL') or 'info').strip().lower()
 
+    # 生产多进程模式：GLIMMER_WORKERS=N（或 auto = CPU 核数）。
+    # bcrypt/JSON/Pydantic 都是 CPU 密集，多进程才能用满多核；进程间缓存一致性见 app/coherence.py。
+    # 平滑重启：向主进程发送 SIGHUP，uvicorn 会逐个重启 worker。
+    raw_workers = (os.environ.get('GLIMMER_WORKERS') or '1').strip().lower()
+    workers = (os.cpu_count() or 1) if raw_workers == 'auto' else max(1, int(raw_workers or 1))
+    if reload_flag and workers > 1:
+        print('GLIMMER_RELOAD 与多进程模式不兼容，已忽略 GLIMMER_WORKERS')
+        workers = 1
+
     server_dir = os.path.dirname(os.path.abspath(__file__))
 
     kwargs = {
@@ -26,6 +35,23 @@ if __name__ == '__main__':
         'reload': reload_flag,
         'log_level': log_level,
     }
+    # 结构化访问日志（app/accesslog.py，后台线程写入）开启时，关闭 uvicorn 逐请求同步输出的访问日志
+    structured = (os.environ.get('GLIMMER_ACCESS_LOG') or '1').strip().lower() in ('1', 'true', 'yes', 'y', 'on')
+    keep_uvicorn = (os.environ.get('GLIMMER_UVICORN_ACCESS_LOG') or '0').strip().lower() in ('1', 'true', 'yes', 'y', 'on')
+    kwargs['access_log'] = keep_uvicorn or not structured
+    if workers > 1:
+        kwargs['workers'] = workers
+
+    # 单 worker 并发上限：超出直接 503，避免排队请求无限堆积（0 表示不限制）
+    limit_concurrency = int(os.environ.get('GLIMMER_LIMIT_CONCURRENCY') or 0)
+    if limit_concurrency > 0:
+        kwargs['limit_concurrency'] = limit_concurrency
+    # 处理一定请求数后回收 worker（防内存缓慢增长），多进程模式下由主进程自动拉起新进程
+    max_requests = int(os.environ.get('GLIMMER_MAX_REQUESTS') or 0)
+    if max_requests > 0 and workers > 1:
+        kwargs['limit_max_requests'] = max_requests
+    kwargs['timeout_graceful_shutdown'] = int(os.environ.get('GLIMMER_GRACEFUL_TIMEOUT') or 20)
+
     if reload_flag:
         kwargs.update(
             {
@@ -0,0 +1,235 @@
+import os
+import random
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import pytest
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+# 导入 app.* 之前指向临时目录：测试库由 models.py 建表，不触碰真实数据；后台任务与限流关闭
+_TMP = tempfile.mkdtemp(prefix='glimmer_tests_')
+os.environ['GLIMMER_DB_PATH'] = os.path.join(_TMP, 'test.sqlite')
+os.environ['GLIMMER_LOG_DIR'] = os.path.join(_TMP, 'logs')
+os.environ['GLIMMER_ARCHIVE_DIR'] = os.path.join(_TMP, 'archive')
+os.environ['GLIMMER_BACKUP_DIR'] = os.path.join(_TMP, 'backups')
+os.environ['GLIMMER_ARCHIVE_INTERVAL'] = '0'
+os.environ['GLIMMER_BACKUP_INTERVAL'] = '0'
+os.environ['GLIMMER_MAINT_CHECK_INTERVAL'] = '0'
+os.environ['GLIMMER_RATELIMIT'] = '0'
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event, insert  # noqa: E402
+
+from app import db as app_db  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import (  # noqa: E402
+    Announcement, AnnouncementScope, Attendance, ChatMessage, CorrectionRequest, CorrectionStatus,
+    Group, JoinRequest, JoinStatus, Membership, Role, User,
+)
+from app.security import create_access_token  # noqa: E402
+
+
+# 生成数据规模：足以让全表扫描与索引查找拉开数量级差距，又能在几秒内建好
+USERS = 400
+GROUP_SIZE = 20
+MONTHS = ('2026-01', '2026-02', '2026-03')
+CHATS = 30000
+ANNOUNCEMENTS_PER_GROUP = 10
+
+
+def _seed() -> dict:
+    rnd = random.Random(20260101)
+    n_groups = USERS // GROUP_SIZE
+    first_id = 200000
+    users = [
+        {
+            'id': first_id + i,
+            'username': f'qp{i:04d}',
+            'password_hash': 'x',
+            'role': Role.admin if i % GROUP_SIZE == 0 else Role.user,
+        }
+        for i in range(USERS)
+    ]
+    now = datetime.utcnow()
+    with app_db.engine.begin() as conn:
+        conn.execute(insert(User), users)
+        conn.execute(insert(Group), [
+            {'id': first_id + g, 'name': f'g{g}', 'group_code': f'QP{g:05d}', 'created_by_user_id': first_id + g * GROUP_SIZE}
+            for g in range(n_groups)
+        ])
+        conn.execute(insert(Membership), [
+            {'user_id': u['id'], 'group_id': first_id + i // GROUP_SIZE, 'is_group_admin': i % GROUP_SIZE == 0}
+            for i, u in enumerate(users)
+        ])
+
+        rows = []
+        for month in MONTHS:
+            y, m = (int(x) for x in month.split('-'))
+            d = date(y, m, 1)
+            while d.month == m:
+                if d.weekday() < 5:
+                    for i, u in enumerate(users):
+                        gid = first_id + i // GROUP_SIZE
+                        base = datetime(d.year, d.month, d.day)
+                        for pt, hour in (('checkin', 8), ('checkout', 18)):
+                            rows.append({
+                                'user_id': u['id'], 'group_id': gid, 'date': d.isoformat(), 'punch_type': pt,
+                                'punched_at': base + timedelta(hours=hour, seconds=rnd.randint(0, 3600)),
+                                'status': '打卡成功', 'notes': '',
+                            })
+                d += timedelta(days=1)
+        conn.execute(insert(Attendance), rows)
+
+        chats = []
+        for i in range(CHATS):
+            a = rnd.randrange(USERS)
+            b = (a // GROUP_SIZE) * GROUP_SIZE + rnd.randrange(GROUP_SIZE)
+            if a == b:
+                continue
+            sent = now - timedelta(minutes=rnd.randint(1, 60 * 24 * 20))
+            chats.append({
+                'sender_id': first_id + a, 'receiver_id': first_id + b, 'text': f'm{i}', 'created_at': sent,
+                'read_at': None if rnd.random() < 0.1 else sent,
+            })
+        conn.execute(insert(ChatMessage), chats)
+
+        anns = [
+            {'scope': AnnouncementScope.global_, 'group_id': None, 'title': 't', 'content': 'c', 'created_at': now - timedelta(hours=i), 'created_by_user_id': first_id}
+            for i in range(50)
+        ]
+        for g in range(n_groups):
+            for i in range(ANNOUNCEMENTS_PER_GROUP):
+                anns.append({
+                    'scope': AnnouncementScope.group, 'group_id': first_id + g, 'title': 't', 'content': 'c',
+                    'created_at': now - timedelta(hours=rnd.randint(1, 24 * 60)), 'created_by_user_id': first_id + g * GROUP_SIZE,
+                })
+        conn.execute(insert(Announcement), anns)
+
+        conn.execute(insert(CorrectionRequest), [
+            {'user_id': first_id + i, 'group_id': first_id + i // GROUP_SIZE, 'date': '2026-02-%02d' % (1 + i % 28), 'reason': 'r',
+             'status': CorrectionStatus.pending if i % 4 == 0 else CorrectionStatus.approved}
+            for i in range(USERS) if i % GROUP_SIZE
+        ])
+        conn.execute(insert(JoinRequest), [
+            {'user_id': first_id + i, 'group_id': first_id + (i // GROUP_SIZE + 1) % n_groups,
+             'status': JoinStatus.pending if i % 3 == 0 else JoinStatus.rejected}
+            for i in range(USERS)
+        ])
+
+    admin = users[0]
+    member = users[1]
+    return {
+        'admin': admin['username'],
+        'member': member['username'],
+        'member_id': member['id'],
+        'group_id': first_id,
+        'tokens': {u['username']: create_access_token(u['username']) for u in (admin, member)},
+    }
+
+
+@pytest.fixture(scope='session')
+def seeded():
+    with TestClient(app) as client:
+        data = _seed()
+        data['client'] = client
+        yield data
+
+
+def _engines():
+    out = {app_db.engine, app_db.read_engine}
+    if app_db.async_read_engine is not None:
+        out.add(app_db.async_read_engine.sync_engine)
+    return out
+
+
+@contextmanager
+def capture_selects():
+    # 记录请求期间所有引擎（写/读/异步读）实际执行的 SELECT 语句与参数
+    seen: list[tuple[str, tuple]] = []
+
+    def _hook(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith('SELECT'):
+            seen.append((statement, tuple(parameters or ())))
+
+    engines = _engines()
+    for e in engines:
+        event.listen(e, 'before_cursor_execute', _hook)
+    try:
+        yield seen
+    finally:
+        for e in engines:
+            event.remove(e, 'before_cursor_execute', _hook)
+
+
+# 热点查询：(名称, 身份, 方法, 路径, 请求参数, 目标表, 可接受的索引)
+# 路径中的 {group_id}/{member_id} 与请求参数中的 {admin} 取自生成数据
+HOT_QUERIES = [
+    ('auth_lookup', 'member', 'GET', '/me', {}, 'users', {'ix_users_username'}),
+    ('punch_lookup', 'member', 'POST', '/attendance/punch',
+     {'json': {'group_id': '{group_id}', 'client_time': '2026-04-01T08:50:00', 'punch_type': 'checkin'}},
+     'attendance', {'ix_attendance_user_date'}),
+    ('attendance_month', 'member', 'GET', '/attendance/month', {'params': {'month': '2026-02'}},
+     'attendance', {'ix_attendance_user_date', 'ix_attendance_user_id'}),
+    ('admin_attendance_month', 'admin', 'GET', '/admin/users/{member_id}/attendance/month', {'params': {'month': '2026-02'}},
+     'attendance', {'ix_attendance_user_date', 'ix_attendance_user_id'}),
+    ('chat_history', 'member', 'GET', '/chat/history', {'params': {'peer': '{admin}'}},
+     'chat_messages', {'ix_chat_pair'}),
+    ('chat_unread_count', 'admin', 'GET', '/chat/unread_count', {},
+     'chat_messages', {'ix_chat_receiver_read'}),
+    ('announcement_feed', 'member', 'GET', '/announcements/feed', {},
+     'announcements', {'ix_announcements_scope', 'ix_announcements_group_id'}),
+    ('announcement_feed_since', 'member', 'GET', '/announcements/feed', {'params': {'since': '2026-01-01T00:00:00'}},
+     'announcements', {'ix_announcements_scope', 'ix_announcements_group_id', 'ix_announcements_created_at'}),
+    ('my_groups', 'member', 'GET', '/groups/my', {},
+     'memberships', {'sqlite_autoindex_memberships_1', 'ix_memberships_user_id'}),
+    ('group_members', 'member', 'GET', '/groups/{group_id}/members', {},
+     'memberships', {'ix_memberships_group_id'}),
+    ('corrections_pending', 'admin', 'GET', '/corrections/pending', {},
+     'correction_requests', {'ix_corrections_group_status', 'ix_correction_requests_status', 'ix_correction_requests_group_id'}),
+    ('join_requests_pending', 'admin', 'GET', '/groups/requests/pending', {},
+     'join_requests', {'ix_join_requests_group_status', 'ix_join_requests_status', 'ix_join_requests_group_id'}),
+    # 增量同步：按 seq（rowid）区间查找，不随日志长度增长
+    ('changes_sync', 'member', 'GET', '/changes', {'params': {'after': 0}},
+     'change_events', {'rowid'}),
+]
+
+HOT_QUERY_NAMES = [q[0] for q in HOT_QUERIES]
+
+
+def _fill(value, ctx: dict):
+    if isinstance(value, dict):
+        return {k: _fill(v, ctx) for k, v in value.items()}
+    if isinstance(value, str) and value.startswith('{') and value.endswith('}') and value[1:-1] in ctx:
+        return ctx[value[1:-1]]
+    if isinstance(value, str):
+        return value.format(**ctx)
+    return value
+
+
+@pytest.fixture(scope='session')
+def hot_statements(seeded):
+    # 每个热点接口请求一次，记录其实际执行的 SELECT；查询计划测试与基准测试共用
+    ctx = {'group_id': seeded['group_id'], 'member_id': seeded['member_id'], 'admin': seeded['admin']}
+    client = seeded['client']
+    out = {}
+    for name, who, method, path, kwargs, table, indexes in HOT_QUERIES:
+        headers = {'Authorization': 'Bearer ' + seeded['tokens'][seeded[who]]}
+        with capture_selects() as seen:
+            resp = client.request(method, _fill(path, ctx), headers=headers, **_fill(kwargs, ctx))
+        assert resp.status_code == 200, (name, resp.status_code, resp.text)
+        out[name] = {'table': table, 'indexes': indexes, 'statements': list(seen)}
+    return out
+
+
+def explain(statement: str, params: tuple) -> list[str]:
+    with app_db.read_engine.connect() as conn:
+        return [str(r[-1]) for r in conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, params).fetchall()]
+
+
+def touches(statement: str, table: str) -> bool:
+    s = ' '.join(statement.split())
+    return f' FROM {table} ' in s + ' ' or f' JOIN {table} ' in s
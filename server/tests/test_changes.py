@@ -0,0 +1,157 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert, update
+from sqlalchemy.orm import sessionmaker
+
+from app import changes
+from app.db import Base, make_engine
+from app.models import ChangeEvent, Group, Membership, Role, User
+
+ENGINEER, ADMIN_A, ADMIN_B, MEMBER_A, MEMBER_B = 999, 1000, 1001, 50000, 50001
+GROUP_A, GROUP_B = 1, 2
+
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    # 清理会推进 floor：在独立的临时库上执行，不影响查询计划测试用的 /changes 数据
+    eng = make_engine(f"sqlite:///{tmp_path / 'changes.sqlite'}")
+    Base.metadata.create_all(eng)
+    monkeypatch.setattr(changes, 'engine', eng)
+    monkeypatch.setattr(changes, 'read_engine', eng)
+    with eng.begin() as conn:
+        conn.execute(insert(User), [
+            {'id': ENGINEER, 'username': 'engineer', 'password_hash': 'x', 'role': Role.engineer},
+            {'id': ADMIN_A, 'username': 'admin_a', 'password_hash': 'x', 'role': Role.admin},
+            {'id': ADMIN_B, 'username': 'admin_b', 'password_hash': 'x', 'role': Role.admin},
+            {'id': MEMBER_A, 'username': 'member_a', 'password_hash': 'x', 'role': Role.user},
+            {'id': MEMBER_B, 'username': 'member_b', 'password_hash': 'x', 'role': Role.user},
+        ])
+        conn.execute(insert(Group), [
+            {'id': GROUP_A, 'name': 'a', 'group_code': 'CHG001', 'created_by_user_id': ADMIN_A},
+            {'id': GROUP_B, 'name': 'b', 'group_code': 'CHG002', 'created_by_user_id': ADMIN_B},
+        ])
+        conn.execute(insert(Membership), [
+            {'user_id': ADMIN_A, 'group_id': GROUP_A}, {'user_id': MEMBER_A, 'group_id': GROUP_A},
+            {'user_id': ADMIN_B, 'group_id': GROUP_B}, {'user_id': MEMBER_B, 'group_id': GROUP_B},
+        ])
+    yield sessionmaker(bind=eng)
+    eng.dispose()
+
+
+def _record(Session, *events: dict) -> None:
+    with Session() as db:
+        for e in events:
+            changes.record(db, **e)
+        db.commit()
+
+
+def _read(Session, user_id: int, after: int | None, limit: int = 200) -> dict:
+    with Session() as db:
+        return asyncio.run(changes.read(db, db.get(User, user_id), after, limit))
+
+
+def _seqs(page: dict) -> list[int]:
+    return [e['seq'] for e in page['events']]
+
+
+def test_visibility_by_role(journal):
+    _record(
+        journal,
+        dict(kind='config', scope=changes.SCOPE_ALL, name='version'),                        # 1
+        dict(kind='join_request', entity_id=1, scope=changes.SCOPE_MANAGERS, group_id=GROUP_A),  # 2
+        dict(kind='join_request', entity_id=2, scope=changes.SCOPE_MANAGERS, group_id=GROUP_B),  # 3
+        dict(kind='announcement', entity_id=1, scope=changes.SCOPE_GROUP, group_id=GROUP_A),     # 4
+        dict(kind='membership', scope=changes.SCOPE_USER, user_id=MEMBER_A, group_id=GROUP_A),   # 5
+        dict(kind='membership', scope=changes.SCOPE_USER, user_id=MEMBER_B, group_id=GROUP_B),   # 6
+    )
+    # 工程师看全部团队的待审核；管理员只看自己创建的团队；成员只看本团队与自己的事件
+    assert _seqs(_read(journal, ENGINEER, 0)) == [1, 2, 3]
+    assert _seqs(_read(journal, ADMIN_A, 0)) == [1, 2, 4]
+    assert _seqs(_read(journal, ADMIN_B, 0)) == [1, 3]
+    assert _seqs(_read(journal, MEMBER_A, 0)) == [1, 4, 5]
+    assert _seqs(_read(journal, MEMBER_B, 0)) == [1, 6]
+
+    first = _read(journal, MEMBER_A, 0)['events'][0]
+    assert first['kind'] == 'config' and first['data'] == {'name': 'version'}
+    # 无论可见多少，游标都推进到日志头
+    assert {_read(journal, uid, 0)['next'] for uid in (ENGINEER, ADMIN_A, ADMIN_B, MEMBER_A, MEMBER_B)} == {6}
+
+
+def test_paging_delivers_each_event_once(journal):
+    _record(journal, *(dict(kind='config', scope=changes.SCOPE_ALL, n=i) for i in range(7)))
+
+    seen, after, pages = [], 0, []
+    while True:
+        page = _read(journal, MEMBER_A, after, limit=3)
+        assert not page['reset']
+        seen += _seqs(page)
+        pages.append((_seqs(page), page['next'], page['more']))
+        after = page['next']
+        if not page['more']:
+            break
+    assert pages == [([1, 2, 3], 3, True), ([4, 5, 6], 6, True), ([7], 7, False)]
+    assert seen == list(range(1, 8))
+
+    # 追上之后再次拉取：没有新事件，游标不动
+    assert _read(journal, MEMBER_A, 7, limit=3) == {'events': [], 'next': 7, 'more': False, 'reset': False}
+    _record(journal, dict(kind='config', scope=changes.SCOPE_ALL))
+    assert _seqs(_read(journal, MEMBER_A, 7, limit=3)) == [8]
+
+
+def test_invisible_events_are_skipped_within_scan_window(journal, monkeypatch):
+    monkeypatch.setattr(changes, 'SCAN_WINDOW', 2)
+    _record(journal, *(dict(kind='membership', scope=changes.SCOPE_USER, user_id=MEMBER_B) for _ in range(5)))
+    _record(journal, dict(kind='config', scope=changes.SCOPE_ALL))  # 6
+
+    # 落后的客户端每次最多扫描 SCAN_WINDOW 个 seq；区间内不可见的事件直接越过
+    steps, after = [], 0
+    while True:
+        page = _read(journal, MEMBER_A, after)
+        steps.append((_seqs(page), page['next'], page['more']))
+        after = page['next']
+        if not page['more']:
+            break
+    assert steps == [([], 2, True), ([], 4, True), ([6], 6, False)]
+
+
+def test_reset_outside_retained_range(journal):
+    _record(journal, *(dict(kind='config', scope=changes.SCOPE_ALL, n=i) for i in range(5)))
+
+    # 没有游标 / 游标超过日志头（如从备份恢复）：全量刷新后从日志头继续
+    assert _read(journal, MEMBER_A, None) == {'events': [], 'next': 5, 'more': False, 'reset': True}
+    assert _read(journal, MEMBER_A, 9)['reset']
+
+    with journal.begin() as db:
+        db.execute(
+            update(ChangeEvent).where(ChangeEvent.seq <= 3).values(created_at=datetime.utcnow() - timedelta(days=changes.KEEP_DAYS + 1))
+        )
+    assert changes.prune() == 3
+
+    # 游标早于已清理位置：可能漏掉事件，必须 reset；正好停在清理位置的游标照常继续
+    assert _read(journal, MEMBER_A, 1) == {'events': [], 'next': 5, 'more': False, 'reset': True}
+    page = _read(journal, MEMBER_A, 3)
+    assert not page['reset'] and _seqs(page) == [4, 5]
+
+    # 日志被清理空：停在日志头的客户端不会反复 reset
+    assert changes.prune(now=datetime.utcnow() + timedelta(days=changes.KEEP_DAYS + 1)) == 2
+    assert _read(journal, MEMBER_A, 5) == {'events': [], 'next': 5, 'more': False, 'reset': False}
+    assert _read(journal, MEMBER_A, 4)['reset']
+
+
+def test_changes_endpoint(seeded):
+    client = seeded['client']
+    headers = {'Authorization': 'Bearer ' + seeded['tokens'][seeded['member']]}
+
+    first = client.get('/changes', headers=headers)
+    assert first.status_code == 200
+    body = first.json()
+    assert body['reset'] and body['events'] == []
+
+    again = client.get('/changes', headers=headers, params={'after': body['next']})
+    assert again.status_code == 200
+    assert again.json() == {'events': [], 'next': body['next'], 'more': False, 'reset': False}
+
+    assert client.get('/changes', headers=headers, params={'after': 0, 'limit': 0}).status_code == 422
+    assert client.get('/changes', params={'after': 0}).status_code == 401
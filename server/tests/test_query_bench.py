@@ -0,0 +1,106 @@
+"""
+热点查询微基准：在生成数据上重放各热点接口实际执行的 SELECT，与 query_baselines.json 中的基线比较。
+
+- vm_steps：SQLite 虚拟机执行的指令数（progress handler 计数），与机器快慢无关；
+  索引失效退化为扫描时会放大一到几个数量级，默认容差 2 倍（GLIMMER_BENCH_TOLERANCE）
+- ms：多次执行的中位耗时，只记录；基线来自单台机器，共享的 CI 机器上不可比，
+  仅在 GLIMMER_BENCH_TIME=1 时做宽松检查（GLIMMER_BENCH_TIME_TOLERANCE，默认 5 倍，另加 1ms 余量）
+
+修改查询或索引后重新生成基线（在 server/ 目录下）：
+    GLIMMER_UPDATE_BASELINES=1 python -m pytest tests/test_query_bench.py
+"""
+
+import json
+import os
+import sqlite3
+import statistics
+import time
+
+import pytest
+
+from app.db import DB_PATH
+from conftest import HOT_QUERY_NAMES, touches
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'query_baselines.json')
+UPDATE = (os.environ.get('GLIMMER_UPDATE_BASELINES') or '0').strip().lower() in ('1', 'true', 'yes', 'y', 'on')
+STEP_TOLERANCE = float(os.environ.get('GLIMMER_BENCH_TOLERANCE') or 2.0)
+CHECK_TIME = (os.environ.get('GLIMMER_BENCH_TIME') or '0').strip().lower() in ('1', 'true', 'yes', 'y', 'on')
+TIME_TOLERANCE = float(os.environ.get('GLIMMER_BENCH_TIME_TOLERANCE') or 5.0)
+REPEAT = int(os.environ.get('GLIMMER_BENCH_REPEAT') or 30)
+
+_results: dict[str, dict] = {}
+
+
+def _load_baselines() -> dict:
+    try:
+        with open(BASELINE_PATH, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'queries': {}}
+
+
+def _measure(conn: sqlite3.Connection, statement: str, params: tuple) -> tuple[int, float]:
+    steps = 0
+
+    def _count():
+        nonlocal steps
+        steps += 1
+        return 0
+
+    conn.set_progress_handler(_count, 1)
+    try:
+        conn.execute(statement, params).fetchall()
+    finally:
+        conn.set_progress_handler(None, 1)
+
+    times = []
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        conn.execute(statement, params).fetchall()
+        times.append((time.perf_counter() - t0) * 1000)
+    return steps, statistics.median(times)
+
+
+@pytest.fixture(scope='module')
+def raw_conn(seeded):
+    conn = sqlite3.connect(f'file:{DB_PATH}?mode=ro', uri=True)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture(scope='module', autouse=True)
+def _write_baselines():
+    yield
+    if UPDATE and _results:
+        data = {
+            'sqlite_version': sqlite3.sqlite_version,
+            'queries': dict(sorted({**_load_baselines().get('queries', {}), **_results}.items())),
+        }
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, sort_keys=False)
+            f.write('\n')
+
+
+@pytest.mark.parametrize('name', HOT_QUERY_NAMES)
+def test_hot_query_cost(hot_statements, raw_conn, name):
+    case = hot_statements[name]
+    steps, ms = 0, 0.0
+    for statement, params in case['statements']:
+        if touches(statement, case['table']):
+            s, t = _measure(raw_conn, statement, params)
+            steps += s
+            ms += t
+    _results[name] = {'vm_steps': steps, 'ms': round(ms, 3)}
+
+    if UPDATE:
+        return
+    base = _load_baselines().get('queries', {}).get(name)
+    if base is None:
+        pytest.fail(f'no baseline for {name}; run with GLIMMER_UPDATE_BASELINES=1')
+    assert steps <= base['vm_steps'] * STEP_TOLERANCE, (
+        f"{name}: {steps} VM steps vs baseline {base['vm_steps']} (tolerance x{STEP_TOLERANCE})"
+    )
+    if CHECK_TIME:
+        assert ms <= base['ms'] * TIME_TOLERANCE + 1.0, (
+            f"{name}: {ms:.3f}ms vs baseline {base['ms']}ms (tolerance x{TIME_TOLERANCE} + 1ms)"
+        )
@@ -0,0 +1,50 @@
+import re
+
+import pytest
+
+from conftest import HOT_QUERY_NAMES, explain, touches
+
+# 这些表随用户/天数增长：热点路径上不允许出现全表扫描（包括按索引顺序的全索引扫描）
+GROWING_TABLES = (
+    'attendance', 'chat_messages', 'announcements', 'memberships', 'users', 'correction_requests', 'join_requests', 'change_events',
+)
+
+_SCAN = re.compile(r'^SCAN (\w+)')
+_INDEX = re.compile(r'USING (?:COVERING )?INDEX (\w+)')
+# 按主键（rowid）区间/等值查找，期望集合中记为 'rowid'
+_ROWID = 'USING INTEGER PRIMARY KEY'
+
+
+@pytest.mark.parametrize('name', HOT_QUERY_NAMES)
+def test_no_full_scans(hot_statements, name):
+    case = hot_statements[name]
+    for statement, params in case['statements']:
+        for line in explain(statement, params):
+            m = _SCAN.match(line)
+            assert not (m and m.group(1) in GROWING_TABLES), f'{name}: full scan "{line}" in\n{statement}'
+
+
+@pytest.mark.parametrize('name', HOT_QUERY_NAMES)
+def test_expected_index(hot_statements, name):
+    case = hot_statements[name]
+    table, expected = case['table'], case['indexes']
+    targets = [(s, p) for s, p in case['statements'] if touches(s, table)]
+    assert targets, f'{name}: no statement on {table} was executed'
+    used = set()
+    for statement, params in targets:
+        for line in explain(statement, params):
+            if re.search(rf'\b{table}\b', line):
+                used.update(_INDEX.findall(line))
+                if _ROWID in line:
+                    used.add('rowid')
+    assert used & expected, f'{name}: {table} used {sorted(used) or "no index"}, expected one of {sorted(expected)}'
+
+
+def test_model_indexes_created_by_migrations(seeded):
+    # models.py 中声明的索引在迁移后的库里必须存在（旧库依赖 migrations.py 补建）
+    from app.db import Base, read_engine
+
+    with read_engine.connect() as conn:
+        present = {r[0] for r in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    declared = {i.name for t in Base.metadata.tables.values() for i in t.indexes}
+    assert declared <= present, sorted(declared - present)
@@ -0,0 +1,144 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from app import archive, wipe
+from app.db import Base, make_engine
+from app.models import (
+    Announcement, AnnouncementScope, Attendance, ChangeEvent, ChatMessage, Group, JoinRequest, JoinStatus, Membership, Role, User,
+)
+
+ENGINEER_ID = 999
+USER_IDS = list(range(50000, 50010))
+
+
+@pytest.fixture
+def wipe_db(tmp_path, monkeypatch):
+    # 清理会删除全部业务数据：在独立的临时库上执行，不影响其它测试共用的生成数据
+    eng = make_engine(f"sqlite:///{tmp_path / 'wipe.sqlite'}")
+    Base.metadata.create_all(eng)
+    monkeypatch.setattr(wipe, 'engine', eng)
+    monkeypatch.setattr(wipe, 'read_engine', eng)
+    monkeypatch.setattr(wipe, 'SessionLocal', sessionmaker(bind=eng))
+    monkeypatch.setattr(wipe, 'STATE_PATH', str(tmp_path / 'wipe_state.json'))
+    monkeypatch.setattr(wipe, 'BATCH', 3)
+    monkeypatch.setattr(wipe, 'PAUSE', 0.0)
+    monkeypatch.setattr(archive, 'ARCHIVE_DIR', str(tmp_path / 'archive'))
+    _populate(eng)
+    yield eng
+    if wipe._thread is not None:
+        wipe._thread.join(10)
+    eng.dispose()
+
+
+def _populate(eng) -> None:
+    t = datetime(2026, 3, 2, 8, 30)
+    with eng.begin() as conn:
+        conn.execute(insert(User), [
+            {'id': ENGINEER_ID, 'username': 'engineer', 'password_hash': 'x', 'role': Role.engineer},
+            {'id': 1000, 'username': 'admin', 'password_hash': 'x', 'role': Role.admin},
+        ] + [{'id': uid, 'username': f'u{uid}', 'password_hash': 'x', 'role': Role.user} for uid in USER_IDS])
+        conn.execute(insert(Group), [{'id': 1, 'name': 'g', 'group_code': 'WIPE01', 'created_by_user_id': 1000}])
+        conn.execute(insert(Membership), [{'user_id': uid, 'group_id': 1} for uid in [1000] + USER_IDS])
+        conn.execute(insert(Attendance), [
+            {'user_id': uid, 'group_id': 1, 'date': t.date().isoformat(), 'punch_type': 'checkin', 'punched_at': t, 'status': 'ok', 'notes': ''}
+            for uid in USER_IDS[:7]
+        ])
+        conn.execute(insert(ChatMessage), [
+            {'sender_id': USER_IDS[i], 'receiver_id': 1000, 'text': f'm{i}', 'created_at': t + timedelta(minutes=i)}
+            for i in range(10)
+        ])
+        conn.execute(insert(JoinRequest), [{'user_id': USER_IDS[0], 'group_id': 1, 'status': JoinStatus.pending}])
+        conn.execute(insert(Announcement), [
+            {'scope': AnnouncementScope.group, 'group_id': 1, 'title': 't', 'content': 'c', 'created_at': t, 'created_by_user_id': 1000},
+        ])
+        conn.execute(insert(ChangeEvent), [
+            {'kind': 'attendance', 'op': 'upsert', 'entity_id': i, 'scope': 'managers', 'group_id': 1, 'data': ''} for i in range(5)
+        ])
+
+
+def _count(eng, model, *where) -> int:
+    with eng.connect() as conn:
+        return int(conn.execute(select(func.count()).select_from(model).where(*where)).scalar_one())
+
+
+def _wait() -> dict:
+    wipe._thread.join(10)
+    assert not wipe.is_running()
+    return wipe.load_state()
+
+
+def _assert_wiped(eng) -> None:
+    for model in (ChatMessage, Attendance, JoinRequest, Membership, Announcement, Group):
+        assert _count(eng, model) == 0, model.__tablename__
+    # 工程师账号保留，其它账号全部删除
+    assert _count(eng, User, User.role != Role.engineer) == 0
+    assert _count(eng, User, User.id == ENGINEER_ID) == 1
+    # 变更日志只剩一条 reset 事件，通知客户端全量刷新
+    with eng.connect() as conn:
+        assert conn.execute(select(ChangeEvent.kind, ChangeEvent.scope)).all() == [('reset', 'all')]
+
+
+def test_wipe_deletes_in_bounded_batches(wipe_db, monkeypatch):
+    sizes: dict[str, list[int]] = {}
+    orig = wipe._delete_batch
+
+    def _recording(model, extra):
+        n = orig(model, extra)
+        sizes.setdefault(model.__tablename__, []).append(n)
+        return n
+
+    monkeypatch.setattr(wipe, '_delete_batch', _recording)
+    started, _ = wipe.start(ENGINEER_ID)
+    assert started
+    state = _wait()
+
+    assert state['status'] == 'done', state
+    assert max(n for batch in sizes.values() for n in batch) <= 3
+    assert sizes['chat_messages'] == [3, 3, 3, 1]
+    assert state['tables']['chat_messages'] == {'total': 10, 'deleted': 10, 'done': True}
+    assert state['tables']['users']['deleted'] == 11
+    _assert_wiped(wipe_db)
+
+
+def test_resume_continues_interrupted_job(wipe_db):
+    # 模拟进程在清理途中退出：状态文件停在 running，且没有线程在执行
+    state = wipe._new_state(ENGINEER_ID)
+    state['tables']['chat_messages'].update(deleted=3)
+    wipe._save_state(state)
+    assert wipe.status()['running']
+
+    assert wipe.resume()
+    state = _wait()
+
+    assert state['status'] == 'done', state
+    assert state['resumed'] == 1
+    assert state['id'] == wipe.load_state()['id']
+    _assert_wiped(wipe_db)
+
+
+def test_rows_written_during_wipe_are_swept(wipe_db, monkeypatch):
+    orig = wipe._delete_batch
+    late = {'written': False}
+
+    def _with_late_write(model, extra):
+        # 聊天记录已清理完之后又有新消息写入：应在扫尾轮中删除
+        if model is User and not late['written']:
+            late['written'] = True
+            with wipe_db.begin() as conn:
+                conn.execute(insert(ChatMessage), [{'sender_id': ENGINEER_ID, 'receiver_id': ENGINEER_ID, 'text': 'late'}])
+        return orig(model, extra)
+
+    monkeypatch.setattr(wipe, '_delete_batch', _with_late_write)
+    started, _ = wipe.start(ENGINEER_ID)
+    assert started
+    state = _wait()
+
+    assert late['written']
+    assert state['status'] == 'done', state
+    assert state['pass'] == 2
+    assert state['tables']['chat_messages']['deleted'] == 11
+    _assert_wiped(wipe_db)
+
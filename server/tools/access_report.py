@@ -0,0 +1,92 @@
+"""
+访问日志离线汇总：读取结构化访问日志（logs/access.jsonl 及滚动出的 .1 .. .N），只依赖标准库。
+
+按路由（或用户/IP/状态码）分组输出请求数、错误率、p50/p95/p99/最大耗时、平均 SQL 条数与响应字节数；
+--per-minute 输出每分钟请求数与 p95（看高峰曲线）。
+
+用法（在 server/ 目录下）：
+    python tools/access_report.py
+    python tools/access_report.py --by user --top 20
+    python tools/access_report.py --since 2026-03-02T08:50 --until 2026-03-02T09:10 --per-minute
+"""
+
+import argparse
+import os
+import sys
+from collections import defaultdict
+
+from trace_view import percentile, load
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PATH = os.path.join(os.environ.get('GLIMMER_LOG_DIR') or os.path.join(SERVER_DIR, 'logs'), 'access.jsonl')
+
+_KEYS = {
+    'route': lambda r: f"{r.get('method')} {r.get('route')}",
+    'user': lambda r: str(r.get('user_id')),
+    'ip': lambda r: str(r.get('ip') or ''),
+    'status': lambda r: str(r.get('status')),
+}
+
+
+def report(records: list[dict], by: str, top: int) -> None:
+    groups: dict[str, list[dict]] = defaultdict(list)
+    for r in records:
+        groups[_KEYS[by](r)].append(r)
+
+    head = f"{by:<44} {'n':>7} {'err%':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>9} {'sql':>6} {'KB':>8}"
+    print(head)
+    print('-' * len(head))
+    rows = sorted(groups.items(), key=lambda kv: -len(kv[1]))
+    for key, items in rows[:top] if top else rows:
+        ms = [r['ms'] for r in items]
+        err = sum(1 for r in items if int(r.get('status') or 0) >= 500) * 100.0 / len(items)
+        sql = sum(r.get('sql') or 0 for r in items) / len(items)
+        kb = sum(r.get('bytes') or 0 for r in items) / len(items) / 1024
+        print(
+            f'{key[:44]:<44} {len(items):>7} {err:>6.1f} {percentile(ms, 50):>8.1f} {percentile(ms, 95):>8.1f} '
+            f'{percentile(ms, 99):>8.1f} {max(ms):>9.1f} {sql:>6.1f} {kb:>8.1f}'
+        )
+    print(f'\n{len(records)} requests; latency in ms, sql = mean statements per request, KB = mean response size')
+
+
+def per_minute(records: list[dict]) -> None:
+    buckets: dict[str, list[dict]] = defaultdict(list)
+    for r in records:
+        buckets[str(r.get('ts', ''))[:16]].append(r)
+    print(f"{'minute':<17} {'n':>7} {'5xx':>5} {'p95':>8}")
+    for minute in sorted(buckets):
+        items = buckets[minute]
+        errors = sum(1 for r in items if int(r.get('status') or 0) >= 500)
+        print(f'{minute:<17} {len(items):>7} {errors:>5} {percentile([r["ms"] for r in items], 95):>8.1f}')
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('paths', nargs='*', default=[DEFAULT_PATH], help='access log JSONL files (rotated .N siblings are included)')
+    ap.add_argument('--by', choices=sorted(_KEYS), default='route')
+    ap.add_argument('--top', type=int, default=0, help='only the N largest groups')
+    ap.add_argument('--route', default='', help='only routes containing this text')
+    ap.add_argument('--since', default='', help='only requests at or after this ISO timestamp prefix')
+    ap.add_argument('--until', default='', help='only requests before this ISO timestamp prefix')
+    ap.add_argument('--per-minute', action='store_true', help='also print requests and p95 per minute')
+    args = ap.parse_args()
+
+    records = [
+        r for r in load(args.paths)
+        if args.route in str(r.get('route', ''))
+        and (not args.since or str(r.get('ts', '')) >= args.since)
+        and (not args.until or str(r.get('ts', '')) < args.until)
+    ]
+    if not records:
+        print('no access log records found', file=sys.stderr)
+        return 1
+
+    report(records, args.by, args.top)
+    if args.per_minute:
+        print()
+        per_minute(records)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""
+热点读接口基准：对比旧路径“select(实体).scalars() -> *Out -> FastAPI 校验 + JSONResponse”
+与新路径“lambda_stmt 缓存的列查询 -> responses.rows_response”，覆盖聊天记录、公告 feed、我的团队。
+
+在两个数据量下各测一次，按差值算出每行开销（µs/行）与固定开销（ms/次，语句构造/编译、会话、响应对象等），
+并校验两条路径输出的 JSON 等价。
+
+用法（在 server/ 目录下）：
+    python tools/bench_hot_reads.py --small 20 --large 200 --repeat 300
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+# 避免导入 app.db 时指向真实数据库
+os.environ.setdefault('GLIMMER_DB_PATH', os.path.join(tempfile.gettempdir(), 'glimmer_bench_unused.sqlite'))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import and_, create_engine, or_, select  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.db import Base  # noqa: E402
+from app.main import _announcement_feed_stmt, _chat_history_stmt, _my_groups_stmt  # noqa: E402
+from app.models import Announcement, AnnouncementScope, ChatMessage, Group, Membership, Role, User  # noqa: E402
+from app.responses import orjson, rows_response  # noqa: E402
+from app.schemas import AnnouncementOut, ChatMessageOut, GroupOut  # noqa: E402
+
+ME, PEER = 60001, 60002
+
+
+def _seed(session: Session, rows: int) -> None:
+    session.add_all([
+        User(id=ME, username='bench_me', password_hash='x', role=Role.user),
+        User(id=PEER, username='bench_peer', password_hash='x', role=Role.user),
+    ])
+    for i in range(rows):
+        gid = 70000 + i
+        session.add(Group(id=gid, name='团队%d' % i, group_code='%06d' % gid, created_by_user_id=PEER))
+        session.add(Membership(user_id=ME, group_id=gid))
+    session.flush()
+    base = datetime(2026, 1, 1, 8, 0, 0)
+    for i in range(rows):
+        t = base + timedelta(minutes=i)
+        mine = i % 2 == 0
+        session.add(ChatMessage(
+            sender_id=ME if mine else PEER,
+            receiver_id=PEER if mine else ME,
+            text='消息%d' % i,
+            created_at=t,
+            read_at=(t + timedelta(seconds=30) if i % 3 else None),
+        ))
+        session.add(Announcement(
+            scope=(AnnouncementScope.global_ if i % 4 == 0 else AnnouncementScope.group),
+            group_id=(None if i % 4 == 0 else 70000 + i),
+            title='公告%d' % i,
+            content='内容%d' % i,
+            created_at=t,
+            created_by_user_id=PEER,
+        ))
+    session.commit()
+
+
+def _legacy_response(adapter: TypeAdapter, out: list) -> bytes:
+    # 与 FastAPI serialize_response 一致：按 response_model 再校验一遍，再 dump 成 JSON 可序列化对象
+    value = adapter.validate_python(out, from_attributes=True)
+    return JSONResponse(adapter.dump_python(value, mode='json')).body
+
+
+def legacy_chat(session: Session, adapter: TypeAdapter, limit: int) -> bytes:
+    me = session.get(User, ME)
+    peer = session.get(User, PEER)
+    q = select(ChatMessage).where(
+        or_(
+            and_(ChatMessage.sender_id == ME, ChatMessage.receiver_id == PEER, ChatMessage.deleted_by_sender == False),
+            and_(ChatMessage.sender_id == PEER, ChatMessage.receiver_id == ME, ChatMessage.deleted_by_receiver == False),
+        )
+    )
+    rows = session.execute(q.order_by(ChatMessage.created_at.asc()).limit(limit)).scalars().all()
+    out = [
+        ChatMessageOut(
+            id=m.id,
+            from_username=(peer.username if int(m.sender_id) == PEER else me.username),
+            to_username=(peer.username if int(m.receiver_id) == PEER else me.username),
+            text=m.text,
+            created_at=m.created_at,
+            read_at=m.read_at,
+        )
+        for m in rows
+    ]
+    body = _legacy_response(adapter, out)
+    session.expunge_all()
+    return body
+
+
+def fast_chat(session: Session, limit: int) -> bytes:
+    return rows_response(session.execute(_chat_history_stmt(ME, 'bench_me', PEER, 'bench_peer', limit))).body
+
+
+def legacy_feed(session: Session, adapter: TypeAdapter, group_ids: list[int]) -> bytes:
+    q = select(Announcement).where(
+        or_(
+            Announcement.scope == AnnouncementScope.global_,
+            and_(Announcement.scope == AnnouncementScope.group, Announcement.group_id.in_(group_ids)),
+        )
+    )
+    rows = session.execute(q.order_by(Announcement.created_at.asc()).limit(200)).scalars().all()
+    out = [
+        AnnouncementOut(id=a.id, scope=a.scope.value, group_id=a.group_id, title=a.title, content=a.content, created_at=a.created_at)
+        for a in rows
+    ]
+    body = _legacy_response(adapter, out)
+    session.expunge_all()
+    return body
+
+
+def fast_feed(session: Session, group_ids: list[int]) -> bytes:
+    return rows_response(session.execute(_announcement_feed_stmt(group_ids, None))).body
+
+
+def legacy_groups(session: Session, adapter: TypeAdapter) -> bytes:
+    rows = session.execute(
+        select(Group).join(Membership, Membership.group_id == Group.id).where(Membership.user_id == ME).order_by(Group.id.desc())
+    ).scalars().all()
+    body = _legacy_response(adapter, [GroupOut(id=g.id, name=g.name, group_code=g.group_code) for g in rows])
+    session.expunge_all()
+    return body
+
+
+def fast_groups(session: Session) -> bytes:
+    return rows_response(session.execute(_my_groups_stmt(ME))).body
+
+
+def _timeit(fn, repeat: int) -> float:
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat
+
+
+def _measure(rows: int, repeat: int) -> dict[str, tuple[int, float, float]]:
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    chat_adapter = TypeAdapter(list[ChatMessageOut])
+    feed_adapter = TypeAdapter(list[AnnouncementOut])
+    group_adapter = TypeAdapter(list[GroupOut])
+
+    out: dict[str, tuple[int, float, float]] = {}
+    with Session(engine) as session:
+        _seed(session, rows)
+        session.expunge_all()
+        group_ids = list(session.execute(select(Membership.group_id).where(Membership.user_id == ME)).scalars())
+        limit = min(rows, 200)
+        cases = {
+            'chat_history': (lambda: legacy_chat(session, chat_adapter, limit), lambda: fast_chat(session, limit)),
+            'announcements_feed': (lambda: legacy_feed(session, feed_adapter, group_ids), lambda: fast_feed(session, group_ids)),
+            'groups_my': (lambda: legacy_groups(session, group_adapter), lambda: fast_groups(session)),
+        }
+        for name, (legacy, fast) in cases.items():
+            a, b = json.loads(legacy()), json.loads(fast())
+            if a != b:
+                raise SystemExit(f'输出不一致：{name} 新旧路径的 JSON 不等价')
+            out[name] = (len(b), _timeit(legacy, repeat), _timeit(fast, repeat))
+    engine.dispose()
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--small', type=int, default=20)
+    ap.add_argument('--large', type=int, default=200)
+    ap.add_argument('--repeat', type=int, default=300)
+    args = ap.parse_args()
+
+    small = _measure(args.small, args.repeat)
+    large = _measure(args.large, args.repeat)
+
+    print(f"encoder={'orjson' if orjson is not None else 'json'} equivalent=yes")
+    print(f"{'endpoint':<20} {'path':<7} {'ms@small':>9} {'ms@large':>9} {'us/row':>8} {'fixed ms':>9}")
+    for name in small:
+        n1, l1, f1 = small[name]
+        n2, l2, f2 = large[name]
+        for path, t1, t2 in (('legacy', l1, l2), ('fast', f1, f2)):
+            per_row = (t2 - t1) / max(1, n2 - n1)
+            fixed = t1 - per_row * n1
+            print(f'{name:<20} {path:<7} {t1 * 1000:>9.3f} {t2 * 1000:>9.3f} {per_row * 1e6:>8.2f} {fixed * 1000:>9.3f}')
+        print(f"{'':<20} rows {n1} -> {n2}; speedup {l1 / f1:.2f}x / {l2 / f2:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
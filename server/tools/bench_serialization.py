@@ -0,0 +1,139 @@
+"""
+列表接口序列化基准：对比“ORM 实体 -> PunchOut -> FastAPI 校验 + JSONResponse”旧路径
+与 “Core 行 -> responses.rows_response” 快速路径，并校验两者输出的 JSON 等价。
+
+用法（在 server/ 目录下）：
+    python tools/bench_serialization.py --rows 400 --repeat 200
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+# 避免导入 app.db 时指向真实数据库
+os.environ.setdefault('GLIMMER_DB_PATH', os.path.join(tempfile.gettempdir(), 'glimmer_bench_unused.sqlite'))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import and_, create_engine, select  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.db import Base  # noqa: E402
+from app.main import _PUNCH_OUT_COLUMNS  # noqa: E402
+from app.models import Attendance, Role, User  # noqa: E402
+from app.responses import FastJSONResponse, orjson, result_rows  # noqa: E402
+from app.schemas import PunchOut  # noqa: E402
+
+
+def _seed(session: Session, rows: int) -> int:
+    u = User(id=50000, username='bench', password_hash='x', role=Role.user)
+    session.add(u)
+    base = datetime(2026, 1, 1, 8, 30, 0)
+    for i in range(rows):
+        t = base + timedelta(hours=12 * i, microseconds=i)
+        session.add(Attendance(
+            user_id=u.id,
+            group_id=(i % 3) or None,
+            punched_at=t,
+            date='2026-01-%02d' % (1 + (i % 28)),
+            punch_type=('checkin' if i % 2 == 0 else 'checkout'),
+            status='打卡成功',
+            lat=(31.2 + i / 1000.0 if i % 4 else None),
+            lon=(121.4 + i / 1000.0 if i % 4 else None),
+            notes='备注%d' % i,
+        ))
+    session.commit()
+    return u.id
+
+
+def _month_where(uid: int):
+    return and_(Attendance.user_id == uid, Attendance.date.like('2026-01-%'))
+
+
+def legacy_path(session: Session, uid: int, adapter: TypeAdapter) -> bytes:
+    rows = session.execute(
+        select(Attendance).where(_month_where(uid)).order_by(Attendance.punched_at.desc()).limit(400)
+    ).scalars().all()
+    out = [
+        PunchOut(
+            id=r.id,
+            date=r.date,
+            punched_at=r.punched_at,
+            punch_type=str(getattr(r, 'punch_type', '') or ''),
+            status=r.status,
+            group_id=r.group_id,
+            lat=r.lat,
+            lon=r.lon,
+            notes=r.notes,
+        )
+        for r in rows
+    ]
+    # 与 FastAPI serialize_response 一致：按 response_model 再校验一遍，再 dump 成 JSON 可序列化对象
+    value = adapter.validate_python(out, from_attributes=True)
+    content = adapter.dump_python(value, mode='json')
+    session.expunge_all()
+    return JSONResponse(content).body
+
+
+def fast_path(session: Session, uid: int) -> bytes:
+    result = session.execute(
+        select(*_PUNCH_OUT_COLUMNS).where(_month_where(uid)).order_by(Attendance.punched_at.desc()).limit(400)
+    )
+    return FastJSONResponse(result_rows(result)).body
+
+
+def _timeit(fn, repeat: int) -> float:
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--rows', type=int, default=400)
+    ap.add_argument('--repeat', type=int, default=200)
+    args = ap.parse_args()
+
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    adapter = TypeAdapter(list[PunchOut])
+
+    with Session(engine) as session:
+        uid = _seed(session, args.rows)
+        session.expunge_all()
+
+        a = legacy_path(session, uid, adapter)
+        b = fast_path(session, uid)
+        if json.loads(a) != json.loads(b):
+            raise SystemExit('输出不一致：快速路径与旧路径的 JSON 不等价')
+
+        legacy = _timeit(lambda: legacy_path(session, uid, adapter), args.repeat)
+        fast = _timeit(lambda: fast_path(session, uid), args.repeat)
+
+        # 纯查询耗时（只取 Core 行，不序列化），用于说明剩余时间主要花在 SQLite 上
+        query_only = _timeit(
+            lambda: session.execute(
+                select(*_PUNCH_OUT_COLUMNS).where(_month_where(uid)).order_by(Attendance.punched_at.desc()).limit(400)
+            ).all(),
+            args.repeat,
+        )
+
+    n = len(json.loads(b))
+    print(f"rows={n} encoder={'orjson' if orjson is not None else 'json'} bytes={len(b)} equivalent=yes")
+    print(f"legacy (ORM + Pydantic + JSONResponse): {legacy * 1000:8.3f} ms/req")
+    print(f"fast   (Core rows + FastJSONResponse) : {fast * 1000:8.3f} ms/req")
+    print(f"query only (Core rows, no encoding)   : {query_only * 1000:8.3f} ms/req")
+    print(f"speedup: {legacy / fast:.2f}x; serialization share of fast path: {max(0.0, 1 - query_only / fast) * 100:.1f}%")
+
+
+if __name__ == '__main__':
+    main()
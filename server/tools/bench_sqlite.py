@@ -0,0 +1,157 @@
+"""
+SQLite 存储参数基准：模拟上班高峰的读写混合负载（多个线程持续打卡写入，同时多个线程查询月度考勤），
+对比 legacy（回滚日志、无 PRAGMA）与 default / durable 配置下的吞吐、读延迟与 "database is locked" 次数。
+
+用法（在 server/ 目录下）：
+    python tools/bench_sqlite.py --seconds 5 --writers 4 --readers 8
+    python tools/bench_sqlite.py --profiles legacy,default
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+# 避免导入 app.db 时指向真实数据库
+os.environ.setdefault('GLIMMER_DB_PATH', os.path.join(tempfile.gettempdir(), 'glimmer_bench_unused.sqlite'))
+
+from sqlalchemy import and_, insert, select  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+from app.db import Base, make_engine  # noqa: E402
+from app.models import Attendance, Role, User  # noqa: E402
+
+
+USERS = 200
+
+
+def _seed(engine, rows: int) -> None:
+    Base.metadata.create_all(engine)
+    base = datetime(2026, 1, 1, 8, 30, 0)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {'id': i + 1, 'username': f'bench{i}', 'password_hash': 'x', 'role': Role.user}
+            for i in range(USERS)
+        ])
+        conn.execute(insert(Attendance), [
+            {
+                'user_id': 1 + (i % USERS),
+                'punched_at': base + timedelta(minutes=i),
+                'date': '2026-01-%02d' % (1 + (i % 28)),
+                'punch_type': 'checkin' if i % 2 == 0 else 'checkout',
+                'status': '打卡成功',
+                'notes': '',
+            }
+            for i in range(rows)
+        ])
+
+
+def _run(profile: str, args) -> dict:
+    fd, path = tempfile.mkstemp(prefix=f'glimmer_bench_{profile}_', suffix='.sqlite')
+    os.close(fd)
+    engine = make_engine(f'sqlite:///{path}', profile=profile)
+    try:
+        _seed(engine, args.rows)
+
+        stop = threading.Event()
+        lock = threading.Lock()
+        stats = {'writes': 0, 'reads': 0, 'locked': 0, 'read_ms': []}
+
+        def writer(n: int):
+            i = 0
+            while not stop.is_set():
+                i += 1
+                try:
+                    with engine.begin() as conn:
+                        conn.execute(insert(Attendance).values(
+                            user_id=1 + ((n * 7919 + i) % USERS),
+                            punched_at=datetime(2026, 1, 15, 9, 0, 0) + timedelta(microseconds=n * 1000000 + i),
+                            date='2026-01-15',
+                            punch_type='checkin',
+                            status='打卡成功',
+                            notes='',
+                        ))
+                    with lock:
+                        stats['writes'] += 1
+                except OperationalError:
+                    with lock:
+                        stats['locked'] += 1
+
+        def reader(n: int):
+            i = 0
+            while not stop.is_set():
+                i += 1
+                uid = 1 + ((n * 104729 + i) % USERS)
+                t0 = time.perf_counter()
+                try:
+                    with engine.connect() as conn:
+                        conn.execute(
+                            select(Attendance.id, Attendance.date, Attendance.punched_at, Attendance.status)
+                            .where(and_(Attendance.user_id == uid, Attendance.date.like('2026-01-%')))
+                            .order_by(Attendance.punched_at.desc())
+                            .limit(400)
+                        ).all()
+                    ms = (time.perf_counter() - t0) * 1000
+                    with lock:
+                        stats['reads'] += 1
+                        stats['read_ms'].append(ms)
+                except OperationalError:
+                    with lock:
+                        stats['locked'] += 1
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(args.writers)]
+        threads += [threading.Thread(target=reader, args=(n,)) for n in range(args.readers)]
+        for t in threads:
+            t.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+
+        lat = sorted(stats['read_ms']) or [0.0]
+        return {
+            'profile': profile,
+            'writes_s': stats['writes'] / args.seconds,
+            'reads_s': stats['reads'] / args.seconds,
+            'read_p50': statistics.median(lat),
+            'read_p95': lat[min(len(lat) - 1, int(len(lat) * 0.95))],
+            'read_max': lat[-1],
+            'locked': stats['locked'],
+        }
+    finally:
+        engine.dispose()
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            try:
+                os.remove(path + suffix)
+            except Exception:
+                pass
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--profiles', default='legacy,default,durable')
+    ap.add_argument('--seconds', type=float, default=5.0)
+    ap.add_argument('--writers', type=int, default=4)
+    ap.add_argument('--readers', type=int, default=8)
+    ap.add_argument('--rows', type=int, default=20000)
+    args = ap.parse_args()
+
+    print(f'writers={args.writers} readers={args.readers} seconds={args.seconds} seed_rows={args.rows}')
+    print(f"{'profile':<10}{'writes/s':>10}{'reads/s':>10}{'read p50':>11}{'read p95':>11}{'read max':>11}{'locked':>8}")
+    for profile in [p.strip() for p in args.profiles.split(',') if p.strip()]:
+        r = _run(profile, args)
+        print(
+            f"{r['profile']:<10}{r['writes_s']:>10.0f}{r['reads_s']:>10.0f}"
+            f"{r['read_p50']:>9.2f}ms{r['read_p95']:>9.2f}ms{r['read_max']:>9.2f}ms{r['locked']:>8}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,426 @@
+"""
+整机压测：按移动端的真实轮询组合回放一支“车队”客户端，压一个本地 uvicorn 实例。
+
+1. 在临时目录生成合成数据（用户/团队/成员关系/若干个月考勤/聊天记录）写入独立的 SQLite 文件
+2. 以子进程启动 uvicorn（指向该文件；归档/备份/维护任务关闭，限流默认关闭：所有客户端来自同一 IP）
+3. 每个客户端一个线程，使用 mobile/glimmer_api.py 的 GlimmerAPI，按 main_screen.py 各轮询任务的
+   基准间隔（poll_delay 缩放，遵循服务端 /health 下发的建议）发请求：
+     公共配置 10s：health + 最新全局公告 + 版本 + 广告
+     公告 feed 8s；网络监测 12s：health；聊天提醒 10s：health + 未读数
+     管理员提醒 12s（仅 admin）：health + 待审补录；考勤同步 20s：health + 上传本地未同步打卡
+4. 稳态阶段之后进入 08:55–09:05 打卡高峰（压缩到 --spike 秒）：每个客户端在窗口内本地打卡一次
+  （09:00 附近最密集），由下一次考勤同步上传，随后刷新当月考勤
+5. 按阶段输出各接口 p50/p95/p99/最大延迟、错误率与状态码分布
+
+用法（在 server/ 目录下）：
+    python tools/loadtest.py --clients 200 --steady 60 --spike 30
+    python tools/loadtest.py --clients 500 --speed 4 --workers 2
+    python tools/loadtest.py --keep --db /tmp/glimmer_load.sqlite   # 保留数据文件，下次直接复用
+"""
+
+import argparse
+import os
+import random
+import secrets
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from urllib.parse import urlsplit
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MOBILE_DIR = os.path.join(os.path.dirname(SERVER_DIR), 'mobile')
+sys.path.insert(0, SERVER_DIR)
+sys.path.insert(0, MOBILE_DIR)
+
+WORK_DIR = tempfile.mkdtemp(prefix='glimmer_load_')
+JWT_SECRET = secrets.token_hex(16)
+
+# 导入 app.* 之前固定到临时目录：生成数据与签发令牌都要与子进程一致
+os.environ['GLIMMER_DB_PATH'] = os.path.join(WORK_DIR, 'unused.sqlite')
+os.environ['GLIMMER_LOG_DIR'] = os.path.join(WORK_DIR, 'logs')
+os.environ['GLIMMER_JWT_SECRET'] = JWT_SECRET
+
+import requests  # noqa: E402
+from sqlalchemy import insert, select  # noqa: E402
+
+import glimmer_api  # noqa: E402
+from app.db import Base, make_engine  # noqa: E402
+from app.models import Announcement, AnnouncementScope, Attendance, ChatMessage, Group, Membership, Role, User  # noqa: E402
+from app.security import create_access_token, hash_password  # noqa: E402
+from glimmer_api import GlimmerAPI, GlimmerAPIError, poll_delay  # noqa: E402
+
+
+# ---------------------------------------------------------------- 合成数据
+
+# 压测账号按普通用户的 id 段（app.main._USER_ID_START）分配：不占用工程师固定 id 999 与管理员段，
+# 服务启动时引导账号不会冲突
+_USER_ID_START = 50000
+
+
+def _uid(i: int) -> int:
+    return _USER_ID_START + i
+
+
+def _seed(path: str, args) -> list[dict]:
+    engine = make_engine(f'sqlite:///{path}')
+    Base.metadata.create_all(engine)
+    rnd = random.Random(args.seed)
+    pw = hash_password('load-test')  # 只算一次：bcrypt 很慢，且压测不走登录
+    n_users = args.clients
+    group_size = max(2, args.group_size)
+    n_groups = max(1, (n_users + group_size - 1) // group_size)
+
+    users = []
+    for i in range(n_users):
+        # 每个团队的第一个成员为管理员
+        role = Role.admin if i % group_size == 0 else Role.user
+        users.append({'id': _uid(i), 'username': f'load{i:05d}', 'password_hash': pw, 'role': role, 'real_name': f'压测{i}'})
+
+    today = date.today()
+    first_day = (today.replace(day=1) - timedelta(days=31 * (args.months - 1))).replace(day=1)
+    with engine.begin() as conn:
+        conn.execute(insert(User), users)
+        conn.execute(insert(Group), [
+            {'id': g + 1, 'name': f'压测团队{g}', 'group_code': f'LT{g:06d}', 'created_by_user_id': _uid(g * group_size)}
+            for g in range(n_groups)
+        ])
+        conn.execute(insert(Membership), [
+            {'user_id': u['id'], 'group_id': 1 + i // group_size, 'is_group_admin': i % group_size == 0}
+            for i, u in enumerate(users)
+        ])
+
+        # 每个工作日上/下班各一次
+        batch = []
+        d = first_day
+        while d < today:
+            if d.weekday() < 5:
+                ds = d.isoformat()
+                for i, u in enumerate(users):
+                    gid = 1 + i // group_size
+                    t_in = datetime(d.year, d.month, d.day, 8, 30) + timedelta(seconds=rnd.randint(0, 1800))
+                    t_out = datetime(d.year, d.month, d.day, 18, 0) + timedelta(seconds=rnd.randint(0, 3600))
+                    batch.append({'user_id': u['id'], 'group_id': gid, 'punched_at': t_in, 'date': ds, 'punch_type': 'checkin', 'status': '打卡成功', 'notes': ''})
+                    batch.append({'user_id': u['id'], 'group_id': gid, 'punched_at': t_out, 'date': ds, 'punch_type': 'checkout', 'status': '打卡成功', 'notes': ''})
+                if len(batch) >= 20000:
+                    conn.execute(insert(Attendance), batch)
+                    batch = []
+            d += timedelta(days=1)
+        if batch:
+            conn.execute(insert(Attendance), batch)
+
+        # 团队内聊天：部分消息未读
+        now = datetime.utcnow()
+        chats = []
+        for i in range(args.chats):
+            a = rnd.randrange(n_users)
+            g = a // group_size
+            b = min(n_users - 1, g * group_size + rnd.randrange(group_size))
+            if a == b:
+                continue
+            sent = now - timedelta(minutes=rnd.randint(1, 60 * 24 * 14))
+            chats.append({
+                'sender_id': _uid(a), 'receiver_id': _uid(b), 'text': f'消息 {i}', 'created_at': sent,
+                'read_at': None if rnd.random() < 0.1 else sent + timedelta(minutes=5),
+            })
+        if chats:
+            conn.execute(insert(ChatMessage), chats)
+
+        conn.execute(insert(Announcement), [
+            {'scope': AnnouncementScope.global_, 'group_id': None, 'title': '全局公告', 'content': '压测公告', 'created_at': now - timedelta(days=1), 'created_by_user_id': _uid(0)},
+        ] + [
+            {'scope': AnnouncementScope.group, 'group_id': g + 1, 'title': '团队公告', 'content': '压测公告', 'created_at': now - timedelta(hours=g % 48), 'created_by_user_id': _uid(g * group_size)}
+            for g in range(n_groups)
+        ])
+    engine.dispose()
+    return users
+
+
+# ---------------------------------------------------------------- 计时
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.phase = 'steady'
+        # (phase, route) -> {'ms': [...], 'status': {code: n}}
+        self.data = defaultdict(lambda: {'ms': [], 'status': defaultdict(int)})
+
+    def add(self, route: str, ms: float, status):
+        with self.lock:
+            d = self.data[(self.phase, route)]
+            d['ms'].append(ms)
+            d['status'][status] += 1
+
+
+REC = Recorder()
+
+
+class _TimedRequests:
+    # 替换 glimmer_api 模块里的 requests：客户端调用路径保持原样，按 “方法 路径” 记录每次 HTTP 请求
+    def __getattr__(self, name):
+        return getattr(requests, name)
+
+    def _call(self, method: str, url: str, **kw):
+        route = f'{method.upper()} {urlsplit(url).path}'
+        t0 = time.perf_counter()
+        try:
+            resp = requests.request(method, url, **kw)
+        except Exception as e:
+            REC.add(route, (time.perf_counter() - t0) * 1000, type(e).__name__)
+            raise
+        REC.add(route, (time.perf_counter() - t0) * 1000, resp.status_code)
+        return resp
+
+    def get(self, url, **kw):
+        return self._call('get', url, **kw)
+
+    def post(self, url, **kw):
+        return self._call('post', url, **kw)
+
+
+glimmer_api.requests = _TimedRequests()
+
+
+# ---------------------------------------------------------------- 客户端
+
+class Client:
+    def __init__(self, base_url: str, user: dict, speed: float, stop: threading.Event, spike_at: float | None):
+        self.api = GlimmerAPI(base_url)
+        self.user = user
+        self.token = create_access_token(user['username'])
+        self.is_admin = user['role'] == Role.admin
+        self.speed = speed
+        self.stop = stop
+        self.spike_at = spike_at
+        self.feed_since: str | None = None
+        self.unsynced: list[dict] = []
+        self.month = date.today().strftime('%Y-%m')
+
+    def _safe(self, fn, *a, **kw):
+        try:
+            return fn(*a, **kw)
+        except (GlimmerAPIError, requests.RequestException):
+            return None
+
+    # 与 main_screen.py 中各轮询任务一一对应
+    def public_config(self):
+        if not self.api.health():
+            return
+        self._safe(self.api.public_latest_global_announcement)
+        self._safe(self.api.public_version)
+        self._safe(self.api.get_ads)
+
+    def feed(self):
+        items = self._safe(self.api.announcements_feed, self.token, since_iso=self.feed_since) or []
+        for it in items:
+            ts = str(it.get('created_at') or '')
+            if ts and (self.feed_since is None or ts > self.feed_since):
+                self.feed_since = ts
+
+    def net_monitor(self):
+        self.api.health()
+
+    def chat_notice(self):
+        if self.api.health():
+            self._safe(self.api.chat_unread_count, self.token)
+
+    def admin_notice(self):
+        if self.api.health():
+            self._safe(self.api.pending_corrections, self.token)
+
+    def attendance_sync(self):
+        if self.spike_at is not None and time.monotonic() >= self.spike_at:
+            # 本地打卡已发生（时间按压缩前的位置换算到 08:55–09:05）：与客户端一样由下一次同步上传
+            self.spike_at = None
+            self.unsynced.append({'client_time': self._spike_clock(), 'cid': secrets.token_hex(6)})
+        if not self.unsynced or not self.api.health():
+            return
+        for rec in list(self.unsynced):
+            ok = self._safe(
+                self.api.punch_attendance, self.token, status='打卡成功', lat=31.23, lon=121.47,
+                notes=f"[cid:{rec['cid']}]", group_id=None, client_time=rec['client_time'], punch_type='checkin',
+            )
+            if ok is not None:
+                self.unsynced.remove(rec)
+        # 同步成功后首页刷新当月记录
+        self._safe(self.api.attendance_month, self.token, self.month)
+
+    def _spike_clock(self) -> str:
+        frac = min(1.0, max(0.0, (time.monotonic() - SPIKE['start']) / max(1e-6, SPIKE['seconds'])))
+        t = datetime.combine(date.today(), datetime.min.time()) + timedelta(hours=8, minutes=55) + timedelta(seconds=600 * frac)
+        return t.strftime('%Y-%m-%d %H:%M:%S')
+
+    def run(self):
+        pollers = [
+            (10, self.public_config), (8, self.feed), (20, self.attendance_sync),
+            (12, self.net_monitor), (10, self.chat_notice),
+        ]
+        if self.is_admin:
+            pollers.append((12, self.admin_notice))
+
+        # 客户端陆续上线；进入主界面拉一次团队/当月考勤，各轮询任务错开启动
+        if self.stop.wait(random.uniform(0, 10) / self.speed):
+            return
+        self._safe(self.api.my_groups, self.token)
+        self._safe(self.api.attendance_month, self.token, self.month)
+        now = time.monotonic()
+        due = [now + random.uniform(0, base) / self.speed for base, _ in pollers]
+        while not self.stop.is_set():
+            i = min(range(len(due)), key=due.__getitem__)
+            wait = due[i] - time.monotonic()
+            if wait > 0 and self.stop.wait(wait):
+                break
+            base, fn = pollers[i]
+            try:
+                fn()
+            except Exception:
+                pass
+            due[i] = time.monotonic() + poll_delay(base) / self.speed
+
+
+SPIKE = {'start': 0.0, 'seconds': 1.0}
+
+
+# ---------------------------------------------------------------- 服务端
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _start_server(db_path: str, args) -> tuple[subprocess.Popen, str]:
+    port = _free_port()
+    env = dict(os.environ)
+    env.update({
+        'GLIMMER_DB_PATH': db_path,
+        'GLIMMER_LOG_DIR': os.path.join(WORK_DIR, 'logs'),
+        'GLIMMER_ARCHIVE_DIR': os.path.join(WORK_DIR, 'archive'),
+        'GLIMMER_BACKUP_DIR': os.path.join(WORK_DIR, 'backups'),
+        'GLIMMER_JWT_SECRET': JWT_SECRET,
+        'GLIMMER_ARCHIVE_INTERVAL': '0',
+        'GLIMMER_BACKUP_INTERVAL': '0',
+        'GLIMMER_MAINT_CHECK_INTERVAL': '0',
+    })
+    if not args.ratelimit:
+        env['GLIMMER_RATELIMIT'] = '0'
+    cmd = [sys.executable, '-m', 'uvicorn', 'app.main:app', '--host', '127.0.0.1', '--port', str(port),
+           '--workers', str(args.workers), '--log-level', 'warning', '--no-access-log']
+    proc = subprocess.Popen(cmd, cwd=SERVER_DIR, env=env)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f'uvicorn exited with code {proc.returncode}')
+        try:
+            if requests.get(base_url + '/health', timeout=1).status_code == 200:
+                return proc, base_url
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise SystemExit('uvicorn did not become healthy within 60s')
+
+
+# ---------------------------------------------------------------- 报告
+
+def _pct(values: list[float], p: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def _report(phase: str, seconds: float) -> None:
+    rows = sorted((route, d) for (ph, route), d in REC.data.items() if ph == phase)
+    if not rows:
+        return
+    total = sum(len(d['ms']) for _, d in rows)
+    print(f'\n[{phase}] {seconds:.0f}s, {total} requests, {total / max(seconds, 1e-6):.1f} req/s')
+    print(f"{'route':<38}{'count':>7}{'err%':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  status")
+    for route, d in rows:
+        lat = sorted(d['ms'])
+        errors = sum(n for code, n in d['status'].items() if not (isinstance(code, int) and code < 400))
+        codes = ' '.join(f'{code}:{n}' for code, n in sorted(d['status'].items(), key=lambda kv: str(kv[0])))
+        print(
+            f"{route:<38}{len(lat):>7}{errors * 100.0 / len(lat):>6.1f}%"
+            f"{_pct(lat, 0.5):>7.1f}ms{_pct(lat, 0.95):>7.1f}ms{_pct(lat, 0.99):>7.1f}ms{lat[-1]:>7.1f}ms  {codes}"
+        )
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--clients', type=int, default=100)
+    ap.add_argument('--group-size', type=int, default=25)
+    ap.add_argument('--months', type=int, default=3, help='seeded months of attendance history')
+    ap.add_argument('--chats', type=int, default=20000)
+    ap.add_argument('--steady', type=float, default=60.0, help='seconds of normal polling before the spike')
+    ap.add_argument('--spike', type=float, default=30.0, help='seconds the 08:55-09:05 window is compressed into')
+    ap.add_argument('--cooldown', type=float, default=20.0, help='seconds after the window (late syncs)')
+    ap.add_argument('--speed', type=float, default=1.0, help='divide client poll intervals by this factor')
+    ap.add_argument('--workers', type=int, default=1)
+    ap.add_argument('--ratelimit', action='store_true', help='keep rate limiting on (all clients share one IP)')
+    ap.add_argument('--db', default='', help='reuse/keep this SQLite file instead of a scratch one')
+    ap.add_argument('--keep', action='store_true', help='keep the scratch directory')
+    ap.add_argument('--seed', type=int, default=1)
+    args = ap.parse_args()
+    random.seed(args.seed)
+
+    db_path = args.db or os.path.join(WORK_DIR, 'load.sqlite')
+    proc = None
+    try:
+        t0 = time.perf_counter()
+        if os.path.exists(db_path):
+            engine = make_engine(f'sqlite:///{db_path}')
+            with engine.connect() as conn:
+                users = [dict(r._mapping) for r in conn.execute(select(User.username, User.role).where(User.username.like('load%')).order_by(User.id))]
+            engine.dispose()
+            users = users[:args.clients]
+            print(f'reusing {db_path} ({len(users)} clients)')
+        else:
+            users = _seed(db_path, args)
+            print(f'seeded {db_path} in {time.perf_counter() - t0:.1f}s ({os.path.getsize(db_path) / 1e6:.1f} MB)')
+
+        proc, base_url = _start_server(db_path, args)
+        print(f'server {base_url} workers={args.workers}; {len(users)} clients, speed x{args.speed}')
+
+        stop = threading.Event()
+        start = time.monotonic()
+        SPIKE['start'] = start + args.steady
+        SPIKE['seconds'] = args.spike
+        clients = []
+        for u in users:
+            # 打卡时间：09:00 附近最密集（三角分布），部分人不在此窗口打卡
+            at = SPIKE['start'] + random.triangular(0, args.spike, args.spike * 0.5) if random.random() < 0.9 else None
+            clients.append(Client(base_url, u, args.speed, stop, at))
+        threads = [threading.Thread(target=c.run, daemon=True) for c in clients]
+        for t in threads:
+            t.start()
+
+        for phase, seconds in (('steady', args.steady), ('spike', args.spike), ('cooldown', args.cooldown)):
+            with REC.lock:
+                REC.phase = phase
+            time.sleep(seconds)
+        stop.set()
+        for t in threads:
+            t.join(timeout=10)
+
+        for phase, seconds in (('steady', args.steady), ('spike', args.spike), ('cooldown', args.cooldown)):
+            _report(phase, seconds)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        if args.keep or args.db:
+            print(f'\nkept {WORK_DIR}')
+        else:
+            shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
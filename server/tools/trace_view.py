@@ -0,0 +1,197 @@
+"""
+请求追踪查看器：汇总服务端导出的追踪文件（logs/traces.jsonl 及滚动出的 .1 .. .N），只依赖标准库。
+
+- 默认：按路由汇总请求数、p50/p95/最大耗时，以及耗时在各环节的平均分布
+  （queue=准入排队，auth=鉴权除 SQL 外，pool=等待连接，sql=语句执行，commit=提交/落盘除 flush 外，
+   crypto=bcrypt，serialize=响应编码，handler=其余时间：路由函数本身与响应校验）
+- --slowest N：打印最慢的 N 个请求的 span 树
+- --id REQUEST_ID：打印指定请求（响应头 X-Request-ID）的 span 树
+- --top-sql N：按语句汇总执行次数与耗时
+
+用法（在 server/ 目录下）：
+    python tools/trace_view.py
+    python tools/trace_view.py --route /attendance/punch --slowest 5
+    python tools/trace_view.py --id 3f2a9c1d0b7e4a55
+    python tools/trace_view.py /path/to/traces.jsonl --min-ms 1000 --top-sql 10
+"""
+
+import argparse
+import glob
+import json
+import os
+import statistics
+import sys
+from collections import defaultdict
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PATH = os.path.join(os.environ.get('GLIMMER_LOG_DIR') or os.path.join(SERVER_DIR, 'logs'), 'traces.jsonl')
+
+PHASES = ('queue', 'auth', 'pool', 'sql', 'commit', 'crypto', 'serialize', 'handler')
+_PHASE_BY_SPAN = {
+    'admission': 'queue',
+    'auth': 'auth',
+    'db.connect': 'pool',
+    'db': 'sql',
+    'session.commit': 'commit',
+    'crypto': 'crypto',
+    'serialize': 'serialize',
+}
+
+
+def _files(paths: list[str]) -> list[str]:
+    out = []
+    for p in paths:
+        # 先读最旧的滚动文件：输出大致按时间顺序
+        rotated = [x for x in glob.glob(glob.escape(p) + '.*') if x.rsplit('.', 1)[1].isdigit()]
+        out.extend(sorted(rotated, key=lambda x: -int(x.rsplit('.', 1)[1])))
+        if os.path.exists(p):
+            out.append(p)
+    return out
+
+
+def load(paths: list[str]) -> list[dict]:
+    traces = []
+    for path in _files(paths):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    traces.append(json.loads(line))
+                except ValueError:
+                    # 进程被强杀时最后一行可能不完整
+                    continue
+    return traces
+
+
+def phases(trace: dict) -> dict[str, float]:
+    # 每个 span 只计“自身时间”（扣除子 span），各环节相加等于请求总耗时
+    child_ms: dict[int, float] = defaultdict(float)
+    for s in trace.get('spans') or ():
+        child_ms[s['parent']] += s['ms']
+    out = dict.fromkeys(PHASES, 0.0)
+    for s in trace.get('spans') or ():
+        phase = _PHASE_BY_SPAN.get(s['name'], 'handler')
+        out[phase] += max(0.0, s['ms'] - child_ms.get(s['id'], 0.0))
+    out['handler'] += max(0.0, trace['ms'] - child_ms.get(0, 0.0))
+    return out
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+
+def summarize(traces: list[dict]) -> None:
+    by_route: dict[str, list[dict]] = defaultdict(list)
+    for t in traces:
+        by_route[f"{t['method']} {t['route']}"].append(t)
+
+    head = f"{'route':<44} {'n':>5} {'p50':>8} {'p95':>8} {'max':>8}  " + ' '.join(f'{p:>9}' for p in PHASES)
+    print(head)
+    print('-' * len(head))
+    rows = sorted(by_route.items(), key=lambda kv: -percentile([t['ms'] for t in kv[1]], 95))
+    for route, items in rows:
+        ms = [t['ms'] for t in items]
+        avg = dict.fromkeys(PHASES, 0.0)
+        for t in items:
+            for k, v in phases(t).items():
+                avg[k] += v / len(items)
+        print(
+            f'{route[:44]:<44} {len(items):>5} {percentile(ms, 50):>8.1f} {percentile(ms, 95):>8.1f} {max(ms):>8.1f}  '
+            + ' '.join(f'{avg[p]:>9.1f}' for p in PHASES)
+        )
+    reasons = defaultdict(int)
+    for t in traces:
+        reasons[t.get('reason') or '?'] += 1
+    print(f"\n{len(traces)} traces ({', '.join(f'{k}={v}' for k, v in sorted(reasons.items()))}); phase columns are mean ms")
+
+
+def print_tree(trace: dict) -> None:
+    print(
+        f"{trace['ts']}  {trace['request_id']}  {trace['method']} {trace['path']}  status={trace['status']}  "
+        f"{trace['ms']:.1f}ms  user={trace.get('user_id')}  reason={trace.get('reason')}"
+    )
+    ph = phases(trace)
+    print('  ' + '  '.join(f'{k}={v:.1f}' for k, v in ph.items() if v >= 0.05))
+    children: dict[int, list[dict]] = defaultdict(list)
+    for s in trace.get('spans') or ():
+        children[s['parent']].append(s)
+
+    def _walk(parent: int, depth: int) -> None:
+        for s in sorted(children.get(parent, ()), key=lambda x: x['start']):
+            extra = {k: v for k, v in s.items() if k not in ('id', 'parent', 'name', 'start', 'ms')}
+            detail = ' '.join(f'{k}={v}' for k, v in extra.items() if k != 'sql')
+            if 'sql' in extra:
+                detail = (detail + ' ' if detail else '') + extra['sql'][:120]
+            print(f"  {'  ' * depth}+{s['start']:>9.1f}ms {s['ms']:>9.2f}ms  {s['name']:<15} {detail}")
+            _walk(s['id'], depth + 1)
+
+    _walk(0, 0)
+    if trace.get('dropped_spans'):
+        print(f"  ... {trace['dropped_spans']} spans not recorded (max_spans)")
+    print()
+
+
+def top_sql(traces: list[dict], n: int) -> None:
+    agg: dict[str, list[float]] = defaultdict(list)
+    for t in traces:
+        for s in t.get('spans') or ():
+            if s['name'] == 'db' and s.get('sql'):
+                agg[s['sql']].append(s['ms'])
+    rows = sorted(agg.items(), key=lambda kv: -sum(kv[1]))[:n]
+    print(f"{'count':>7} {'total_ms':>10} {'avg_ms':>8} {'max_ms':>8}  statement")
+    for sql, ms in rows:
+        print(f'{len(ms):>7} {sum(ms):>10.1f} {statistics.mean(ms):>8.2f} {max(ms):>8.2f}  {sql[:140]}')
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('paths', nargs='*', default=[DEFAULT_PATH], help='trace JSONL files (rotated .N siblings are included)')
+    ap.add_argument('--route', default='', help='only routes containing this text')
+    ap.add_argument('--min-ms', type=float, default=0.0, help='only requests at least this slow')
+    ap.add_argument('--reason', default='', help='only traces exported for this reason (sample/slow/error/forced)')
+    ap.add_argument('--since', default='', help='only traces at or after this ISO timestamp prefix')
+    ap.add_argument('--id', default='', help='show the span tree of one request id')
+    ap.add_argument('--slowest', type=int, default=0, help='show span trees of the N slowest requests')
+    ap.add_argument('--top-sql', type=int, default=0, help='show the N statements with the highest total time')
+    args = ap.parse_args()
+
+    traces = load(args.paths)
+    if not traces:
+        print('no traces found in: ' + ', '.join(args.paths), file=sys.stderr)
+        return 1
+
+    if args.id:
+        hits = [t for t in traces if t.get('request_id') == args.id]
+        for t in hits:
+            print_tree(t)
+        return 0 if hits else 1
+
+    traces = [
+        t for t in traces
+        if args.route in t.get('route', '')
+        and t.get('ms', 0) >= args.min_ms
+        and (not args.reason or t.get('reason') == args.reason)
+        and (not args.since or str(t.get('ts', '')) >= args.since)
+    ]
+    if not traces:
+        print('no traces match the filters', file=sys.stderr)
+        return 1
+
+    summarize(traces)
+    if args.slowest:
+        print()
+        for t in sorted(traces, key=lambda x: -x['ms'])[:args.slowest]:
+            print_tree(t)
+    if args.top_sql:
+        print()
+        top_sql(traces, args.top_sql)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())